@@ -1,10 +1,19 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import User
+from .models import User, VerificacaoEmail
 
 @admin.register(User)
 class CustomUserAdmin(UserAdmin):
     fieldsets = UserAdmin.fieldsets + (
-        ('Informações Adicionais', {'fields': ('user_type', 'matricula', 'telefone')}),
+        ('Informações Adicionais', {'fields': ('user_type', 'ano_escolar', 'matricula', 'telefone')}),
     )
-    list_display = ('username', 'email', 'user_type', 'is_staff')
+    list_display = ('username', 'email', 'user_type', 'ano_escolar', 'is_staff')
+    list_filter = UserAdmin.list_filter + ('user_type', 'ano_escolar')
+
+
+@admin.register(VerificacaoEmail)
+class VerificacaoEmailAdmin(admin.ModelAdmin):
+    list_display = ('user', 'criado_em', 'enviado_em', 'verificado_em')
+    search_fields = ('user__username', 'user__email')
+    list_filter = ('enviado_em', 'verificado_em')
+    readonly_fields = ('criado_em', 'enviado_em', 'verificado_em')
@@ -0,0 +1,51 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.matricula import enviar_pendentes, matricular
+from accounts.provisionamento import LOTE, ListaInvalida, ler_contas
+
+
+class Command(BaseCommand):
+    help = (
+        'Matricula alunos e professores a partir de uma lista CSV com as colunas '
+        'matricula, email, tipo, ano e senha (opcional): cria contas (sem senha, '
+        'ela é definida pelo link do e-mail), perfis e enfileira os e-mails de verificação'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('arquivo', help='CSV (UTF-8) com cabeçalho')
+        parser.add_argument('--processos', type=int, help='Processos para o hash das senhas (padrão: nº de CPUs)')
+        parser.add_argument('--lote', type=int, default=LOTE, help='Linhas por bulk_create')
+        parser.add_argument(
+            '--enviar',
+            action='store_true',
+            help='Envia a fila de verificação ao final (senão, use o comando enviar_verificacoes)',
+        )
+        parser.add_argument('--url-base', default='http://localhost:8000', help='Endereço do site usado nos links')
+
+    def handle(self, *args, **options):
+        try:
+            contas = ler_contas(options['arquivo'], obrigatorias=('matricula',))
+        except ListaInvalida as e:
+            raise CommandError(str(e))
+        except OSError as e:
+            raise CommandError(f'Não foi possível ler {options["arquivo"]}: {e}')
+
+        inicio = time.perf_counter()
+        criados, ignorados = matricular(contas, processos=options['processos'], lote=options['lote'])
+        duracao = time.perf_counter() - inicio
+
+        for email in ignorados:
+            self.stderr.write(f'Ignorado (e-mail inválido, já cadastrado ou repetido): {email}')
+        por_segundo = len(criados) / duracao if duracao else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(criados)} conta(s) criada(s), {len(ignorados)} ignorada(s) '
+            f'em {duracao:.2f}s ({por_segundo:.1f} contas/s).'
+        ))
+
+        if options['enviar']:
+            enviados = enviar_pendentes(options['url_base'])
+            self.stdout.write(f'{enviados} e-mail(s) de verificação enviado(s).')
+        else:
+            self.stdout.write(f'{len(criados)} e-mail(s) de verificação na fila.')
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from accounts.matricula import enviar_pendentes
+
+
+class Command(BaseCommand):
+    help = 'Envia os e-mails de verificação pendentes das contas matriculadas em lote'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url-base', default='http://localhost:8000', help='Endereço do site usado nos links')
+        parser.add_argument('--lote', type=int, default=200, help='E-mails por conexão SMTP')
+
+    def handle(self, *args, **options):
+        enviados = enviar_pendentes(options['url_base'], lote=options['lote'])
+        self.stdout.write(self.style.SUCCESS(f'{enviados} e-mail(s) enviado(s).'))
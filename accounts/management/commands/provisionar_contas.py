@@ -0,0 +1,56 @@
+import csv
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.provisionamento import LOTE, ListaInvalida, gerar_senha, ler_contas, provisionar
+
+
+class Command(BaseCommand):
+    help = (
+        'Cria as contas de uma turma a partir de um CSV com as colunas email e, '
+        'opcionalmente, tipo (ou user_type), ano (ou ano_escolar), matricula e senha'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('arquivo', help='CSV (UTF-8) com cabeçalho')
+        parser.add_argument('--processos', type=int, help='Processos para o hash das senhas (padrão: nº de CPUs)')
+        parser.add_argument('--lote', type=int, default=LOTE, help='Usuários por bulk_create')
+        parser.add_argument(
+            '--saida',
+            help='CSV para gravar email, username e a senha gerada (para linhas sem senha)',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            contas = ler_contas(options['arquivo'])
+        except ListaInvalida as e:
+            raise CommandError(str(e))
+        except OSError as e:
+            raise CommandError(f'Não foi possível ler {options["arquivo"]}: {e}')
+
+        geradas = set()
+        for conta in contas:
+            if 'password' not in conta:
+                conta['password'] = gerar_senha()
+                geradas.add(conta['email'])
+        if geradas and not options['saida']:
+            raise CommandError('Há linhas sem senha: informe --saida para gravar as senhas geradas.')
+
+        inicio = time.perf_counter()
+        criados, ignorados = provisionar(contas, processos=options['processos'], lote=options['lote'])
+        duracao = time.perf_counter() - inicio
+
+        if options['saida']:
+            senhas = {conta['email'].lower(): conta['password'] for conta in contas if conta['email'] in geradas}
+            with open(options['saida'], 'w', newline='', encoding='utf-8') as arquivo:
+                escritor = csv.writer(arquivo)
+                escritor.writerow(['email', 'username', 'senha'])
+                for usuario in criados:
+                    escritor.writerow([usuario.email, usuario.username, senhas.get(usuario.email, '')])
+
+        for email in ignorados:
+            self.stderr.write(f'Ignorado (e-mail inválido, já cadastrado ou repetido): {email}')
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(criados)} conta(s) criada(s), {len(ignorados)} ignorada(s) em {duracao:.1f}s.'
+        ))
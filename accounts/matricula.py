@@ -0,0 +1,139 @@
+"""
+Matrícula em lote a partir da lista de alunos/professores da escola.
+
+- Cada linha da lista (matricula, email, tipo, ano e senha opcional; ver
+  ler_contas) vira uma conta. Sem senha na linha a conta nasce sem senha
+  utilizável; as senhas informadas passam pelo hash em um pool de
+  processos. Usuários, perfis e verificações entram com bulk_create em
+  blocos (ver accounts/provisionamento.py).
+- Os e-mails de verificação ficam na fila (VerificacaoEmail) e são enviados
+  em lotes, uma conexão SMTP por lote, pelo comando enviar_verificacoes.
+- O link do e-mail leva um token assinado para a página de definir a senha;
+  só ao definir a senha o e-mail conta como verificado, e o link deixa de
+  valer. Até lá a conta não entra (ver login_view).
+"""
+import smtplib
+
+from django.core import signing
+from django.core.mail import EmailMessage, get_connection
+from django.urls import reverse
+from django.utils import timezone
+
+from perfil.models import PerfilUsuario
+from .models import User, VerificacaoEmail
+from .provisionamento import LOTE, provisionar
+
+SALT_VERIFICACAO = 'accounts.verificacao'
+VALIDADE_VERIFICACAO = 7 * 24 * 60 * 60  # segundos
+
+
+def matricular(contas, processos=None, lote=LOTE):
+    """
+    Cria contas (sem 'password', o aluno define a senha pelo link), perfis
+    e a fila de verificação. Devolve (usuários criados, e-mails ignorados).
+    """
+    contas = [{'password': None, **conta} for conta in contas]
+    criados, ignorados = provisionar(contas, processos=processos, lote=lote)
+    for inicio in range(0, len(criados), lote):
+        bloco = criados[inicio:inicio + lote]
+        PerfilUsuario.objects.bulk_create(
+            [PerfilUsuario(user_id=usuario.pk) for usuario in bloco], ignore_conflicts=True
+        )
+        VerificacaoEmail.objects.bulk_create(
+            [VerificacaoEmail(user_id=usuario.pk) for usuario in bloco], ignore_conflicts=True
+        )
+    return criados, ignorados
+
+
+# ========================================
+# VERIFICAÇÃO DE E-MAIL
+# ========================================
+def token_verificacao(usuario_id):
+    return signing.dumps(usuario_id, salt=SALT_VERIFICACAO)
+
+
+def usuario_do_token(token):
+    """Usuário com a verificação pendente; None se o token for inválido, expirado ou já usado"""
+    try:
+        usuario_id = signing.loads(token, salt=SALT_VERIFICACAO, max_age=VALIDADE_VERIFICACAO)
+    except signing.BadSignature:
+        return None
+    return User.objects.filter(
+        pk=usuario_id, verificacao_email__verificado_em__isnull=True
+    ).first()
+
+
+def verificacao_pendente(usuario):
+    """True se a conta veio da matrícula em lote e ainda não confirmou o e-mail"""
+    return VerificacaoEmail.objects.filter(user=usuario, verificado_em__isnull=True).exists()
+
+
+def marcar_verificado(usuario):
+    VerificacaoEmail.objects.filter(user=usuario, verificado_em__isnull=True).update(
+        verificado_em=timezone.now()
+    )
+
+
+def enviar_verificacoes(url_base, lote=200):
+    """
+    Envia um lote de verificações pendentes (uma conexão SMTP).
+    Só os e-mails aceitos pelo servidor (ou com destinatário recusado, que
+    não adianta repetir) são marcados; se o servidor falhar, o resto do
+    lote fica pendente para a próxima rodada.
+    Retorna quantos e-mails foram enviados.
+    """
+    pendentes = list(
+        VerificacaoEmail.objects.filter(enviado_em__isnull=True)
+        .select_related('user')
+        .order_by('criado_em')[:lote]
+    )
+    if not pendentes:
+        return 0
+
+    url_base = url_base.rstrip('/')
+    dias = VALIDADE_VERIFICACAO // (24 * 60 * 60)
+    mensagens = [
+        (pendente, EmailMessage(
+            'Confirme seu e-mail - StudyMate',
+            f'Olá! Sua conta no StudyMate foi criada.\n\n'
+            f'Usuário: {pendente.user.username}\n\n'
+            f'Para confirmar seu e-mail e definir sua senha, acesse (válido por {dias} dias):\n'
+            f'{url_base}{reverse("accounts:verificar_email", args=[token_verificacao(pendente.user_id)])}',
+            'noreply@studymate.com',
+            [pendente.user.email],
+        ))
+        for pendente in pendentes
+    ]
+
+    processados = []
+    enviados = 0
+    try:
+        with get_connection() as conexao:
+            for pendente, mensagem in mensagens:
+                try:
+                    conexao.send_messages([mensagem])
+                except smtplib.SMTPRecipientsRefused:
+                    processados.append(pendente.pk)
+                    continue
+                processados.append(pendente.pk)
+                enviados += 1
+    except (smtplib.SMTPException, OSError):
+        pass  # servidor indisponível: o que não foi entregue continua pendente
+
+    VerificacaoEmail.objects.filter(pk__in=processados).update(enviado_em=timezone.now())
+    return enviados
+
+
+def enviar_pendentes(url_base, lote=200):
+    """
+    Esvazia a fila em lotes; retorna quantos e-mails foram enviados.
+    Para quando um lote não anda (servidor fora do ar): o resto fica na fila.
+    """
+    enviados = 0
+    restantes = VerificacaoEmail.objects.filter(enviado_em__isnull=True).count()
+    while restantes:
+        enviados += enviar_verificacoes(url_base, lote)
+        antes, restantes = restantes, VerificacaoEmail.objects.filter(enviado_em__isnull=True).count()
+        if restantes >= antes:
+            break
+    return enviados
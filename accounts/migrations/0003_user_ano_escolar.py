@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_user_first_login_alter_user_user_type'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='ano_escolar',
+            field=models.PositiveSmallIntegerField(blank=True, choices=[(1, '1º Ano'), (2, '2º Ano'), (3, '3º Ano')], null=True, verbose_name='Ano (alunos)'),
+        ),
+    ]
@@ -0,0 +1,89 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:20
+
+from django.db import migrations, models
+
+
+def _normalizar(valor):
+    return (valor or '').strip().lower() or None
+
+
+def preencher_normalizados(apps, schema_editor):
+    """
+    Copia username/e-mail em minúsculas, sem deixar colunas nulas: o save()
+    do modelo recalcula as cópias e bateria no índice único a cada edição.
+
+    - Nomes que só diferem em maiúsculas: o usuário mais antigo fica com o
+      nome e os outros ganham um sufixo numérico ("ANA" vira "ANA2", como em alocar_usernames).
+    - E-mails repetidos não têm como ser renomeados (o endereço é de uma
+      pessoa só): a migração para e lista as contas para alguém decidir.
+    """
+    User = apps.get_model('accounts', 'User')
+    usuarios = list(User.objects.only('pk', 'username', 'email').order_by('pk'))
+
+    emails = {}
+    for usuario in usuarios:
+        email = _normalizar(usuario.email)
+        if email is not None:
+            emails.setdefault(email, []).append(usuario.pk)
+    repetidos = {email: pks for email, pks in emails.items() if len(pks) > 1}
+    if repetidos:
+        relatorio = '\n'.join(
+            f'  {email}: usuários {", ".join(map(str, pks))}' for email, pks in sorted(repetidos.items())
+        )
+        raise RuntimeError(
+            'Há e-mails repetidos (diferem só em maiúsculas/espaços). '
+            'Altere o e-mail de uma das contas e rode a migração de novo:\n' + relatorio
+        )
+
+    ocupados = {_normalizar(usuario.username) for usuario in usuarios}
+    vistos = set()
+    for usuario in usuarios:
+        nome = _normalizar(usuario.username)
+        if nome in vistos:
+            numero = 2
+            while True:
+                sufixo = str(numero)
+                renomeado = usuario.username.strip()[:150 - len(sufixo)] + sufixo
+                if _normalizar(renomeado) not in ocupados:
+                    break
+                numero += 1
+            usuario.username = renomeado
+            nome = _normalizar(renomeado)
+            ocupados.add(nome)
+        vistos.add(nome)
+        usuario.username_normalizado = nome
+        usuario.email_normalizado = _normalizar(usuario.email)
+    User.objects.bulk_update(
+        usuarios, ['username', 'username_normalizado', 'email_normalizado'], batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_user_ano_escolar'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='email_normalizado',
+            field=models.CharField(editable=False, max_length=254, null=True),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='username_normalizado',
+            field=models.CharField(editable=False, max_length=150, null=True),
+        ),
+        migrations.RunPython(preencher_normalizados, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='user',
+            name='email_normalizado',
+            field=models.CharField(editable=False, max_length=254, null=True, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='username_normalizado',
+            field=models.CharField(editable=False, max_length=150, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:07
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_user_campos_normalizados'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VerificacaoEmail',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='verificacao_email', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('criado_em', models.DateTimeField(auto_now_add=True, verbose_name='Criado em')),
+                ('enviado_em', models.DateTimeField(blank=True, null=True, verbose_name='Enviado em')),
+                ('verificado_em', models.DateTimeField(blank=True, null=True, verbose_name='Verificado em')),
+            ],
+            options={
+                'verbose_name': 'Verificação de e-mail',
+                'verbose_name_plural': 'Verificações de e-mail',
+                'indexes': [models.Index(fields=['enviado_em', 'criado_em'], name='accounts_ve_enviado_32dbf2_idx')],
+            },
+        ),
+    ]
@@ -18,13 +18,31 @@ class User(AbstractUser):
         verbose_name='Tipo de Usuário'
     )
     
+    ANO_ESCOLAR_CHOICES = (
+        (1, '1º Ano'),
+        (2, '2º Ano'),
+        (3, '3º Ano'),
+    )
+    
     # Campos adicionais opcionais
     matricula = models.CharField(max_length=20, blank=True, null=True, verbose_name='Matrícula')
+    ano_escolar = models.PositiveSmallIntegerField(
+        choices=ANO_ESCOLAR_CHOICES,
+        null=True,
+        blank=True,
+        verbose_name='Ano (alunos)'
+    )
     telefone = models.CharField(max_length=15, blank=True, null=True, verbose_name='Telefone')
     
     # Controle de primeiro login
     first_login = models.BooleanField(default=True, verbose_name='Primeiro Login')
     
+    # Cópias em minúsculas de username/e-mail, preenchidas no save().
+    # O índice único delas torna a busca sem diferenciar maiúsculas uma
+    # consulta por índice (username__iexact percorre a tabela no SQLite).
+    username_normalizado = models.CharField(max_length=150, unique=True, null=True, editable=False)
+    email_normalizado = models.CharField(max_length=254, unique=True, null=True, editable=False)
+    
     class Meta:
         verbose_name = 'Usuário'
         verbose_name_plural = 'Usuários'
@@ -32,6 +50,25 @@ class User(AbstractUser):
     def __str__(self):
         return f"{self.username} - {self.get_user_type_display()}"
     
+    @staticmethod
+    def normalizar(valor):
+        valor = (valor or '').strip().lower()
+        return valor or None
+    
+    def save(self, *args, **kwargs):
+        self.username_normalizado = self.normalizar(self.username)
+        self.email_normalizado = self.normalizar(self.email)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            # Mantém as cópias junto com os campos de origem
+            update_fields = set(update_fields)
+            if 'username' in update_fields:
+                update_fields.add('username_normalizado')
+            if 'email' in update_fields:
+                update_fields.add('email_normalizado')
+            kwargs['update_fields'] = update_fields
+        super().save(*args, **kwargs)
+    
     def is_admin_user(self):
         return self.user_type == 'admin'
     
@@ -39,4 +76,25 @@ class User(AbstractUser):
         return self.user_type == 'professor'
     
     def is_aluno(self):
-        return self.user_type == 'aluno'
\ No newline at end of file
+        return self.user_type == 'aluno'
+
+
+class VerificacaoEmail(models.Model):
+    """
+    E-mail de verificação de uma conta criada em lote (comando enroll).
+    A fila é esvaziada pelo comando enviar_verificacoes (ver accounts/matricula.py).
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='verificacao_email')
+    criado_em = models.DateTimeField(auto_now_add=True, verbose_name='Criado em')
+    enviado_em = models.DateTimeField(null=True, blank=True, verbose_name='Enviado em')
+    verificado_em = models.DateTimeField(null=True, blank=True, verbose_name='Verificado em')
+
+    class Meta:
+        verbose_name = 'Verificação de e-mail'
+        verbose_name_plural = 'Verificações de e-mail'
+        indexes = [
+            models.Index(fields=['enviado_em', 'criado_em']),
+        ]
+
+    def __str__(self):
+        return f"Verificação de {self.user.email}"
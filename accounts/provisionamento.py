@@ -0,0 +1,254 @@
+"""
+Criação de contas: nomes de usuário únicos e cadastro em lote.
+
+- alocar_usernames() busca de uma vez todos os usernames que começam com
+  cada base (faixa no índice de username_normalizado) e escolhe o menor
+  sufixo livre (base, base1, base2...), sem uma consulta por colisão.
+- Duas criações simultâneas podem escolher o mesmo nome; o índice único
+  barra a segunda, que recalcula e tenta de novo (TENTATIVAS vezes).
+- Em lote, o hash das senhas (PBKDF2, a parte cara) roda em um pool de
+  processos e os usuários entram com bulk_create em blocos.
+- Os dois caminhos gravam o e-mail em minúsculas (User.normalizar).
+- ler_contas() lê o CSV da escola para os comandos provisionar_contas e
+  enroll (mesmas colunas e validações nos dois).
+"""
+import csv
+import os
+import re
+import secrets
+from concurrent.futures import ProcessPoolExecutor
+
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+
+from .models import User
+
+TENTATIVAS = 5
+TAMANHO_BASE = 140  # deixa espaço para o sufixo numérico (username tem até 150)
+LOTE = 500
+BASES_POR_CONSULTA = 200  # limite de condições OR por consulta
+_FIM_DA_FAIXA = '\U0010ffff'
+
+
+# Aceita os nomes de coluna dos dois comandos (tipo/user_type, ano/ano_escolar)
+TIPOS = {valor: valor for valor, _ in User.USER_TYPE_CHOICES}
+TIPOS['prof'] = 'professor'
+ANOS = {str(valor) for valor, _ in User.ANO_ESCOLAR_CHOICES}
+
+
+class EmailJaCadastrado(ValueError):
+    pass
+
+
+class ListaInvalida(ValueError):
+    pass
+
+
+def email_valido(email):
+    try:
+        validate_email(email)
+    except ValidationError:
+        return False
+    return True
+
+
+def base_do_email(email):
+    base = re.sub(r'[^\w.@+-]', '', email.split('@')[0].lower())
+    return (base or 'usuario')[:TAMANHO_BASE]
+
+
+# ========================================
+# USERNAMES
+# ========================================
+def _ocupados(bases):
+    """{base: sufixos em uso} (0 = a própria base), uma consulta por BASES_POR_CONSULTA bases"""
+    ocupados = {base: set() for base in bases}
+    bases = sorted(ocupados)
+    for inicio in range(0, len(bases), BASES_POR_CONSULTA):
+        faixa = Q()
+        for base in bases[inicio:inicio + BASES_POR_CONSULTA]:
+            # Faixa em vez de startswith: o LIKE do SQLite não usa o índice
+            faixa |= Q(username_normalizado__gte=base, username_normalizado__lt=base + _FIM_DA_FAIXA)
+        for username in User.objects.filter(faixa).values_list('username_normalizado', flat=True):
+            # A base pode terminar em dígitos: testa cada corte dentro do sufixo numérico
+            corte = len(username)
+            while True:
+                if username[:corte] in ocupados:
+                    ocupados[username[:corte]].add(int(username[corte:] or 0))
+                if corte == 0 or not username[corte - 1].isdigit():
+                    break
+                corte -= 1
+    return ocupados
+
+
+def _menor_livre(usados):
+    sufixo = 0
+    while sufixo in usados:
+        sufixo += 1
+    return sufixo
+
+
+def alocar_usernames(bases):
+    """
+    Um username livre para cada base da lista (na mesma ordem).
+    Bases repetidas recebem sufixos diferentes.
+    """
+    ocupados = _ocupados(set(bases))
+    usernames = []
+    for base in bases:
+        sufixo = _menor_livre(ocupados[base])
+        ocupados[base].add(sufixo)
+        usernames.append(f'{base}{sufixo or ""}')
+    return usernames
+
+
+def criar_usuario(email, password, **campos):
+    """
+    Cria o usuário com username derivado do e-mail (gravado em minúsculas).
+    Levanta EmailJaCadastrado se o e-mail já estiver em uso.
+    """
+    email = User.normalizar(email)
+    usuario = User(email=email, **campos)
+    usuario.set_password(password)  # uma vez só, fora das tentativas
+    base = base_do_email(email)
+    for _ in range(TENTATIVAS):
+        usuario.username = alocar_usernames([base])[0]
+        try:
+            with transaction.atomic():
+                usuario.save(force_insert=True)
+            return usuario
+        except IntegrityError:
+            usuario.pk = None
+            if User.objects.filter(email_normalizado=User.normalizar(email)).exists():
+                raise EmailJaCadastrado(email)
+            # Outro cadastro levou o mesmo username: recalcula
+    raise IntegrityError(f'Não foi possível alocar um username para {email}.')
+
+
+# ========================================
+# CADASTRO EM LOTE
+# ========================================
+def _iniciar_processo():
+    # Com spawn (Windows/macOS) o processo filho começa sem o Django configurado
+    import django
+    django.setup()
+
+
+def hash_senhas(senhas, processos=None):
+    """
+    make_password de cada senha, distribuído entre processos.
+    None vira uma senha inutilizável (não passa pelo pool).
+    """
+    senhas = list(senhas)
+    com_senha = [senha for senha in senhas if senha is not None]
+    processos = processos or os.cpu_count() or 1
+    if processos <= 1 or len(com_senha) < 2:
+        hashes = [make_password(senha) for senha in com_senha]
+    else:
+        with ProcessPoolExecutor(max_workers=processos, initializer=_iniciar_processo) as pool:
+            hashes = list(pool.map(make_password, com_senha, chunksize=max(1, len(com_senha) // (processos * 4))))
+    hashes = iter(hashes)
+    return [make_password(None) if senha is None else next(hashes) for senha in senhas]
+
+
+def gerar_senha():
+    return secrets.token_urlsafe(9)
+
+
+def provisionar(contas, processos=None, lote=LOTE):
+    """
+    Cria as contas de uma lista de dicts com 'email', 'password' (None para
+    conta sem senha utilizável) e campos opcionais do usuário (user_type,
+    ano_escolar, matricula...).
+    Devolve (usuários criados, e-mails ignorados por serem inválidos, já
+    existirem ou estarem repetidos).
+    """
+    ignorados = []
+    novas, vistos = [], set()
+    emails = [User.normalizar(conta['email']) for conta in contas]
+    existentes = set()
+    for inicio in range(0, len(emails), lote):
+        existentes.update(User.objects.filter(
+            email_normalizado__in=emails[inicio:inicio + lote]
+        ).values_list('email_normalizado', flat=True))
+    for conta, email in zip(contas, emails):
+        if email is None or not email_valido(email) or email in existentes or email in vistos:
+            ignorados.append(conta['email'])
+            continue
+        vistos.add(email)
+        novas.append(conta)
+
+    hashes = hash_senhas([conta['password'] for conta in novas], processos)
+
+    criados = []
+    for inicio in range(0, len(novas), lote):
+        bloco = [
+            User(
+                email=User.normalizar(conta['email']),
+                password=senha,
+                **{campo: valor for campo, valor in conta.items() if campo not in ('email', 'password')},
+            )
+            for conta, senha in zip(novas[inicio:inicio + lote], hashes[inicio:inicio + lote])
+        ]
+        criados.extend(_inserir_bloco(bloco))
+    return criados, ignorados
+
+
+def _inserir_bloco(usuarios):
+    """bulk_create não chama save(): as colunas normalizadas são preenchidas aqui"""
+    for _ in range(TENTATIVAS):
+        usernames = alocar_usernames([base_do_email(usuario.email) for usuario in usuarios])
+        for usuario, username in zip(usuarios, usernames):
+            usuario.username = username
+            usuario.username_normalizado = User.normalizar(username)
+            usuario.email_normalizado = User.normalizar(usuario.email)
+        try:
+            with transaction.atomic():
+                return User.objects.bulk_create(usuarios)
+        except IntegrityError:
+            for usuario in usuarios:
+                usuario.pk = None
+            # Cadastros simultâneos ocuparam algum username: recalcula o bloco
+    raise IntegrityError('Não foi possível alocar usernames para o bloco.')
+
+
+# ========================================
+# LEITURA DO CSV
+# ========================================
+def ler_contas(caminho, obrigatorias=()):
+    """
+    Lê o CSV (UTF-8, com cabeçalho) no formato de provisionar(), sem 'password'
+    quando a linha não tem senha. Colunas: email e, opcionalmente, tipo
+    (ou user_type), ano (ou ano_escolar, aceita "2º"), matricula e senha.
+    Levanta ListaInvalida com o número da linha e OSError se não conseguir ler.
+    """
+    contas = []
+    with open(caminho, newline='', encoding='utf-8-sig') as arquivo:
+        for numero, linha in enumerate(csv.DictReader(arquivo), start=2):
+            linha = {chave.strip().lower(): (valor or '').strip() for chave, valor in linha.items() if chave}
+            for coluna in ('email', *obrigatorias):
+                if not linha.get(coluna):
+                    raise ListaInvalida(f'Linha {numero}: a coluna {coluna} é obrigatória.')
+            if not email_valido(linha['email']):
+                raise ListaInvalida(f'Linha {numero}: e-mail inválido ({linha["email"]}).')
+
+            tipo = linha.get('tipo') or linha.get('user_type') or 'aluno'
+            if tipo.lower() not in TIPOS:
+                raise ListaInvalida(f'Linha {numero}: tipo de usuário inválido ({tipo}).')
+            conta = {'email': linha['email'], 'user_type': TIPOS[tipo.lower()]}
+
+            ano = linha.get('ano') or linha.get('ano_escolar')
+            if ano and conta['user_type'] == 'aluno':
+                numero_ano = ano.rstrip('º°').strip()
+                if numero_ano not in ANOS:
+                    raise ListaInvalida(f'Linha {numero}: ano escolar inválido ({ano}).')
+                conta['ano_escolar'] = int(numero_ano)
+            if linha.get('matricula'):
+                conta['matricula'] = linha['matricula']
+            if linha.get('senha'):
+                conta['password'] = linha['senha']
+            contas.append(conta)
+    return contas
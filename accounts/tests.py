@@ -1,3 +1,228 @@
-from django.test import TestCase
+import csv
+import json
+import os
+import re
+import smtplib
+import tempfile
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core import mail
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from perfil.models import PerfilUsuario
+from .matricula import enviar_pendentes
+from .models import User, VerificacaoEmail
+from .provisionamento import EmailJaCadastrado, alocar_usernames, criar_usuario, provisionar
+
+HASH_RAPIDO = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+
+@override_settings(PASSWORD_HASHERS=HASH_RAPIDO)
+class AlocacaoUsernameTests(TestCase):
+    """Username derivado do e-mail com uma consulta, preenchendo o menor sufixo livre"""
+
+    def setUp(self):
+        for username in ['ana', 'Ana1', 'ana3', 'anabela', 'ana2x', 'joao2', 'joao21']:
+            User.objects.create_user(username, f'{username.lower()}@etec.sp.gov.br', 'x')
+
+    def test_menor_sufixo_livre_em_uma_consulta(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(alocar_usernames(['ana', 'ana', 'joao2', 'pedro']), ['ana2', 'ana4', 'joao22', 'pedro'])
+
+    def test_cadastro_pela_view(self):
+        sessao = self.client.session
+        sessao.update({'cadastro_email': 'ana@gmail.etec.sp.gov.br', 'cadastro_codigo_verificado': True, 'cadastro_etapa': 3})
+        sessao.save()
+        resposta = self.client.post(reverse('accounts:create_account'), json.dumps({
+            'email': 'ana@gmail.etec.sp.gov.br', 'password': 'Senha@123', 'password_confirm': 'Senha@123', 'user_type': 'aluno',
+        }), content_type='application/json')
+        self.assertTrue(resposta.json()['success'])
+        self.assertTrue(User.objects.filter(username='ana2', email='ana@gmail.etec.sp.gov.br').exists())
+
+        with self.assertRaises(EmailJaCadastrado):
+            criar_usuario('ANA@etec.sp.gov.br', 'x')
+        # Mesmo formato do cadastro em lote: e-mail em minúsculas
+        self.assertEqual(criar_usuario('Caio@Etec.sp.gov.br', 'x').email, 'caio@etec.sp.gov.br')
+
+
+@override_settings(PASSWORD_HASHERS=HASH_RAPIDO)
+class ProvisionamentoTests(TestCase):
+    """Cadastro em lote: hash em processos, bulk_create e e-mails repetidos ignorados"""
+
+    def test_provisionar_e_comando(self):
+        User.objects.create_user('bia', 'bia@etec.sp.gov.br', 'x')
+        criados, ignorados = provisionar([
+            {'email': 'Bia@etec.sp.gov.br', 'password': 'a'},
+            {'email': 'bia@outra.etec.sp.gov.br', 'password': 'b', 'ano_escolar': 2},
+            {'email': 'caio@etec.sp.gov.br', 'password': 'c', 'user_type': 'professor'},
+            {'email': 'caio@etec.sp.gov.br', 'password': 'd'},
+            {'email': 'dani@@etec', 'password': 'e'},
+        ], processos=2)
+        self.assertEqual(ignorados, ['Bia@etec.sp.gov.br', 'caio@etec.sp.gov.br', 'dani@@etec'])
+        self.assertEqual([usuario.username for usuario in criados], ['bia1', 'caio'])
+        bia = User.objects.get(username='bia1')
+        self.assertEqual((bia.ano_escolar, bia.username_normalizado), (2, 'bia1'))
+        self.assertTrue(bia.check_password('b'))
+
+        pasta = tempfile.mkdtemp()
+        entrada, saida = os.path.join(pasta, 'turma.csv'), os.path.join(pasta, 'senhas.csv')
+        with open(entrada, 'w', encoding='utf-8') as arquivo:
+            arquivo.write('email,ano_escolar,matricula\ndani@etec.sp.gov.br,1,123\n')
+        call_command('provisionar_contas', entrada, '--saida', saida, '--processos', '1', stdout=StringIO())
+        with open(saida, encoding='utf-8') as arquivo:
+            linha = list(csv.DictReader(arquivo))[0]
+        dani = User.objects.get(email='dani@etec.sp.gov.br')
+        self.assertEqual((dani.matricula, linha['username']), ('123', 'dani'))
+        self.assertTrue(dani.check_password(linha['senha']))
+
+        with open(entrada, 'w', encoding='utf-8') as arquivo:
+            arquivo.write('email\neva@etec.sp.gov.br\neva.etec.sp.gov.br\n')
+        with self.assertRaisesMessage(CommandError, 'Linha 3: e-mail inválido'):
+            call_command('provisionar_contas', entrada, '--saida', saida, stdout=StringIO())
+
+
+@override_settings(PASSWORD_HASHERS=HASH_RAPIDO, EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class MatriculaTests(TestCase):
+    """Comando enroll: contas, perfis e fila de verificação a partir da lista da escola"""
+
+    def test_enroll_e_verificacao(self):
+        lista = os.path.join(tempfile.mkdtemp(), 'lista.csv')
+        with open(lista, 'w', encoding='utf-8') as arquivo:
+            arquivo.write(
+                'matricula,email,tipo,ano\n'
+                '1001,eva@etec.sp.gov.br,aluno,2º\n'
+                '2001,rui@etec.sp.gov.br,professor,\n'
+                '1002,EVA@etec.sp.gov.br,aluno,1\n'
+            )
+        saida = StringIO()
+        call_command('enroll', lista, stdout=saida, stderr=StringIO())
+        self.assertIn('2 conta(s) criada(s), 1 ignorada(s)', saida.getvalue())
+
+        eva = User.objects.get(username='eva')
+        self.assertEqual((eva.matricula, eva.ano_escolar, eva.user_type), ('1001', 2, 'aluno'))
+        self.assertFalse(eva.has_usable_password())
+        self.assertEqual(PerfilUsuario.objects.count(), 2)
+        self.assertEqual(VerificacaoEmail.objects.filter(enviado_em__isnull=True).count(), 2)
+
+        call_command('enviar_verificacoes', '--lote', '1', stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertFalse(VerificacaoEmail.objects.filter(enviado_em__isnull=True).exists())
+
+        # O link leva à página de definir a senha; a verificação só conta depois dela
+        link = re.search(r'http://localhost:8000(\S+)', mail.outbox[0].body).group(1)
+        self.assertTemplateUsed(self.client.get(link), 'accounts/definir_senha.html')
+        verificacao = VerificacaoEmail.objects.get(user__email=mail.outbox[0].to[0])
+        self.assertIsNone(verificacao.verificado_em)
+
+        resposta = self.client.post(link, {'new_password1': 'Senha@forte123', 'new_password2': 'Senha@forte123'})
+        self.assertRedirects(resposta, reverse('accounts:login'), fetch_redirect_response=False)
+        verificacao.refresh_from_db()
+        self.assertIsNotNone(verificacao.verificado_em)
+        self.assertTrue(verificacao.user.check_password('Senha@forte123'))
+
+        # O link não serve de novo, e um token adulterado não verifica nada
+        self.client.post(link, {'new_password1': 'Outra@senha456', 'new_password2': 'Outra@senha456'})
+        verificacao.user.refresh_from_db()
+        self.assertTrue(verificacao.user.check_password('Senha@forte123'))
+        self.client.get(reverse('accounts:verificar_email', args=['adulterado']))
+        self.assertEqual(VerificacaoEmail.objects.filter(verificado_em__isnull=False).count(), 1)
+
+    def test_enroll_com_senha_usa_o_pool(self):
+        lista = os.path.join(tempfile.mkdtemp(), 'lista.csv')
+        with open(lista, 'w', encoding='utf-8') as arquivo:
+            arquivo.write(
+                'matricula,email,tipo,senha\n'
+                '3001,ivo@etec.sp.gov.br,aluno,Senha@ivo1\n'
+                '3002,ana@etec.sp.gov.br,prof,Senha@ana2\n'
+                '3003,leo@etec.sp.gov.br,aluno,\n'
+            )
+        call_command('enroll', lista, '--processos', '2', stdout=StringIO())
+
+        self.assertTrue(User.objects.get(username='ivo').check_password('Senha@ivo1'))
+        self.assertTrue(User.objects.get(username='ana').check_password('Senha@ana2'))
+        self.assertFalse(User.objects.get(username='leo').has_usable_password())
+        # Com ou sem senha, o primeiro acesso continua passando pela verificação
+        self.assertEqual(VerificacaoEmail.objects.filter(verificado_em__isnull=True).count(), 3)
+
+    def test_login_exige_verificacao(self):
+        usuario = User.objects.create_user('lia', 'lia@etec.sp.gov.br', 'Senha@forte123')
+        VerificacaoEmail.objects.create(user=usuario)
+        resposta = self.client.post(reverse('accounts:login'), {'credential': 'lia', 'password': 'Senha@forte123'})
+        self.assertRedirects(resposta, reverse('accounts:login'), fetch_redirect_response=False)
+        self.assertNotIn('_auth_user_id', self.client.session)
+
+        VerificacaoEmail.objects.filter(user=usuario).update(verificado_em=timezone.now())
+        resposta = self.client.post(reverse('accounts:login'), {'credential': 'lia', 'password': 'Senha@forte123'})
+        self.assertRedirects(resposta, reverse('study:home'), fetch_redirect_response=False)
+
+    def test_so_entregues_saem_da_fila(self):
+        for nome in ('ana', 'bia', 'caio'):
+            VerificacaoEmail.objects.create(user=User.objects.create_user(nome, f'{nome}@etec.sp.gov.br', 'x'))
+        entregar = mail.get_connection().__class__.send_messages
+        chamadas = []
+
+        def servidor_cai_no_segundo(conexao, mensagens):
+            # Entrega o primeiro e-mail e fica fora do ar: a fila não pode girar para sempre
+            chamadas.append(mensagens)
+            if len(chamadas) >= 2:
+                raise smtplib.SMTPServerDisconnected()
+            return entregar(conexao, mensagens)
+
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', servidor_cai_no_segundo):
+            self.assertEqual(enviar_pendentes('http://localhost:8000', lote=10), 1)
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(
+            list(VerificacaoEmail.objects.filter(enviado_em__isnull=True).values_list('user__username', flat=True)),
+            ['bia', 'caio'],
+        )
+
+
+class MigracaoCamposNormalizadosTests(TransactionTestCase):
+    """0004 não deixa cópias nulas: renomeia nomes repetidos e para em e-mails repetidos"""
+
+    antes = [('accounts', '0003_user_ano_escolar')]
+    depois = [('accounts', '0004_user_campos_normalizados')]
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+        super().tearDown()
+
+    def _usuarios_antigos(self, *dados):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.antes)
+        UserAntigo = executor.loader.project_state(self.antes).apps.get_model('accounts', 'User')
+        return [UserAntigo.objects.create(username=nome, email=email, password='x') for nome, email in dados]
+
+    def test_nomes_que_so_diferem_em_maiusculas(self):
+        ana, ana_maiuscula, ana2 = self._usuarios_antigos(
+            ('ana', 'ana@etec.sp.gov.br'), ('ANA', 'ana.b@etec.sp.gov.br'), ('ana2', 'ana2@etec.sp.gov.br'),
+        )
+        MigrationExecutor(connection).migrate(self.depois)
+
+        self.assertEqual(
+            dict(User.objects.values_list('pk', 'username_normalizado')),
+            {ana.pk: 'ana', ana_maiuscula.pk: 'ana3', ana2.pk: 'ana2'},
+        )
+        usuario = User.objects.get(pk=ana_maiuscula.pk)
+        self.assertEqual(usuario.username, 'ANA3')
+        usuario.save()  # o save recalcula as cópias sem bater no índice único
+
+    def test_emails_repetidos_param_a_migracao(self):
+        primeira, segunda = self._usuarios_antigos(
+            ('bia', 'bia@etec.sp.gov.br'), ('bia.silva', 'Bia@etec.sp.gov.br'),
+        )
+        with self.assertRaisesMessage(RuntimeError, f'bia@etec.sp.gov.br: usuários {primeira.pk}, {segunda.pk}'):
+            MigrationExecutor(connection).migrate(self.depois)
+
+        # Depois de corrigir o e-mail a migração passa
+        type(segunda).objects.filter(pk=segunda.pk).update(email='bia.silva@etec.sp.gov.br')
+        MigrationExecutor(connection).migrate(self.depois)
+        self.assertEqual(User.objects.get(pk=segunda.pk).email_normalizado, 'bia.silva@etec.sp.gov.br')
@@ -14,4 +14,7 @@ urlpatterns = [
     path('verify-code/', views.verify_code, name='verify_code'),
     path('create-account/', views.create_account, name='create_account'),
     path('check-session/', views.check_session, name='check_session'),
+    
+    # Verificação das contas criadas em lote
+    path('verificar-email/<str:token>/', views.verificar_email, name='verificar_email'),
 ]
\ No newline at end of file
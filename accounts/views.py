@@ -1,6 +1,8 @@
 from django.shortcuts import render, redirect
 from django.contrib.auth import authenticate, login, logout
 from django.contrib import messages
+from django.contrib.auth.forms import SetPasswordForm
+from django.db import transaction
 from django.http import JsonResponse
 from django.views.decorators.http import require_http_methods
 from django.core.mail import send_mail
@@ -9,7 +11,9 @@ from datetime import timedelta
 import json
 import random
 import re
+from .matricula import marcar_verificado, usuario_do_token, verificacao_pendente
 from .models import User
+from .provisionamento import EmailJaCadastrado, criar_usuario
 
 
 # ========================================
@@ -34,7 +38,7 @@ def login_view(request):
             
             # Buscar usuário pelo e-mail
             try:
-                user_obj = User.objects.get(email__iexact=credential)
+                user_obj = User.objects.get(email_normalizado=User.normalizar(credential))
                 user = authenticate(request, username=user_obj.username, password=password)
             except User.DoesNotExist:
                 user = None
@@ -42,11 +46,17 @@ def login_view(request):
             # É um nome de usuário
             user = authenticate(request, username=credential, password=password)
 
+        if user is not None and verificacao_pendente(user):
+            # Conta da matrícula em lote: o primeiro acesso é pelo link do e-mail
+            messages.error(request, 'Confirme seu e-mail pelo link que enviamos antes de entrar.')
+            return redirect('accounts:login')
+
         if user is not None:
+            # Primeiro login: last_login ainda vazio (login() preenche)
+            primeiro_login = user.last_login is None
             login(request, user)
             
-            # Verificar se é primeiro login
-            if not hasattr(user, 'perfil') or user.perfil.last_login_date is None:
+            if primeiro_login:
                 messages.success(
                     request, 
                     '🎉 Seja bem-vindo ao StudyMate! Suas informações pessoais podem ser '
@@ -269,31 +279,15 @@ def create_account(request):
                 'error': 'A senha não atende aos requisitos mínimos de segurança.'
             }, status=400)
 
-        # Verificar duplicidade (novamente)
-        if User.objects.filter(email=email).exists():
+        # Criar usuário (username derivado do e-mail, sem repetir; ver accounts/provisionamento.py)
+        try:
+            user = criar_usuario(email=email, password=password, user_type=user_type)
+        except EmailJaCadastrado:
             return JsonResponse({
                 'success': False,
                 'error': 'Este e-mail já está registrado.'
             }, status=400)
 
-        # Criar username a partir do e-mail
-        username = email.split('@')[0]
-        
-        # Garantir unicidade do username
-        base_username = username
-        counter = 1
-        while User.objects.filter(username=username).exists():
-            username = f"{base_username}{counter}"
-            counter += 1
-
-        # Criar usuário
-        user = User.objects.create_user(
-            username=username,
-            email=email,
-            password=password,
-            user_type=user_type
-        )
-
         # Fazer login automático
         login(request, user)
 
@@ -347,4 +341,28 @@ def check_session(request):
         'email': email,
         'user_type': user_type,
         'expires_at': expires_at_str
-    })
\ No newline at end of file
+    })
+
+# ========================================
+# VERIFICAR E-MAIL (CONTAS CRIADAS PELO COMANDO enroll)
+# ========================================
+@require_http_methods(["GET", "POST"])
+def verificar_email(request, token):
+    """
+    Link enviado no e-mail de verificação das contas matriculadas em lote:
+    o usuário define a senha e o e-mail fica confirmado
+    """
+    usuario = usuario_do_token(token)
+    if usuario is None:
+        messages.error(request, 'Link de verificação inválido, expirado ou já usado.')
+        return redirect('accounts:login')
+
+    form = SetPasswordForm(usuario, request.POST or None)
+    if request.method == 'POST' and form.is_valid():
+        with transaction.atomic():
+            form.save()
+            marcar_verificado(usuario)
+        messages.success(request, f'E-mail confirmado! Entre com o usuário {usuario.username} e a senha que você definiu.')
+        return redirect('accounts:login')
+
+    return render(request, 'accounts/definir_senha.html', {'form': form, 'usuario': usuario})
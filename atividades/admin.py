@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Atividade, AtividadeVisualizacao, AtividadeEnvio, AtividadeSalva
+from .models import Atividade, AtividadeVisualizacao, AtividadeEnvio, AtividadeSalva, EnvioParcial, LembretePrazo
 
 
 @admin.register(Atividade)
@@ -10,11 +10,12 @@ class AtividadeAdmin(admin.ModelAdmin):
         'tipo', 
         'get_anos_destino_display', 
         'prazo_entrega', 
+        'situacao',
         'total_visualizacoes',
         'total_envios',
         'criado_em'
     )
-    list_filter = ('tipo', 'ano_1', 'ano_2', 'ano_3', 'todos', 'permite_envio', 'criado_em')
+    list_filter = ('tipo', 'situacao', 'ano_1', 'ano_2', 'ano_3', 'todos', 'permite_envio', 'criado_em')
     search_fields = ('titulo', 'descricao', 'professor__username')
     readonly_fields = ('criado_em', 'visualizacoes', 'foi_visualizado')
     date_hierarchy = 'criado_em'
@@ -92,4 +93,21 @@ class AtividadeSalvaAdmin(admin.ModelAdmin):
     list_filter = ('salva_em',)
     search_fields = ('aluno__username', 'atividade__titulo')
     readonly_fields = ('salva_em',)
-    date_hierarchy = 'salva_em'
\ No newline at end of file
+    date_hierarchy = 'salva_em'
+
+
+@admin.register(LembretePrazo)
+class LembretePrazoAdmin(admin.ModelAdmin):
+    list_display = ('aluno', 'atividade', 'criado_em', 'enviado_em')
+    list_filter = ('enviado_em', 'criado_em')
+    search_fields = ('aluno__username', 'atividade__titulo')
+    readonly_fields = ('criado_em', 'enviado_em')
+    date_hierarchy = 'criado_em'
+
+
+@admin.register(EnvioParcial)
+class EnvioParcialAdmin(admin.ModelAdmin):
+    list_display = ('aluno', 'atividade', 'nome_arquivo', 'tamanho', 'envio', 'atualizado_em')
+    list_filter = ('criado_em',)
+    search_fields = ('aluno__username', 'atividade__titulo', 'nome_arquivo')
+    readonly_fields = ('id', 'sha256', 'tamanho_bloco', 'criado_em', 'atualizado_em')
@@ -4,4 +4,7 @@ from django.apps import AppConfig
 class AtividadesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'atividades'
-    verbose_name = 'Atividades Acadêmicas'
\ No newline at end of file
+    verbose_name = 'Atividades Acadêmicas'
+
+    def ready(self):
+        from . import signals  # noqa: F401
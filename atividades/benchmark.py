@@ -0,0 +1,102 @@
+"""
+Apoio aos comandos de benchmark das atividades.
+
+Tudo roda em um banco de testes criado na hora (nunca no banco do projeto)
+e com MEDIA_ROOT temporário; ao sair, banco e arquivos são descartados.
+"""
+import os
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from accounts.models import User
+from .models import Atividade
+
+
+@contextmanager
+def ambiente_temporario(arquivo_banco=None):
+    """
+    Cria o banco de testes (em memória no SQLite, ou no arquivo informado)
+    e um MEDIA_ROOT temporário enquanto o bloco estiver ativo. Os blocos dos
+    envios em blocos também vão para dentro dele.
+    """
+    conexao = connections[DEFAULT_DB_ALIAS]
+    nome_original = conexao.settings_dict['NAME']
+    teste_original = dict(conexao.settings_dict['TEST'])
+    if arquivo_banco:
+        conexao.settings_dict['TEST']['NAME'] = str(arquivo_banco)
+
+    media = tempfile.mkdtemp(prefix='studymate_benchmark_')
+    try:
+        # 'testserver' é o host usado pelo Client/RequestFactory
+        with override_settings(
+            MEDIA_ROOT=media,
+            ATIVIDADES_UPLOAD_PARCIAL_DIR=os.path.join(media, 'uploads_parciais'),
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+        ):
+            conexao.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            try:
+                yield conexao
+            finally:
+                conexao.creation.destroy_test_db(nome_original, verbosity=0)
+    finally:
+        conexao.settings_dict['TEST'] = teste_original
+        shutil.rmtree(media, ignore_errors=True)
+
+
+def criar_usuarios(quantidade, user_type='aluno', prefixo='aluno'):
+    """Usuários sintéticos criados em lote (mesma senha para todos)"""
+    senha = make_password('benchmark123')
+    User.objects.bulk_create([
+        User(username=f'{prefixo}{i}', password=senha, user_type=user_type,
+             ano_escolar=(i % 3) + 1 if user_type == 'aluno' else None)
+        for i in range(quantidade)
+    ], batch_size=500)
+    return list(User.objects.filter(username__startswith=prefixo, user_type=user_type).order_by('pk'))
+
+
+def criar_atividades(professor, quantidade, com_anexo=True, prazo=None):
+    """Atividades sintéticas; com anexo o full_clean() também valida o arquivo"""
+    prazo = prazo or timezone.now() + timedelta(days=7)
+    atividades = []
+    for i in range(quantidade):
+        atividade = Atividade(
+            professor=professor,
+            titulo=f'Atividade {i}',
+            descricao='Gerada para benchmark',
+            tipo='ATIVIDADE',
+            todos=True,
+            prazo_entrega=prazo,
+        )
+        if com_anexo:
+            atividade.anexo.save(f'benchmark_{i}.pdf', ContentFile(b'%PDF-1.4\n' + b'0' * 2048), save=False)
+        atividade.save()
+        atividades.append(atividade)
+    return atividades
+
+
+def percentil(amostras, p):
+    """Percentil p (0-100) por interpolação linear sobre as amostras"""
+    if not amostras:
+        return 0.0
+    ordenadas = sorted(amostras)
+    posicao = (len(ordenadas) - 1) * p / 100
+    inferior = int(posicao)
+    superior = min(inferior + 1, len(ordenadas) - 1)
+    return ordenadas[inferior] + (ordenadas[superior] - ordenadas[inferior]) * (posicao - inferior)
+
+
+def cronometrar(funcao, *args, **kwargs):
+    """Executa a função e devolve (resultado, segundos)"""
+    inicio = time.perf_counter()
+    resultado = funcao(*args, **kwargs)
+    return resultado, time.perf_counter() - inicio
@@ -0,0 +1,173 @@
+"""
+Feed iCalendar (.ics) com os prazos de atividades e os avisos de prova.
+
+Cada usuário assina uma URL com token assinado (aplicativos de agenda não
+fazem login). O ETag/Last-Modified vem de uma versão guardada no cache,
+incrementada pelos sinais quando uma atividade muda (ver atividades/signals.py):
+enquanto nada muda, as consultas periódicas dos aplicativos recebem 304
+sem acessar o banco.
+
+Em produção com vários processos o cache precisa ser compartilhado
+(Redis/Memcached) para que todos vejam a mesma versão.
+"""
+import hashlib
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.core import signing
+from django.core.cache import cache
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import User
+from .models import Atividade
+
+SALT_TOKEN = 'atividades.calendario'
+CHAVE_VERSAO = 'atividades:calendario:versao'
+FEED_CACHE_TIMEOUT = 60 * 60 * 24  # o conteúdo só muda junto com a versão
+
+# Eventos encerrados há mais tempo que isso saem do feed
+DIAS_HISTORICO = 30
+
+TIPOS_NO_CALENDARIO = ('ATIVIDADE', 'AVISO_PROVA')
+
+
+def gerar_token(usuario):
+    return signing.dumps(usuario.pk, salt=SALT_TOKEN, compress=True)
+
+
+def ler_token(token):
+    """Id do usuário do token, ou None se o token for inválido"""
+    try:
+        return int(signing.loads(token, salt=SALT_TOKEN))
+    except (signing.BadSignature, TypeError, ValueError):
+        return None
+
+
+def versao_atual():
+    """Momento (timestamp) da última alteração relevante para o calendário"""
+    versao = cache.get(CHAVE_VERSAO)
+    if versao is None:
+        # Cache vazio (reinício): começa uma nova versão
+        versao = int(time.time())
+        cache.add(CHAVE_VERSAO, versao, None)
+        versao = cache.get(CHAVE_VERSAO, versao)
+    return versao
+
+
+def nova_versao():
+    """Versões são segundos inteiros e sempre crescem, para o Last-Modified mudar"""
+    anterior = cache.get(CHAVE_VERSAO) or 0
+    cache.set(CHAVE_VERSAO, max(int(time.time()), anterior + 1), None)
+
+
+def etag_feed(request, token):
+    usuario_id = ler_token(token)
+    if usuario_id is None:
+        return None
+    return hashlib.md5(f'{versao_atual()}:{usuario_id}'.encode()).hexdigest()
+
+
+def ultima_modificacao_feed(request, token):
+    if ler_token(token) is None:
+        return None
+    return datetime.fromtimestamp(versao_atual(), tz=dt_timezone.utc)
+
+
+def eventos_do_usuario(usuario):
+    """Atividades com prazo do usuário (alunos pelo público-alvo, professores as suas)"""
+    atividades = Atividade.objects.filter(
+        tipo__in=TIPOS_NO_CALENDARIO,
+        prazo_entrega__gte=timezone.now() - timedelta(days=DIAS_HISTORICO),
+    )
+    if usuario.user_type == 'aluno':
+        if usuario.ano_escolar:
+            atividades = atividades.filter(publico__in=Atividade.mascaras_do_ano(usuario.ano_escolar))
+    else:
+        atividades = atividades.filter(professor=usuario)
+    return atividades.only('pk', 'titulo', 'descricao', 'tipo', 'prazo_entrega', 'criado_em').order_by('prazo_entrega')
+
+
+def _escapar(texto):
+    return (
+        str(texto).replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+        .replace('\r\n', '\\n').replace('\n', '\\n')
+    )
+
+
+def _dobrar(linha):
+    """Quebra linhas em 75 octetos, como pede a RFC 5545"""
+    dados = linha.encode('utf-8')
+    if len(dados) <= 75:
+        return linha
+    partes = []
+    while dados:
+        limite = 75 if not partes else 74
+        corte = min(limite, len(dados))
+        # Não corta no meio de um caractere UTF-8
+        while corte < len(dados) and (dados[corte] & 0xC0) == 0x80:
+            corte -= 1
+        partes.append(dados[:corte].decode('utf-8'))
+        dados = dados[corte:]
+    return '\r\n '.join(partes)
+
+
+def _data_utc(valor):
+    return valor.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def gerar_ics(usuario, base_url):
+    """Conteúdo do calendário do usuário"""
+    agora = _data_utc(timezone.now())
+    linhas = [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        'PRODID:-//StudyMate//Atividades//PT-BR',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        'X-WR-CALNAME:StudyMate - Prazos',
+        'X-PUBLISHED-TTL:PT15M',
+    ]
+    for atividade in eventos_do_usuario(usuario):
+        prova = atividade.tipo == 'AVISO_PROVA'
+        prefixo = 'Prova' if prova else 'Prazo'
+        url = base_url + reverse('atividades:detalhe', args=[atividade.pk])
+        linhas += [
+            'BEGIN:VEVENT',
+            f'UID:atividade-{atividade.pk}@studymate',
+            f'DTSTAMP:{agora}',
+            f'CREATED:{_data_utc(atividade.criado_em)}',
+            f'DTSTART:{_data_utc(atividade.prazo_entrega)}',
+            f'DTEND:{_data_utc(atividade.prazo_entrega)}',
+            f'SUMMARY:{_escapar(f"[{prefixo}] {atividade.titulo}")}',
+            f'DESCRIPTION:{_escapar(atividade.descricao or "Atividade acadêmica")}',
+            f'URL:{url}',
+            'BEGIN:VALARM',
+            'ACTION:DISPLAY',
+            f'DESCRIPTION:{_escapar(atividade.titulo)}',
+            'TRIGGER:-PT24H',
+            'END:VALARM',
+            'END:VEVENT',
+        ]
+    linhas.append('END:VCALENDAR')
+    return '\r\n'.join(_dobrar(linha) for linha in linhas) + '\r\n'
+
+
+def feed_do_token(token, base_url):
+    """
+    Conteúdo do feed do token (None se inválido), em cache por versão:
+    clientes sem cabeçalhos condicionais também não consultam o banco.
+    """
+    usuario_id = ler_token(token)
+    if usuario_id is None:
+        return None
+
+    chave = f'atividades:calendario:{versao_atual()}:{usuario_id}'
+    conteudo = cache.get(chave)
+    if conteudo is None:
+        usuario = User.objects.filter(pk=usuario_id, is_active=True).first()
+        if usuario is None:
+            return None
+        conteudo = gerar_ics(usuario, base_url)
+        cache.set(chave, conteudo, FEED_CACHE_TIMEOUT)
+    return conteudo
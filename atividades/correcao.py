@@ -0,0 +1,147 @@
+"""
+Correção em lote dos envios de uma atividade.
+
+As correções (envio_id, nota, feedback, status) chegam em lote, seja por
+JSON ou por planilha CSV exportada/reimportada pelo professor, e são
+gravadas com um único bulk_update dentro de uma transação.
+
+Envio com nota lançada fica CORRIGIDA mesmo que a linha traga status
+ENVIADA (ou nenhum): a planilha exportada repete o status atual em cada
+linha, e o professor que só preenche a nota não precisa mexer nele.
+"""
+import csv
+import io
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import AtividadeEnvio
+
+NOTA_MINIMA = Decimal('0')
+NOTA_MAXIMA = Decimal('10')
+
+COLUNAS_PLANILHA = ['envio_id', 'aluno', 'arquivo', 'enviado_em', 'status', 'nota', 'feedback']
+
+
+def _converter_nota(valor):
+    """Aceita número, '8.5' ou '8,5'; vazio significa sem nota"""
+    if valor is None or str(valor).strip() == '':
+        return None
+    try:
+        nota = Decimal(str(valor).strip().replace(',', '.'))
+        if not nota.is_finite():
+            # NaN/Infinity: comparar com os limites levantaria InvalidOperation
+            raise InvalidOperation
+        nota = nota.quantize(Decimal('0.01'))
+    except InvalidOperation:
+        raise ValueError(f'Nota inválida: {valor}')
+    if not NOTA_MINIMA <= nota <= NOTA_MAXIMA:
+        raise ValueError(f'A nota deve estar entre {NOTA_MINIMA} e {NOTA_MAXIMA}.')
+    return nota
+
+
+def aplicar_correcoes(atividade, linhas):
+    """
+    Valida e aplica as correções. Se alguma linha for inválida nada é
+    gravado e a lista de erros é devolvida.
+    Retorna (total_atualizados, erros).
+    """
+    status_validos = {codigo for codigo, _ in AtividadeEnvio.STATUS_CHOICES}
+    envios = atividade.envios.in_bulk([
+        int(linha['envio_id']) for linha in linhas
+        if isinstance(linha, dict) and str(linha.get('envio_id', '')).isdigit()
+    ])
+
+    erros = []
+    alterados = {}
+    for numero, linha in enumerate(linhas, start=1):
+        if not isinstance(linha, dict):
+            erros.append(f'Linha {numero}: a correção deve ser um objeto com envio_id.')
+            continue
+
+        envio_id = linha.get('envio_id')
+        envio = envios.get(int(envio_id)) if str(envio_id).isdigit() else None
+        if envio is None:
+            erros.append(f'Linha {numero}: envio {envio_id} não pertence a esta atividade.')
+            continue
+
+        try:
+            if 'nota' in linha:
+                envio.nota = _converter_nota(linha['nota'])
+        except ValueError as e:
+            erros.append(f'Linha {numero}: {e}')
+            continue
+
+        if 'feedback' in linha:
+            envio.feedback = str(linha['feedback'] or '').strip()
+
+        status = linha.get('status') or ''
+        if not isinstance(status, str):
+            erros.append(f'Linha {numero}: status inválido "{status}".')
+            continue
+        status = status.strip().upper()
+        if status and status not in status_validos:
+            erros.append(f'Linha {numero}: status inválido "{status}".')
+            continue
+        if envio.nota is not None and status in ('', 'ENVIADA'):
+            # Envio com nota lançada conta como corrigido (ver o docstring do módulo)
+            status = 'CORRIGIDA'
+        if status:
+            envio.status = status
+
+        alterados[envio.pk] = envio
+
+    if erros:
+        return 0, erros
+
+    with transaction.atomic():
+        AtividadeEnvio.objects.bulk_update(
+            list(alterados.values()), ['nota', 'feedback', 'status'], batch_size=500
+        )
+
+    return len(alterados), []
+
+
+def exportar_planilha(atividade):
+    """CSV com os envios da atividade para correção offline"""
+    saida = io.StringIO()
+    escritor = csv.writer(saida, delimiter=';')
+    escritor.writerow(COLUNAS_PLANILHA)
+
+    envios = atividade.envios.select_related('aluno').order_by('aluno__username')
+    for envio in envios:
+        escritor.writerow([
+            envio.pk,
+            envio.aluno.username,
+            envio.arquivo.name,
+            timezone.localtime(envio.enviado_em).strftime('%d/%m/%Y %H:%M'),
+            envio.status,
+            str(envio.nota).replace('.', ',') if envio.nota is not None else '',
+            envio.feedback,
+        ])
+
+    # BOM para o Excel abrir acentos corretamente
+    return '\ufeff' + saida.getvalue()
+
+
+def ler_planilha(arquivo):
+    """
+    Lê o CSV reenviado pelo professor e devolve as linhas de correção.
+    Aceita ';' (Excel pt-BR) ou ',' como separador.
+    """
+    conteudo = arquivo.read().decode('utf-8-sig')
+    try:
+        dialeto = csv.Sniffer().sniff(conteudo.splitlines()[0], delimiters=';,')
+    except (csv.Error, IndexError):
+        dialeto = csv.excel
+
+    linhas = []
+    for registro in csv.DictReader(io.StringIO(conteudo), dialect=dialeto):
+        linhas.append({
+            'envio_id': (registro.get('envio_id') or '').strip(),
+            'nota': registro.get('nota', ''),
+            'feedback': registro.get('feedback', ''),
+            'status': registro.get('status', ''),
+        })
+    return linhas
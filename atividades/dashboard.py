@@ -0,0 +1,94 @@
+"""
+Consultas do painel do professor.
+
+`atividades_com_metricas` devolve todas as atividades do professor com
+visualizações, envios, correções pendentes e a divisão no prazo/atrasado
+em uma única consulta agrupada. `serie_envios` monta a série diária da
+taxa de envio de uma atividade e fica em cache até o próximo envio ou
+visualização (ver atividades/signals.py).
+"""
+from django.core.cache import cache
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce, TruncDate
+
+from .models import Atividade, AtividadeEnvio, AtividadeVisualizacao
+
+SERIE_CACHE_TIMEOUT = 60 * 60  # 1 hora
+
+
+def atividades_com_metricas(professor):
+    """Atividades do professor anotadas com as métricas do painel"""
+    visualizacoes = AtividadeVisualizacao.objects.filter(
+        atividade=OuterRef('pk')
+    ).order_by().values('atividade').annotate(total=Count('pk')).values('total')
+
+    return Atividade.objects.filter(professor=professor).annotate(
+        total_visualizacoes=Coalesce(Subquery(visualizacoes, output_field=IntegerField()), 0),
+        total_envios=Count('envios'),
+        envios_pendentes=Count('envios', filter=Q(envios__status='ENVIADA')),
+        envios_no_prazo=Count('envios', filter=(
+            Q(prazo_entrega__isnull=True) | Q(envios__enviado_em__lte=F('prazo_entrega'))
+        )),
+        envios_atrasados=Count('envios', filter=Q(envios__enviado_em__gt=F('prazo_entrega'))),
+    ).order_by('-criado_em')
+
+
+def resumo_painel(atividades):
+    """Totais gerais a partir das atividades já anotadas (sem nova consulta)"""
+    campos = ['total_visualizacoes', 'total_envios', 'envios_pendentes', 'envios_no_prazo', 'envios_atrasados']
+    resumo = {campo: 0 for campo in campos}
+    for atividade in atividades:
+        for campo in campos:
+            resumo[campo] += getattr(atividade, campo)
+    resumo['total_atividades'] = len(atividades)
+    return resumo
+
+
+def _chave_serie(atividade_id):
+    return f'atividades:serie_envios:{atividade_id}'
+
+
+def invalidar_serie(atividade_id):
+    """Remove a série em cache de uma atividade"""
+    cache.delete(_chave_serie(atividade_id))
+
+
+def serie_envios(atividade):
+    """
+    Série diária de envios da atividade: envios no dia, acumulado e taxa
+    de envio (envios acumulados / alunos que visualizaram até o dia).
+    """
+    chave = _chave_serie(atividade.pk)
+    serie = cache.get(chave)
+    if serie is not None:
+        return serie
+
+    envios_por_dia = dict(
+        AtividadeEnvio.objects.filter(atividade=atividade)
+        .annotate(dia=TruncDate('enviado_em'))
+        .order_by().values('dia').annotate(total=Count('pk'))
+        .values_list('dia', 'total')
+    )
+    visualizacoes_por_dia = dict(
+        AtividadeVisualizacao.objects.filter(atividade=atividade)
+        .annotate(dia=TruncDate('visualizado_em'))
+        .order_by().values('dia').annotate(total=Count('pk'))
+        .values_list('dia', 'total')
+    )
+
+    serie = []
+    envios_acumulados = 0
+    visualizacoes_acumuladas = 0
+    for dia in sorted(set(envios_por_dia) | set(visualizacoes_por_dia)):
+        envios_acumulados += envios_por_dia.get(dia, 0)
+        visualizacoes_acumuladas += visualizacoes_por_dia.get(dia, 0)
+        serie.append({
+            'dia': dia.isoformat(),
+            'envios': envios_por_dia.get(dia, 0),
+            'envios_acumulados': envios_acumulados,
+            'visualizacoes_acumuladas': visualizacoes_acumuladas,
+            'taxa_envio': round(envios_acumulados / visualizacoes_acumuladas, 4) if visualizacoes_acumuladas else 0,
+        })
+
+    cache.set(chave, serie, SERIE_CACHE_TIMEOUT)
+    return serie
@@ -0,0 +1,125 @@
+"""
+Exportação dos envios de uma atividade em um único ZIP.
+
+O ZIP é gerado sob demanda enquanto é transmitido: cada arquivo é lido em
+blocos e os bytes comprimidos são repassados para a resposta assim que
+ficam prontos, então a memória usada não depende do tamanho da turma.
+"""
+import csv
+import io
+import os
+import zipfile
+
+from django.utils import timezone
+
+from .models import Atividade
+
+# Formatos que já são comprimidos: guardar sem recomprimir
+EXTENSOES_SEM_COMPRESSAO = {'.jpg', '.jpeg', '.png', '.zip', '.docx'}
+
+
+class _BufferZip:
+    """
+    Destino de escrita do ZipFile que só acumula bytes até serem drenados.
+    Sem seek(), o zipfile grava em modo streaming (data descriptors).
+    """
+
+    def __init__(self):
+        self._partes = []
+        self._posicao = 0
+
+    def write(self, dados):
+        self._partes.append(bytes(dados))
+        self._posicao += len(dados)
+        return len(dados)
+
+    def tell(self):
+        return self._posicao
+
+    def flush(self):
+        pass
+
+    def drenar(self):
+        dados = b''.join(self._partes)
+        self._partes.clear()
+        return dados
+
+
+def _nome_entrada(envio, usados):
+    """Nome da entrada no ZIP: <aluno>_<nome original>, sem repetir"""
+    original = os.path.basename(envio.arquivo.name)
+    nome = f'{envio.aluno.username}_{original}'.replace('/', '_').replace('\\', '_')
+
+    base, extensao = os.path.splitext(nome)
+    contador = 1
+    while nome in usados:
+        nome = f'{base}_{contador}{extensao}'
+        contador += 1
+    usados.add(nome)
+    return nome
+
+
+def envios_para_exportar(atividade, apenas_novos=False):
+    """Envios da atividade, opcionalmente só os posteriores à última exportação"""
+    envios = atividade.envios.select_related('aluno').order_by('aluno__username')
+    if apenas_novos and atividade.envios_exportados_em:
+        envios = envios.filter(enviado_em__gt=atividade.envios_exportados_em)
+    return envios
+
+
+def gerar_zip_envios(atividade, apenas_novos=False):
+    """
+    Gerador com os bytes do ZIP dos envios + manifesto.csv.
+    Exportações só de novos, ao terminar, registram o momento do corte na
+    atividade (a próxima exportação de novos começa dali); a exportação
+    completa não mexe no registro.
+    """
+    corte = timezone.now()
+    envios = envios_para_exportar(atividade, apenas_novos).filter(enviado_em__lte=corte)
+
+    buffer = _BufferZip()
+    manifesto = io.StringIO()
+    escritor = csv.writer(manifesto)
+    escritor.writerow(['aluno', 'arquivo', 'enviado_em', 'status', 'nota', 'situacao_prazo'])
+
+    usados = set()
+    with zipfile.ZipFile(buffer, 'w') as zf:
+        for envio in envios.iterator(chunk_size=100):
+            nome = _nome_entrada(envio, usados)
+            enviado_em = timezone.localtime(envio.enviado_em)
+            nota = '' if envio.nota is None else envio.nota  # nota zero não é "sem nota"
+
+            if atividade.prazo_entrega and envio.enviado_em > atividade.prazo_entrega:
+                situacao_prazo = 'atrasado'
+            else:
+                situacao_prazo = 'no prazo'
+
+            try:
+                origem = envio.arquivo.open('rb')
+            except FileNotFoundError:
+                escritor.writerow([envio.aluno.username, '(arquivo ausente)', enviado_em.isoformat(),
+                                   envio.get_status_display(), nota, situacao_prazo])
+                continue
+
+            info = zipfile.ZipInfo(nome, date_time=enviado_em.timetuple()[:6])
+            extensao = os.path.splitext(nome)[1].lower()
+            if extensao in EXTENSOES_SEM_COMPRESSAO:
+                info.compress_type = zipfile.ZIP_STORED
+            else:
+                info.compress_type = zipfile.ZIP_DEFLATED
+
+            with origem, zf.open(info, 'w', force_zip64=True) as destino:
+                for bloco in origem.chunks():
+                    destino.write(bloco)
+                    yield buffer.drenar()
+            yield buffer.drenar()
+
+            escritor.writerow([envio.aluno.username, nome, enviado_em.isoformat(),
+                               envio.get_status_display(), nota, situacao_prazo])
+
+        zf.writestr('manifesto.csv', manifesto.getvalue().encode('utf-8-sig'))
+
+    yield buffer.drenar()
+
+    if apenas_novos:
+        Atividade.objects.filter(pk=atividade.pk).update(envios_exportados_em=corte)
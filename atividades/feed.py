@@ -0,0 +1,168 @@
+"""
+Feed de atividades do aluno.
+
+Monta a lista de atividades com as informações do aluno (visualizou, salvou,
+envio) em consultas anotadas, sem consultas por linha, e pagina por cursor
+(keyset) sobre a ordenação escolhida. O cursor é assinado e os valores
+voltam pelo to_python do campo, então um cursor adulterado só é ignorado.
+
+Na ordem 'views' o cursor é estável só enquanto os contadores não mudam:
+uma atividade que ganha visualizações entre uma página e outra pode subir
+para antes do cursor (some da próxima página) ou, se perder a posição para
+outras, aparecer de novo. É aceito para um feed; as demais ordens usam
+campos que não mudam com o uso.
+"""
+from django.core import signing
+from django.core.exceptions import ValidationError
+from django.db.models import Exists, F, OuterRef, Prefetch, Q
+from django.utils import timezone
+
+from .models import Atividade, AtividadeEnvio, AtividadeSalva, AtividadeVisualizacao
+
+TAMANHO_PAGINA = 20
+SALT_CURSOR = 'atividades.feed'
+
+# ordem -> (campo, decrescente); o desempate é sempre pelo id no mesmo sentido
+ORDENACOES = {
+    'recent': ('criado_em', True),
+    'views': ('visualizacoes', True),
+    'deadline': ('prazo_entrega', False),
+    'saved': ('criado_em', True),
+}
+
+# Campos que podem ser nulos ficam no fim da ordenação
+CAMPOS_NULOS = {'prazo_entrega'}
+
+
+def codificar_cursor(valor, pk):
+    """Gera o token do cursor a partir da última atividade da página"""
+    if hasattr(valor, 'isoformat'):
+        valor = valor.isoformat()
+    return signing.dumps([valor, pk], salt=SALT_CURSOR)
+
+
+def decodificar_cursor(token, campo):
+    """Retorna (valor, pk) do cursor ou None se o token for inválido"""
+    try:
+        valor, pk = signing.loads(token, salt=SALT_CURSOR)
+        valor = Atividade._meta.get_field(campo).to_python(valor)
+        return valor, Atividade._meta.pk.to_python(pk)
+    except (signing.BadSignature, ValidationError, ValueError, TypeError):
+        return None
+
+
+def _filtro_cursor(campo, decrescente, valor, pk):
+    """Condição keyset: tudo que vem depois de (valor, pk) na ordenação"""
+    if valor is None:
+        # Só campos nulos chegam aqui, e os nulos estão no fim
+        return Q(**{f'{campo}__isnull': True, 'pk__gt': pk})
+
+    if decrescente:
+        filtro = Q(**{f'{campo}__lt': valor}) | Q(**{campo: valor, 'pk__lt': pk})
+    else:
+        filtro = Q(**{f'{campo}__gt': valor}) | Q(**{campo: valor, 'pk__gt': pk})
+
+    if campo in CAMPOS_NULOS:
+        filtro |= Q(**{f'{campo}__isnull': True})
+    return filtro
+
+
+def _ordenacao(campo, decrescente):
+    if decrescente:
+        return [F(campo).desc(nulls_last=True), '-pk']
+    return [F(campo).asc(nulls_last=True), 'pk']
+
+
+def atividades_do_aluno(aluno):
+    """
+    Queryset base de atividades anotado com o estado do aluno.
+    Alunos com ano cadastrado só recebem atividades do seu ano ou de todos.
+    """
+    atividades = Atividade.objects.all()
+    if aluno.ano_escolar:
+        atividades = atividades.filter(publico__in=Atividade.mascaras_do_ano(aluno.ano_escolar))
+
+    return atividades.select_related('professor').annotate(
+        visualizou=Exists(AtividadeVisualizacao.objects.filter(
+            atividade=OuterRef('pk'), aluno=aluno
+        )),
+        salvou=Exists(AtividadeSalva.objects.filter(
+            atividade=OuterRef('pk'), aluno=aluno
+        )),
+        enviou=Exists(AtividadeEnvio.objects.filter(
+            atividade=OuterRef('pk'), aluno=aluno
+        )),
+    )
+
+
+def _filtrar(aluno, tipo, status, order):
+    """Retorna (atividades filtradas, campo, decrescente) para os filtros do feed"""
+    atividades = atividades_do_aluno(aluno)
+
+    if tipo:
+        atividades = atividades.filter(tipo=tipo)
+
+    if status == 'pendentes':
+        # situacao é mantida pelo agendador_prazos (ver atividades/prazos.py) e só
+        # adianta o corte; o prazo continua conferido aqui caso o agendador atrase
+        atividades = atividades.filter(
+            Q(prazo_entrega__gte=timezone.now()) | Q(prazo_entrega__isnull=True),
+            enviou=False,
+        ).exclude(situacao='ENCERRADA')
+    elif status == 'enviadas':
+        atividades = atividades.filter(enviou=True)
+    elif status == 'abertas':
+        atividades = atividades.filter(enviou=False)
+
+    if order not in ORDENACOES:
+        order = 'recent'
+    if order == 'saved':
+        atividades = atividades.filter(salvou=True)
+
+    campo, decrescente = ORDENACOES[order]
+    return atividades, campo, decrescente
+
+
+def total_feed(aluno, tipo='', status='', order='recent'):
+    """Quantas atividades o feed tem com esses filtros (todas as páginas)"""
+    return _filtrar(aluno, tipo, status, order)[0].count()
+
+
+def feed_aluno(aluno, tipo='', status='', order='recent', cursor=None, tamanho=TAMANHO_PAGINA):
+    """
+    Retorna (itens, proximo_cursor) para uma página do feed do aluno.
+    São sempre duas consultas por página: as atividades anotadas e o
+    prefetch dos envios do aluno.
+    """
+    atividades, campo, decrescente = _filtrar(aluno, tipo, status, order)
+
+    if cursor:
+        posicao = decodificar_cursor(cursor, campo)
+        if posicao:
+            atividades = atividades.filter(_filtro_cursor(campo, decrescente, *posicao))
+
+    atividades = atividades.order_by(*_ordenacao(campo, decrescente)).prefetch_related(
+        Prefetch(
+            'envios',
+            queryset=AtividadeEnvio.objects.filter(aluno=aluno),
+            to_attr='envios_do_aluno',
+        )
+    )
+
+    pagina = list(atividades[:tamanho + 1])
+    tem_mais = len(pagina) > tamanho
+    pagina = pagina[:tamanho]
+
+    itens = [{
+        'atividade': atividade,
+        'visualizou': atividade.visualizou,
+        'envio': atividade.envios_do_aluno[0] if atividade.envios_do_aluno else None,
+        'salvou': atividade.salvou,
+    } for atividade in pagina]
+
+    proximo_cursor = None
+    if tem_mais:
+        ultima = pagina[-1]
+        proximo_cursor = codificar_cursor(getattr(ultima, campo), ultima.pk)
+
+    return itens, proximo_cursor
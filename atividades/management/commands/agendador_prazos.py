@@ -0,0 +1,114 @@
+import os
+import signal
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from django.utils import timezone
+
+from atividades.prazos import (
+    AgendaPrazos, atualizar_situacoes, enviar_lembretes, horizonte_padrao, processar_evento,
+)
+
+ARQUIVO_TRAVA = os.path.join(tempfile.gettempdir(), 'studymate_agendador_prazos.lock')
+
+
+class Command(BaseCommand):
+    help = (
+        'Processo único e contínuo que encerra atividades no prazo, mantém a '
+        'situação (aberta/encerrando/encerrada) e envia lembretes a quem não enviou'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--intervalo',
+            type=int,
+            default=60,
+            help='Segundos entre recargas da agenda e atualizações em lote da situação',
+        )
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=200,
+            help='Lembretes enviados por conexão de e-mail',
+        )
+        parser.add_argument(
+            '--uma-vez',
+            action='store_true',
+            help='Executa um único ciclo e termina (útil em cron ou testes)',
+        )
+        parser.add_argument(
+            '--forcar',
+            action='store_true',
+            help='Ignora a trava de outra instância (use só se ela não estiver rodando)',
+        )
+
+    def handle(self, *args, **options):
+        self._travar(options['forcar'])
+        # SIGTERM encerra pelo mesmo caminho do Ctrl+C, liberando a trava
+        signal.signal(signal.SIGTERM, self._interromper)
+        try:
+            self._executar(options['intervalo'], options['lote'], options['uma_vez'])
+        except KeyboardInterrupt:
+            self.stdout.write('Agendador encerrado.')
+        finally:
+            self._destravar()
+
+    def _interromper(self, *args):
+        raise KeyboardInterrupt
+
+    def _executar(self, intervalo, lote, uma_vez):
+        agenda = AgendaPrazos()
+        horizonte = horizonte_padrao(intervalo)
+        proxima_recarga = 0
+
+        while True:
+            close_old_connections()
+
+            if time.monotonic() >= proxima_recarga:
+                alteradas = atualizar_situacoes()
+                agenda.carregar(horizonte)
+                proxima_recarga = time.monotonic() + intervalo
+                if alteradas:
+                    self.stdout.write(f'{alteradas} atividade(s) com situação atualizada.')
+
+            for atividade_id, evento, prazo in agenda.vencidos():
+                resultado = processar_evento(atividade_id, evento, prazo)
+                self.stdout.write(f'Atividade {atividade_id}: {evento} ({resultado}).')
+
+            while True:
+                enviados = enviar_lembretes(lote)
+                if enviados:
+                    self.stdout.write(f'{enviados} lembrete(s) enviado(s).')
+                if enviados < lote:
+                    break
+
+            if uma_vez:
+                return
+
+            espera = proxima_recarga - time.monotonic()
+            proximo = agenda.proximo()
+            if proximo is not None:
+                espera = min(espera, (proximo - timezone.now()).total_seconds())
+            time.sleep(max(espera, 1))
+
+    def _travar(self, forcar):
+        """Garante uma única instância do agendador por máquina"""
+        try:
+            descritor = os.open(ARQUIVO_TRAVA, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            if not forcar:
+                raise CommandError(
+                    f'Outro agendador parece estar rodando (trava em {ARQUIVO_TRAVA}). '
+                    'Se não estiver, use --forcar.'
+                )
+            descritor = os.open(ARQUIVO_TRAVA, os.O_WRONLY | os.O_TRUNC)
+        with os.fdopen(descritor, 'w') as arquivo:
+            arquivo.write(str(os.getpid()))
+
+    def _destravar(self):
+        try:
+            os.remove(ARQUIVO_TRAVA)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,68 @@
+from django.core.management.base import BaseCommand
+
+from atividades.benchmark import ambiente_temporario, criar_atividades, criar_usuarios, cronometrar, percentil
+from atividades.models import Atividade
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede o Atividade.save() de uma flag (foi_visualizado) com full_clean() '
+        'em todo save, como era antes, e com a validação seletiva'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--saves', type=int, default=1000, help='Saves por cenário')
+        parser.add_argument('--atividades', type=int, default=5, help='Atividades sintéticas')
+
+    def handle(self, *args, **options):
+        with ambiente_temporario():
+            professor = criar_usuarios(1, user_type='professor', prefixo='professor')[0]
+            pks = [atividade.pk for atividade in criar_atividades(professor, options['atividades'])]
+            rodadas = max(1, options['saves'] // len(pks))
+
+            def medir(salvar):
+                # Instância recém-carregada a cada save, como numa requisição
+                tempos = []
+                for _ in range(rodadas):
+                    for pk in pks:
+                        atividade = Atividade.objects.get(pk=pk)
+                        atividade.foi_visualizado = not atividade.foi_visualizado
+                        _, segundos = cronometrar(salvar, atividade)
+                        tempos.append(segundos)
+                return tempos
+
+            def sempre_valida(atividade):
+                atividade.full_clean()
+                atividade.save(update_fields=['foi_visualizado'])
+
+            def seletiva_update_fields(atividade):
+                atividade.save(update_fields=['foi_visualizado'])
+
+            def seletiva_save_completo(atividade):
+                atividade.save()
+
+            medir(sempre_valida)  # aquecimento
+            antes = medir(sempre_valida)
+            com_update_fields = medir(seletiva_update_fields)
+            completo = medir(seletiva_save_completo)
+
+        self.stdout.write("Atividade.save() mudando só foi_visualizado:")
+        self._relatorio('  full_clean() em todo save', antes)
+        self._relatorio("  seletiva, update_fields=['foi_visualizado']", com_update_fields)
+        self._ganho(antes, com_update_fields)
+        self._relatorio('  seletiva, save() completo (compara com o snapshot)', completo)
+        self._ganho(antes, completo)
+
+    def _ganho(self, antes, depois):
+        ganho = (sum(antes) / sum(depois) - 1) * 100 if sum(depois) else 0
+        self.stdout.write(self.style.SUCCESS(f'  Ganho de vazão: {ganho:+.1f}%'))
+
+    def _relatorio(self, titulo, tempos):
+        total = sum(tempos)
+        self.stdout.write(
+            f'{titulo}: {len(tempos)} saves em {total:.2f}s '
+            f'({len(tempos) / total:.0f} saves/s) | '
+            f'p50 {percentil(tempos, 50) * 1000:.2f}ms '
+            f'p95 {percentil(tempos, 95) * 1000:.2f}ms '
+            f'p99 {percentil(tempos, 99) * 1000:.2f}ms'
+        )
@@ -0,0 +1,208 @@
+import hashlib
+import logging
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from atividades.benchmark import ambiente_temporario, criar_atividades, criar_usuarios, percentil
+from atividades.models import AtividadeEnvio, EnvioParcial
+
+
+class Command(BaseCommand):
+    help = (
+        'Teste de carga do envio de atividades perto do prazo: gera alunos e '
+        'atividades em um SQLite temporário e simula envios concorrentes'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--alunos', type=int, default=200, help='Alunos sintéticos (divididos entre os 3 anos)')
+        parser.add_argument('--atividades', type=int, default=3, help='Atividades com prazo nos próximos minutos')
+        parser.add_argument(
+            '--concorrencia',
+            default='1,8,32',
+            help='Lista de quantidades de envios simultâneos a testar (ex.: 1,8,32)',
+        )
+        parser.add_argument(
+            '--modo',
+            choices=['simples', 'blocos', 'ambos'],
+            default='simples',
+            help='simples = POST multipart único; blocos = iniciar/blocos/finalizar',
+        )
+        parser.add_argument('--tamanho-kb', type=int, default=512, help='Tamanho de cada arquivo enviado')
+        parser.add_argument(
+            '--janela',
+            type=float,
+            default=0,
+            help='Espalha as chegadas aleatoriamente em N segundos (0 = todos de uma vez)',
+        )
+        parser.add_argument('--wal', action='store_true', help='Usa journal_mode=WAL no banco temporário')
+        parser.add_argument(
+            '--timeout-sqlite',
+            type=float,
+            help='Timeout (s) de espera pela trava do SQLite em cada conexão',
+        )
+        parser.add_argument('--semente', type=int, default=42, help='Semente para chegadas reprodutíveis')
+
+    def handle(self, *args, **options):
+        try:
+            niveis = [int(valor) for valor in options['concorrencia'].split(',') if valor.strip()]
+        except ValueError:
+            raise CommandError('--concorrencia deve ser uma lista de inteiros, ex.: 1,8,32')
+        modos = ['simples', 'blocos'] if options['modo'] == 'ambos' else [options['modo']]
+
+        # Erros esperados (ex.: banco travado) são contados, não logados um a um
+        logger = logging.getLogger('django.request')
+        nivel_log = logger.level
+        logger.setLevel(logging.CRITICAL)
+
+        pasta = tempfile.mkdtemp(prefix='studymate_carga_')
+        try:
+            with ambiente_temporario(arquivo_banco=os.path.join(pasta, 'carga.sqlite3')) as conexao:
+                if conexao.vendor != 'sqlite':
+                    raise CommandError('O teste de carga foi feito para o SQLite do projeto.')
+                self._configurar_sqlite(conexao, options)
+
+                professor = criar_usuarios(1, user_type='professor', prefixo='professor')[0]
+                alunos = criar_usuarios(options['alunos'])
+                atividades = criar_atividades(
+                    professor, options['atividades'], com_anexo=False,
+                    prazo=timezone.now() + timedelta(minutes=10),
+                )
+                self.stdout.write(
+                    f'Dados sintéticos: {len(alunos)} alunos, {len(atividades)} atividades '
+                    f'(prazo em 10 min), arquivos de {options["tamanho_kb"]}KB, '
+                    f'journal={"WAL" if options["wal"] else "padrão"}'
+                )
+
+                clientes = self._clientes(alunos)
+                conteudo = os.urandom(options['tamanho_kb'] * 1024)
+                envios = [(clientes[aluno.pk], atividade.pk) for atividade in atividades for aluno in alunos]
+
+                for modo in modos:
+                    for nivel in niveis:
+                        self._limpar_envios()
+                        resultado = self._rodada(envios, conteudo, modo, nivel, options)
+                        self._relatorio(modo, nivel, resultado)
+                connections.close_all()
+        finally:
+            shutil.rmtree(pasta, ignore_errors=True)
+            logger.setLevel(nivel_log)
+
+    def _configurar_sqlite(self, conexao, options):
+        if options['wal']:
+            with conexao.cursor() as cursor:
+                cursor.execute('PRAGMA journal_mode=WAL')
+        if options['timeout_sqlite'] is not None:
+            # Vale para as conexões abertas depois daqui (uma por thread)
+            connections.settings[conexao.alias].setdefault('OPTIONS', {})['timeout'] = options['timeout_sqlite']
+            conexao.settings_dict.setdefault('OPTIONS', {})['timeout'] = options['timeout_sqlite']
+            conexao.close()
+
+    def _clientes(self, alunos):
+        """Um cliente autenticado por aluno (login fora da medição)"""
+        clientes = {}
+        for aluno in alunos:
+            cliente = Client(raise_request_exception=True)
+            cliente.force_login(aluno)
+            clientes[aluno.pk] = cliente
+        return clientes
+
+    def _limpar_envios(self):
+        for envio in AtividadeEnvio.objects.all():
+            envio.arquivo.delete(save=False)
+        AtividadeEnvio.objects.all().delete()
+        EnvioParcial.objects.all().delete()
+
+    def _rodada(self, envios, conteudo, modo, nivel, options):
+        aleatorio = random.Random(options['semente'])
+        ordem = list(envios)
+        aleatorio.shuffle(ordem)
+        chegadas = sorted(aleatorio.uniform(0, options['janela']) for _ in ordem)
+
+        enviar = self._envio_simples if modo == 'simples' else self._envio_blocos
+        sha256 = hashlib.sha256(conteudo).hexdigest()
+        trava = threading.Lock()
+        resultado = {'latencias': [], 'ok': 0, 'travas': 0, 'erros': 0}
+        inicio = time.perf_counter()
+
+        def tarefa(item):
+            (cliente, atividade_id), chegada = item
+            espera = inicio + chegada - time.perf_counter()
+            if espera > 0:
+                time.sleep(espera)
+
+            comeco = time.perf_counter()
+            try:
+                sucesso = enviar(cliente, atividade_id, conteudo, sha256)
+                chave = 'ok' if sucesso else 'erros'
+            except OperationalError as e:
+                chave = 'travas' if 'locked' in str(e) else 'erros'
+            except Exception:
+                chave = 'erros'
+            finally:
+                connections.close_all()
+            latencia = time.perf_counter() - comeco
+
+            with trava:
+                resultado[chave] += 1
+                resultado['latencias'].append(latencia)
+
+        with ThreadPoolExecutor(max_workers=nivel) as executor:
+            list(executor.map(tarefa, zip(ordem, chegadas)))
+
+        resultado['duracao'] = time.perf_counter() - inicio
+        return resultado
+
+    def _envio_simples(self, cliente, atividade_id, conteudo, sha256):
+        resposta = cliente.post(
+            reverse('atividades:enviar', args=[atividade_id]),
+            {'arquivo': SimpleUploadedFile('resposta.pdf', conteudo, content_type='application/pdf')},
+        )
+        return resposta.status_code == 200
+
+    def _envio_blocos(self, cliente, atividade_id, conteudo, sha256):
+        resposta = cliente.post(
+            reverse('atividades:envio_blocos_iniciar', args=[atividade_id]),
+            {'nome': 'resposta.pdf', 'tamanho': len(conteudo), 'sha256': sha256},
+            content_type='application/json',
+        )
+        if resposta.status_code != 200:
+            return False
+        dados = resposta.json()
+        tamanho_bloco = dados['tamanho_bloco']
+        for indice in dados['faltando']:
+            resposta = cliente.put(
+                reverse('atividades:envio_blocos_bloco', args=[dados['upload_id'], indice]),
+                conteudo[indice * tamanho_bloco:(indice + 1) * tamanho_bloco],
+                content_type='application/octet-stream',
+            )
+            if resposta.status_code != 200:
+                return False
+        resposta = cliente.post(reverse('atividades:envio_blocos_finalizar', args=[dados['upload_id']]))
+        return resposta.status_code == 200
+
+    def _relatorio(self, modo, nivel, resultado):
+        latencias = resultado['latencias']
+        vazao = resultado['ok'] / resultado['duracao'] if resultado['duracao'] else 0
+        linha = (
+            f'[{modo:7}] concorrência {nivel:3}: {resultado["ok"]} ok, '
+            f'{resultado["travas"]} "database is locked", {resultado["erros"]} outros erros | '
+            f'p50 {percentil(latencias, 50) * 1000:.0f}ms '
+            f'p95 {percentil(latencias, 95) * 1000:.0f}ms '
+            f'p99 {percentil(latencias, 99) * 1000:.0f}ms | '
+            f'{vazao:.1f} envios/s'
+        )
+        estilo = self.style.ERROR if resultado['travas'] else self.style.SUCCESS
+        self.stdout.write(estilo(linha))
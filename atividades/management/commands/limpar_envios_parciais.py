@@ -0,0 +1,23 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from atividades.uploads import limpar_envios_abandonados
+
+
+class Command(BaseCommand):
+    help = 'Remove envios em blocos parados há muito tempo e os registros dos já finalizados'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--horas',
+            type=int,
+            default=24,
+            help='Remove envios sem novos blocos há mais de N horas',
+        )
+
+    def handle(self, *args, **options):
+        antes_de = timezone.now() - timedelta(hours=options['horas'])
+        total = limpar_envios_abandonados(antes_de)
+        self.stdout.write(self.style.SUCCESS(f'{total} envio(s) em blocos removido(s).'))
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:28
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def preencher_publico(apps, schema_editor):
+    Atividade = apps.get_model('atividades', 'Atividade')
+    for atividade in Atividade.objects.only('ano_1', 'ano_2', 'ano_3', 'todos'):
+        if atividade.todos:
+            publico = 7
+        else:
+            publico = (1 if atividade.ano_1 else 0) | (2 if atividade.ano_2 else 0) | (4 if atividade.ano_3 else 0)
+        Atividade.objects.filter(pk=atividade.pk).update(publico=publico)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('atividades', '0003_alter_atividade_professor_alter_atividadeenvio_aluno_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='atividade',
+            name='publico',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, verbose_name='Público-alvo (máscara de anos)'),
+        ),
+        migrations.RunPython(preencher_publico, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='atividade',
+            index=models.Index(fields=['publico', '-criado_em'], name='atividades__publico_399955_idx'),
+        ),
+    ]
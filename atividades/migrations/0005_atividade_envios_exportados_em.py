@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('atividades', '0004_atividade_publico'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='atividade',
+            name='envios_exportados_em',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Envios exportados em'),
+        ),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:36
+
+from datetime import timedelta
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def preencher_situacao(apps, schema_editor):
+    Atividade = apps.get_model('atividades', 'Atividade')
+    agora = timezone.now()
+    limite = agora + timedelta(hours=getattr(settings, 'ATIVIDADES_PRAZO_ENCERRANDO_HORAS', 24))
+    Atividade.objects.filter(prazo_entrega__lte=agora).update(situacao='ENCERRADA')
+    Atividade.objects.filter(prazo_entrega__gt=agora, prazo_entrega__lte=limite).update(situacao='ENCERRANDO')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('atividades', '0005_atividade_envios_exportados_em'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LembretePrazo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('criado_em', models.DateTimeField(auto_now_add=True, verbose_name='Criado em')),
+                ('enviado_em', models.DateTimeField(blank=True, null=True, verbose_name='Enviado em')),
+            ],
+            options={
+                'verbose_name': 'Lembrete de Prazo',
+                'verbose_name_plural': 'Lembretes de Prazo',
+                'ordering': ['-criado_em'],
+            },
+        ),
+        migrations.AddField(
+            model_name='atividade',
+            name='situacao',
+            field=models.CharField(choices=[('ABERTA', 'Aberta'), ('ENCERRANDO', 'Encerrando'), ('ENCERRADA', 'Encerrada')], default='ABERTA', editable=False, max_length=10, verbose_name='Situação do Prazo'),
+        ),
+        migrations.RunPython(preencher_situacao, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='atividade',
+            index=models.Index(fields=['situacao', 'prazo_entrega'], name='atividades__situaca_b29894_idx'),
+        ),
+        migrations.AddField(
+            model_name='lembreteprazo',
+            name='aluno',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='Aluno'),
+        ),
+        migrations.AddField(
+            model_name='lembreteprazo',
+            name='atividade',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lembretes', to='atividades.atividade', verbose_name='Atividade'),
+        ),
+        migrations.AddIndex(
+            model_name='lembreteprazo',
+            index=models.Index(fields=['enviado_em', 'criado_em'], name='atividades__enviado_1f8207_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='lembreteprazo',
+            unique_together={('atividade', 'aluno')},
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:38
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('atividades', '0006_atividade_situacao_lembreteprazo'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EnvioParcial',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('nome_arquivo', models.CharField(max_length=255, verbose_name='Nome do Arquivo')),
+                ('tamanho', models.PositiveIntegerField(verbose_name='Tamanho (bytes)')),
+                ('tamanho_bloco', models.PositiveIntegerField(verbose_name='Tamanho do Bloco (bytes)')),
+                ('sha256', models.CharField(max_length=64, verbose_name='SHA-256')),
+                ('criado_em', models.DateTimeField(auto_now_add=True, verbose_name='Iniciado em')),
+                ('atualizado_em', models.DateTimeField(auto_now=True, verbose_name='Atualizado em')),
+                ('aluno', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='Aluno')),
+                ('atividade', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='envios_parciais', to='atividades.atividade', verbose_name='Atividade')),
+                ('envio', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='envio_parcial', to='atividades.atividadeenvio', verbose_name='Envio Finalizado')),
+            ],
+            options={
+                'verbose_name': 'Envio Parcial',
+                'verbose_name_plural': 'Envios Parciais',
+                'ordering': ['-criado_em'],
+                'indexes': [models.Index(fields=['atividade', 'aluno'], name='atividades__ativida_e41dd9_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:42
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('atividades', '0007_envioparcial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='atividade',
+            index=models.Index(fields=['publico', 'prazo_entrega'], name='atividades__publico_bce28e_idx'),
+        ),
+    ]
@@ -1,8 +1,12 @@
 from django.db import models
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 from django.core.exceptions import ValidationError
+from datetime import timedelta
+import math
 import os
+import uuid
 
 User = get_user_model()
 
@@ -22,6 +26,11 @@ def validate_file_extension_atividade(file):
         raise ValidationError(f'Extensão {ext} não permitida. Use: {", ".join(allowed)}')
 
 
+def janela_encerramento():
+    """Antecedência em que a atividade passa a 'encerrando' e os lembretes saem"""
+    return timedelta(hours=getattr(settings, 'ATIVIDADES_PRAZO_ENCERRANDO_HORAS', 24))
+
+
 class Atividade(models.Model):
     """
     Modelo para atividades acadêmicas criadas por professores
@@ -33,6 +42,12 @@ class Atividade(models.Model):
         ('AVISO_SIMPLES', 'Aviso Simples'),
     ]
     
+    SITUACAO_CHOICES = [
+        ('ABERTA', 'Aberta'),
+        ('ENCERRANDO', 'Encerrando'),
+        ('ENCERRADA', 'Encerrada'),
+    ]
+    
     ANO_CHOICES = [
         ('1', '1º Ano'),
         ('2', '2º Ano'),
@@ -40,6 +55,18 @@ class Atividade(models.Model):
         ('TODOS', 'Todos'),
     ]
     
+    # Público-alvo normalizado: um bit por ano (ano -> bit)
+    PUBLICO_BITS = {1: 1, 2: 2, 3: 4}
+    PUBLICO_TODOS = 7
+    
+    # Campos verificados por full_clean()/clean(); alterações só em outros
+    # campos (contadores, flags) não precisam de nova validação
+    CAMPOS_VALIDADOS = (
+        'professor', 'titulo', 'descricao', 'tipo',
+        'ano_1', 'ano_2', 'ano_3', 'todos',
+        'prazo_entrega', 'permite_envio', 'anexo',
+    )
+    
     # CORRIGIDO: Remover limit_choices_to que estava causando o erro
     professor = models.ForeignKey(
         User, 
@@ -60,10 +87,23 @@ class Atividade(models.Model):
     ano_2 = models.BooleanField(default=False, verbose_name='2º Ano')
     ano_3 = models.BooleanField(default=False, verbose_name='3º Ano')
     todos = models.BooleanField(default=False, verbose_name='Todos os Anos')
+    publico = models.PositiveSmallIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Público-alvo (máscara de anos)'
+    )
     
     # Configurações
     prazo_entrega = models.DateTimeField(null=True, blank=True, verbose_name='Prazo de Entrega')
     permite_envio = models.BooleanField(default=True, verbose_name='Permite Envio pelo Aluno')
+    # Mantida pelo agendador_prazos; evita comparar prazos com now() a cada listagem
+    situacao = models.CharField(
+        max_length=10,
+        choices=SITUACAO_CHOICES,
+        default='ABERTA',
+        editable=False,
+        verbose_name='Situação do Prazo'
+    )
     
     # Anexo opcional
     anexo = models.FileField(
@@ -78,15 +118,90 @@ class Atividade(models.Model):
     criado_em = models.DateTimeField(default=timezone.now, verbose_name='Criado em')
     visualizacoes = models.PositiveIntegerField(default=0, verbose_name='Visualizações')
     foi_visualizado = models.BooleanField(default=False, verbose_name='Foi Visualizado por Algum Aluno')
+    envios_exportados_em = models.DateTimeField(null=True, blank=True, editable=False, verbose_name='Envios exportados em')
     
     class Meta:
         verbose_name = 'Atividade'
         verbose_name_plural = 'Atividades'
         ordering = ['-criado_em']
+        indexes = [
+            models.Index(fields=['publico', '-criado_em']),
+            models.Index(fields=['situacao', 'prazo_entrega']),
+            models.Index(fields=['publico', 'prazo_entrega']),
+        ]
     
     def __str__(self):
         return f"{self.titulo} - {self.professor.username}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        instancia._valores_validados = instancia._capturar_validados()
+        return instancia
+    
+    def _capturar_validados(self):
+        """Valores atuais dos campos validados (campos adiados ficam de fora)"""
+        adiados = self.get_deferred_fields()
+        valores = {}
+        for nome in self.CAMPOS_VALIDADOS:
+            campo = self._meta.get_field(nome)
+            if campo.attname in adiados:
+                continue
+            valor = getattr(self, campo.attname)
+            if nome == 'anexo':
+                # Compara pelo nome: um arquivo novo ainda não salvo também difere
+                valor = (valor.name, getattr(valor, '_committed', True))
+            valores[nome] = valor
+        return valores
+    
+    def _precisa_validar(self, update_fields=None):
+        """
+        full_clean() só roda na criação ou quando algum campo validado
+        mudou desde que a instância foi carregada/salva.
+        """
+        if self._state.adding:
+            return True
+        if update_fields is not None and not set(update_fields) & set(self.CAMPOS_VALIDADOS):
+            return False
+        anteriores = getattr(self, '_valores_validados', None)
+        if anteriores is None:
+            return True
+        return self._capturar_validados() != anteriores
+    
+    @staticmethod
+    def mascaras_do_ano(ano):
+        """
+        Valores de `publico` que incluem o ano informado.
+        Como só existem 7 combinações, o filtro publico__in vira uma
+        busca direta no índice.
+        """
+        bit = Atividade.PUBLICO_BITS[ano]
+        return [mascara for mascara in range(1, Atividade.PUBLICO_TODOS + 1) if mascara & bit]
+    
+    def calcular_publico(self):
+        """Converte os checkboxes de público-alvo na máscara de bits"""
+        if self.todos:
+            return self.PUBLICO_TODOS
+        mascara = 0
+        if self.ano_1:
+            mascara |= self.PUBLICO_BITS[1]
+        if self.ano_2:
+            mascara |= self.PUBLICO_BITS[2]
+        if self.ano_3:
+            mascara |= self.PUBLICO_BITS[3]
+        return mascara
+    
+    def calcular_situacao(self, agora=None):
+        """Situação do prazo no momento informado (padrão: agora)"""
+        if not self.prazo_entrega:
+            return 'ABERTA'
+        agora = agora or timezone.now()
+        if self.prazo_entrega <= agora:
+            return 'ENCERRADA'
+        if self.prazo_entrega <= agora + janela_encerramento():
+            return 'ENCERRANDO'
+        return 'ABERTA'
+    
     def clean(self):
         """Validações customizadas"""
         # Aviso de prova e aviso simples não permitem envio
@@ -102,8 +217,21 @@ class Atividade(models.Model):
             raise ValidationError('Apenas professores podem criar atividades.')
     
     def save(self, *args, **kwargs):
-        self.full_clean()
+        update_fields = kwargs.get('update_fields')
+        if self._precisa_validar(update_fields):
+            self.full_clean()
+        self.publico = self.calcular_publico()
+        self.situacao = self.calcular_situacao()
+        if update_fields is not None:
+            extras = set()
+            if {'ano_1', 'ano_2', 'ano_3', 'todos'} & set(update_fields):
+                extras.add('publico')
+            if 'prazo_entrega' in update_fields:
+                extras.add('situacao')
+            if extras:
+                kwargs['update_fields'] = set(update_fields) | extras
         super().save(*args, **kwargs)
+        self._valores_validados = self._capturar_validados()
     
     def get_anos_destino(self):
         """Retorna lista de anos para quem a atividade é destinada"""
@@ -224,6 +352,61 @@ class AtividadeEnvio(models.Model):
         return f"{self.aluno.username} - {self.atividade.titulo}"
 
 
+class EnvioParcial(models.Model):
+    """
+    Envio de atividade recebido em blocos (upload retomável).
+    Os blocos ficam em ATIVIDADES_UPLOAD_PARCIAL_DIR até a finalização,
+    que monta o arquivo, confere o SHA-256 e cria o AtividadeEnvio.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    atividade = models.ForeignKey(
+        Atividade,
+        on_delete=models.CASCADE,
+        related_name='envios_parciais',
+        verbose_name='Atividade'
+    )
+    aluno = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='Aluno'
+    )
+    nome_arquivo = models.CharField(max_length=255, verbose_name='Nome do Arquivo')
+    tamanho = models.PositiveIntegerField(verbose_name='Tamanho (bytes)')
+    tamanho_bloco = models.PositiveIntegerField(verbose_name='Tamanho do Bloco (bytes)')
+    sha256 = models.CharField(max_length=64, verbose_name='SHA-256')
+    envio = models.OneToOneField(
+        AtividadeEnvio,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='envio_parcial',
+        verbose_name='Envio Finalizado'
+    )
+    criado_em = models.DateTimeField(auto_now_add=True, verbose_name='Iniciado em')
+    atualizado_em = models.DateTimeField(auto_now=True, verbose_name='Atualizado em')
+    
+    class Meta:
+        verbose_name = 'Envio Parcial'
+        verbose_name_plural = 'Envios Parciais'
+        ordering = ['-criado_em']
+        indexes = [
+            models.Index(fields=['atividade', 'aluno']),
+        ]
+    
+    def __str__(self):
+        return f"{self.aluno.username} - {self.nome_arquivo} ({self.atividade.titulo})"
+    
+    @property
+    def total_blocos(self):
+        return max(1, math.ceil(self.tamanho / self.tamanho_bloco))
+    
+    def tamanho_do_bloco(self, indice):
+        """Tamanho esperado do bloco (o último pode ser menor)"""
+        if indice == self.total_blocos - 1:
+            return self.tamanho - self.tamanho_bloco * indice
+        return self.tamanho_bloco
+
+
 class AtividadeSalva(models.Model):
     """
     Atividades salvas pelo aluno para acesso rápido
@@ -247,4 +430,36 @@ class AtividadeSalva(models.Model):
         ordering = ['-salva_em']
     
     def __str__(self):
-        return f"{self.aluno.username} salvou {self.atividade.titulo}"
\ No newline at end of file
+        return f"{self.aluno.username} salvou {self.atividade.titulo}"
+
+
+class LembretePrazo(models.Model):
+    """
+    Lembrete de prazo enfileirado para um aluno que ainda não enviou a
+    atividade. Criado e enviado pelo comando agendador_prazos.
+    """
+    atividade = models.ForeignKey(
+        Atividade,
+        on_delete=models.CASCADE,
+        related_name='lembretes',
+        verbose_name='Atividade'
+    )
+    aluno = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='Aluno'
+    )
+    criado_em = models.DateTimeField(auto_now_add=True, verbose_name='Criado em')
+    enviado_em = models.DateTimeField(null=True, blank=True, verbose_name='Enviado em')
+    
+    class Meta:
+        unique_together = ('atividade', 'aluno')
+        verbose_name = 'Lembrete de Prazo'
+        verbose_name_plural = 'Lembretes de Prazo'
+        ordering = ['-criado_em']
+        indexes = [
+            models.Index(fields=['enviado_em', 'criado_em']),
+        ]
+    
+    def __str__(self):
+        return f"Lembrete para {self.aluno.username} - {self.atividade.titulo}"
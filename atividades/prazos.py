@@ -0,0 +1,198 @@
+"""
+Agendamento dos prazos das atividades.
+
+O comando agendador_prazos roda como um único processo de longa duração:
+mantém uma fila de prioridade (min-heap) com os próximos eventos de prazo
+(início da janela de encerramento e encerramento), atualiza a coluna
+`situacao` em lote e enfileira/envia lembretes aos alunos que ainda não
+enviaram a atividade.
+"""
+import heapq
+import smtplib
+from datetime import timedelta
+
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from accounts.models import User
+from .models import Atividade, AtividadeEnvio, LembretePrazo, janela_encerramento
+
+EVENTO_LEMBRETE = 'lembrete'
+EVENTO_ENCERRAR = 'encerrar'
+
+
+def atualizar_situacoes(agora=None):
+    """
+    Recalcula a situação de todas as atividades em três UPDATEs.
+    Só altera linhas cuja situação mudou; retorna quantas foram alteradas.
+    """
+    agora = agora or timezone.now()
+    limite = agora + janela_encerramento()
+
+    alteradas = Atividade.objects.filter(prazo_entrega__lte=agora).exclude(
+        situacao='ENCERRADA'
+    ).update(situacao='ENCERRADA')
+    alteradas += Atividade.objects.filter(prazo_entrega__gt=agora, prazo_entrega__lte=limite).exclude(
+        situacao='ENCERRANDO'
+    ).update(situacao='ENCERRANDO')
+    # Prazo removido ou prorrogado volta a ficar aberto
+    alteradas += Atividade.objects.filter(
+        Q(prazo_entrega__isnull=True) | Q(prazo_entrega__gt=limite)
+    ).exclude(situacao='ABERTA').update(situacao='ABERTA')
+    return alteradas
+
+
+def alunos_sem_envio(atividade):
+    """Alunos do público-alvo da atividade que ainda não enviaram resposta"""
+    alunos = User.objects.filter(user_type='aluno', is_active=True)
+    if atividade.publico != Atividade.PUBLICO_TODOS:
+        anos = [ano for ano, bit in Atividade.PUBLICO_BITS.items() if atividade.publico & bit]
+        # Alunos sem ano cadastrado veem todas as atividades (ver feed.py)
+        alunos = alunos.filter(Q(ano_escolar__in=anos) | Q(ano_escolar__isnull=True))
+    return alunos.exclude(Exists(AtividadeEnvio.objects.filter(atividade=atividade, aluno=OuterRef('pk'))))
+
+
+def enfileirar_lembretes(atividade):
+    """Cria um lembrete por aluno sem envio; lembretes já existentes são ignorados"""
+    lembretes = [
+        LembretePrazo(atividade=atividade, aluno_id=aluno_id)
+        for aluno_id in alunos_sem_envio(atividade).values_list('pk', flat=True)
+    ]
+    LembretePrazo.objects.bulk_create(lembretes, ignore_conflicts=True, batch_size=500)
+    return len(lembretes)
+
+
+def enviar_lembretes(lote=200):
+    """
+    Envia um lote de lembretes pendentes por e-mail (uma conexão SMTP).
+    Lembretes de quem enviou a atividade depois de enfileirado, ou de
+    atividades já encerradas, são apenas marcados como processados.
+    Só os e-mails aceitos pelo servidor (ou com destinatário recusado, que
+    não adianta repetir) são marcados; se o servidor falhar, o resto do
+    lote fica pendente para a próxima rodada.
+    Retorna quantos e-mails foram enviados.
+    """
+    pendentes = list(
+        LembretePrazo.objects.filter(enviado_em__isnull=True)
+        .select_related('atividade', 'aluno')
+        .order_by('criado_em')[:lote]
+    )
+    if not pendentes:
+        return 0
+
+    ja_enviaram = set(AtividadeEnvio.objects.filter(
+        atividade_id__in={lembrete.atividade_id for lembrete in pendentes},
+        aluno_id__in={lembrete.aluno_id for lembrete in pendentes},
+    ).values_list('atividade_id', 'aluno_id'))
+
+    processados = []
+    mensagens = []
+    for lembrete in pendentes:
+        atividade = lembrete.atividade
+        if (lembrete.atividade_id, lembrete.aluno_id) in ja_enviaram:
+            processados.append(lembrete.pk)
+            continue
+        if atividade.situacao == 'ENCERRADA' or not lembrete.aluno.email:
+            processados.append(lembrete.pk)
+            continue
+        prazo = timezone.localtime(atividade.prazo_entrega)
+        mensagens.append((lembrete, EmailMessage(
+            f'Lembrete de prazo: {atividade.titulo} - StudyMate',
+            f'Olá, {lembrete.aluno.first_name or lembrete.aluno.username}!\n\n'
+            f'A atividade "{atividade.titulo}" encerra em {prazo:%d/%m/%Y às %H:%M} '
+            f'e ainda não recebemos o seu envio.',
+            'noreply@studymate.com',
+            [lembrete.aluno.email],
+        )))
+
+    enviados = 0
+    if mensagens:
+        try:
+            with get_connection() as conexao:
+                for lembrete, mensagem in mensagens:
+                    try:
+                        conexao.send_messages([mensagem])
+                    except smtplib.SMTPRecipientsRefused:
+                        processados.append(lembrete.pk)
+                        continue
+                    processados.append(lembrete.pk)
+                    enviados += 1
+        except (smtplib.SMTPException, OSError):
+            pass  # servidor indisponível: o que não foi entregue continua pendente
+
+    LembretePrazo.objects.filter(pk__in=processados).update(enviado_em=timezone.now())
+    return enviados
+
+
+class AgendaPrazos:
+    """
+    Fila de prioridade dos eventos de prazo: (quando, atividade_id, evento, prazo).
+    O prazo vai junto para descartar entradas obsoletas quando a atividade
+    é editada; a recarga periódica agenda o novo prazo.
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._agendados = set()
+        # Eventos já disparados, para a recarga não agendá-los de novo
+        self._processados = set()
+
+    def __len__(self):
+        return len(self._heap)
+
+    def agendar(self, atividade_id, prazo):
+        for quando, evento in ((prazo - janela_encerramento(), EVENTO_LEMBRETE), (prazo, EVENTO_ENCERRAR)):
+            chave = (atividade_id, evento, prazo)
+            if chave in self._agendados or chave in self._processados:
+                continue
+            self._agendados.add(chave)
+            heapq.heappush(self._heap, (quando, atividade_id, evento, prazo))
+
+    def carregar(self, horizonte, agora=None):
+        """Agenda as atividades não encerradas com prazo até agora + horizonte"""
+        agora = agora or timezone.now()
+        limite = agora + janela_encerramento() + horizonte
+        self._processados = {chave for chave in self._processados if chave[2] > agora}
+        atividades = Atividade.objects.filter(
+            prazo_entrega__gt=agora, prazo_entrega__lte=limite
+        ).exclude(situacao='ENCERRADA').values_list('pk', 'prazo_entrega')
+        for atividade_id, prazo in atividades:
+            self.agendar(atividade_id, prazo)
+
+    def proximo(self):
+        """Momento do próximo evento, ou None se a fila estiver vazia"""
+        return self._heap[0][0] if self._heap else None
+
+    def vencidos(self, agora=None):
+        """Retira da fila e devolve os eventos cujo horário já chegou"""
+        agora = agora or timezone.now()
+        eventos = []
+        while self._heap and self._heap[0][0] <= agora:
+            _, atividade_id, evento, prazo = heapq.heappop(self._heap)
+            self._agendados.discard((atividade_id, evento, prazo))
+            self._processados.add((atividade_id, evento, prazo))
+            eventos.append((atividade_id, evento, prazo))
+        return eventos
+
+
+def processar_evento(atividade_id, evento, prazo):
+    """
+    Aplica um evento da agenda. Se a atividade foi excluída ou teve o
+    prazo alterado, o evento é ignorado.
+    """
+    atividades = Atividade.objects.filter(pk=atividade_id, prazo_entrega=prazo)
+
+    if evento == EVENTO_ENCERRAR:
+        return atividades.exclude(situacao='ENCERRADA').update(situacao='ENCERRADA')
+
+    atividades.filter(situacao='ABERTA').update(situacao='ENCERRANDO')
+    atividade = atividades.first()
+    if atividade is None or not atividade.permite_envio:
+        return 0
+    return enfileirar_lembretes(atividade)
+
+
+def horizonte_padrao(intervalo_recarga):
+    """Antecedência com que a agenda carrega prazos: duas recargas"""
+    return timedelta(seconds=intervalo_recarga * 2)
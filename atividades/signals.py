@@ -0,0 +1,57 @@
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.dispatch import receiver
+
+from accounts.models import User
+from .calendario import nova_versao
+from .dashboard import invalidar_serie
+from .models import Atividade, AtividadeEnvio, AtividadeVisualizacao
+
+# Campos que aparecem no feed do calendário ou decidem quem o recebe
+CAMPOS_CALENDARIO = {'titulo', 'descricao', 'tipo', 'prazo_entrega', 'publico',
+                     'ano_1', 'ano_2', 'ano_3', 'todos', 'professor'}
+
+# Campos do usuário que mudam o calendário dele
+CAMPOS_CALENDARIO_USUARIO = ('ano_escolar', 'is_active')
+
+
+@receiver(post_save, sender=AtividadeEnvio)
+@receiver(post_delete, sender=AtividadeEnvio)
+@receiver(post_save, sender=AtividadeVisualizacao)
+@receiver(post_delete, sender=AtividadeVisualizacao)
+def invalidar_serie_da_atividade(sender, instance, **kwargs):
+    """Envios e visualizações mudam a série de envios da atividade"""
+    invalidar_serie(instance.atividade_id)
+
+
+@receiver(post_save, sender=Atividade)
+@receiver(post_delete, sender=Atividade)
+def invalidar_calendario(sender, instance, update_fields=None, **kwargs):
+    """Qualquer alteração visível no calendário gera uma nova versão (novo ETag)"""
+    if update_fields is not None and not CAMPOS_CALENDARIO & set(update_fields):
+        return
+    nova_versao()
+
+
+def _salva_campos_do_calendario(instance, update_fields):
+    if instance._state.adding:
+        return False  # usuário novo ainda não tem feed em cache
+    return update_fields is None or bool(set(CAMPOS_CALENDARIO_USUARIO) & set(update_fields))
+
+
+@receiver(pre_save, sender=User)
+def guardar_campos_do_calendario(sender, instance, update_fields=None, **kwargs):
+    """Valores gravados antes do save, para comparar no post_save"""
+    if _salva_campos_do_calendario(instance, update_fields):
+        instance._calendario_anterior = (
+            User.objects.filter(pk=instance.pk).values_list(*CAMPOS_CALENDARIO_USUARIO).first()
+        )
+
+
+@receiver(post_save, sender=User)
+def invalidar_calendario_do_aluno(sender, instance, created=False, update_fields=None, **kwargs):
+    """Só mudança de ano escolar ou de conta ativa muda o que o aluno recebe"""
+    anterior = instance.__dict__.pop('_calendario_anterior', None)
+    if created or anterior is None:
+        return
+    if anterior != tuple(getattr(instance, campo) for campo in CAMPOS_CALENDARIO_USUARIO):
+        nova_versao()
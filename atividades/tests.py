@@ -1,3 +1,809 @@
-from django.test import TestCase
+import csv
+import hashlib
+import io
+import os
+import shutil
+import smtplib
+import subprocess
+import sys
+import tempfile
+import threading
+import uuid
+import zipfile
+from datetime import timedelta
+from decimal import Decimal
+from itertools import product
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core import mail, signing
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import OperationalError, connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import User
+from .calendario import gerar_token
+from .dashboard import atividades_com_metricas, serie_envios
+from .feed import SALT_CURSOR, feed_aluno, total_feed
+from .models import (
+    Atividade, AtividadeEnvio, AtividadeSalva, AtividadeVisualizacao, EnvioParcial, LembretePrazo,
+)
+from .prazos import AgendaPrazos, atualizar_situacoes, enviar_lembretes, processar_evento
+from .uploads import limpar_envios_abandonados
+from .visualizacoes import LoteVisualizacoes, registrar_visualizacao
+
+MEDIA_TESTES = tempfile.mkdtemp()
+
+
+def tearDownModule():
+    shutil.rmtree(MEDIA_TESTES, ignore_errors=True)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_TESTES)
+class FeedAlunoTests(TestCase):
+    """Feed do aluno: consultas constantes por página e paginação por cursor"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.professor = User.objects.create_user('prof', 'prof@etec.sp.gov.br', 'x', user_type='professor')
+        cls.aluno = User.objects.create_user('aluno', 'aluno@etec.sp.gov.br', 'x', user_type='aluno')
+        agora = timezone.now()
+
+        tipos = ['ATIVIDADE', 'AVISO_PROVA', 'AVISO_SIMPLES']
+        for i in range(30):
+            atividade = Atividade.objects.create(
+                professor=cls.professor,
+                titulo=f'Atividade {chr(65 + i % 26)}',
+                descricao='Descrição',
+                tipo=tipos[i % 3],
+                todos=True,
+                prazo_entrega=agora + timedelta(days=i - 10) if i % 4 else None,
+                criado_em=agora - timedelta(hours=i % 7),
+            )
+            Atividade.objects.filter(pk=atividade.pk).update(visualizacoes=i % 5)
+
+            if i % 2:
+                AtividadeVisualizacao.objects.create(atividade=atividade, aluno=cls.aluno)
+            if i % 3 == 0:
+                AtividadeEnvio.objects.create(
+                    atividade=atividade,
+                    aluno=cls.aluno,
+                    arquivo=SimpleUploadedFile('resposta.pdf', b'%PDF'),
+                )
+            if i % 5 == 0:
+                AtividadeSalva.objects.create(atividade=atividade, aluno=cls.aluno)
+
+    def test_consultas_constantes_por_pagina(self):
+        for tipo, status, order in product(
+            ['', 'ATIVIDADE', 'AVISO_PROVA'],
+            ['', 'pendentes', 'enviadas', 'abertas'],
+            ['recent', 'views', 'deadline', 'saved'],
+        ):
+            with self.subTest(tipo=tipo, status=status, order=order):
+                with CaptureQueriesContext(connection) as consultas:
+                    itens, _ = feed_aluno(self.aluno, tipo, status, order, tamanho=5)
+                    for item in itens:
+                        item['atividade'].professor.username
+
+                # Atividades anotadas + prefetch dos envios (pulado em página vazia)
+                self.assertLessEqual(len(consultas), 2)
+
+    def test_cursor_percorre_tudo_sem_repetir(self):
+        for order in ['recent', 'views', 'deadline', 'saved']:
+            with self.subTest(order=order):
+                completo, _ = feed_aluno(self.aluno, order=order, tamanho=100)
+                esperado = [item['atividade'].pk for item in completo]
+
+                vistos, cursor = [], None
+                while True:
+                    itens, cursor = feed_aluno(self.aluno, order=order, cursor=cursor, tamanho=4)
+                    vistos += [item['atividade'].pk for item in itens]
+                    if not cursor:
+                        break
+
+                self.assertEqual(vistos, esperado)
+
+    def test_cursor_adulterado_volta_ao_inicio(self):
+        primeira, _ = feed_aluno(self.aluno, order='views', tamanho=4)
+        for cursor in [signing.dumps(['abc', 1], salt=SALT_CURSOR), 'WyJhYmMiLCAxXQ', 'lixo']:
+            with self.subTest(cursor=cursor):
+                itens, _ = feed_aluno(self.aluno, order='views', cursor=cursor, tamanho=4)
+                self.assertEqual(itens, primeira)
+
+        self.client.force_login(self.aluno)
+        resposta = self.client.get(reverse('atividades:lista'), {'order': 'views', 'cursor': 'WyJhYmMiLCAxXQ'})
+        self.assertEqual(resposta.status_code, 200)
+
+    def test_total_conta_todas_as_paginas(self):
+        self.client.force_login(self.aluno)
+        resposta = self.client.get(reverse('atividades:lista'))
+        self.assertEqual(len(resposta.context['atividades_anotadas']), 20)
+        self.assertEqual(resposta.context['total_atividades'], 30)
+        self.assertEqual(total_feed(self.aluno, status='enviadas'), 10)
+
+    def test_anotacoes_do_aluno(self):
+        itens, _ = feed_aluno(self.aluno, tamanho=100)
+        for item in itens:
+            atividade = item['atividade']
+            self.assertEqual(
+                item['visualizou'],
+                AtividadeVisualizacao.objects.filter(atividade=atividade, aluno=self.aluno).exists(),
+            )
+            self.assertEqual(
+                item['envio'],
+                AtividadeEnvio.objects.filter(atividade=atividade, aluno=self.aluno).first(),
+            )
+            self.assertEqual(
+                item['salvou'],
+                AtividadeSalva.objects.filter(atividade=atividade, aluno=self.aluno).exists(),
+            )
+
+
+class PublicoAtividadeTests(TestCase):
+    """Público-alvo por ano: máscara calculada no save e filtrada no feed"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.professor = User.objects.create_user('prof', 'prof@etec.sp.gov.br', 'x', user_type='professor')
+        cls.aluno = User.objects.create_user('aluno', 'aluno@etec.sp.gov.br', 'x', user_type='aluno', ano_escolar=2)
+
+        cls.atividades = {}
+        for nome, anos in [('Primeiro', {'ano_1': True}), ('Segundo', {'ano_2': True}),
+                           ('Terceiro', {'ano_1': True, 'ano_3': True}), ('Geral', {'todos': True})]:
+            cls.atividades[nome] = Atividade.objects.create(
+                professor=cls.professor, titulo=nome, descricao='Descrição', tipo='ATIVIDADE', **anos
+            )
+
+    def test_mascara_calculada(self):
+        self.assertEqual(self.atividades['Primeiro'].publico, 1)
+        self.assertEqual(self.atividades['Terceiro'].publico, 5)
+        self.assertEqual(self.atividades['Geral'].publico, Atividade.PUBLICO_TODOS)
+
+    def test_feed_filtra_pelo_ano_do_aluno(self):
+        itens, _ = feed_aluno(self.aluno, tamanho=100)
+        titulos = {item['atividade'].titulo for item in itens}
+        self.assertEqual(titulos, {'Segundo', 'Geral'})
+
+
+@override_settings(MEDIA_ROOT=MEDIA_TESTES)
+@override_settings(MEDIA_ROOT=MEDIA_TESTES)
+class PainelProfessorTests(TestCase):
+    """Métricas do painel em uma única consulta agrupada"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.professor = User.objects.create_user('prof', 'prof@etec.sp.gov.br', 'x', user_type='professor')
+        cls.alunos = [User.objects.create_user(f'aluno{i}', f'aluno{i}@etec.sp.gov.br', 'x') for i in range(4)]
+        cls.atividade = Atividade.objects.create(
+            professor=cls.professor, titulo='Trabalho', descricao='Descrição', tipo='ATIVIDADE',
+            todos=True, prazo_entrega=timezone.now() + timedelta(days=1),
+        )
+        for aluno in cls.alunos:
+            AtividadeVisualizacao.objects.create(atividade=cls.atividade, aluno=aluno)
+        for aluno in cls.alunos[:3]:
+            AtividadeEnvio.objects.create(
+                atividade=cls.atividade, aluno=aluno, arquivo=SimpleUploadedFile('resposta.pdf', b'%PDF'),
+            )
+        AtividadeEnvio.objects.filter(aluno=cls.alunos[0]).update(
+            enviado_em=timezone.now() + timedelta(days=2), status='CORRIGIDA',
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_metricas_em_uma_consulta(self):
+        with self.assertNumQueries(1):
+            metricas = atividades_com_metricas(self.professor).get()
+
+        self.assertEqual(metricas.total_visualizacoes, 4)
+        self.assertEqual(metricas.total_envios, 3)
+        self.assertEqual(metricas.envios_pendentes, 2)
+        self.assertEqual(metricas.envios_no_prazo, 2)
+        self.assertEqual(metricas.envios_atrasados, 1)
+
+    def test_painel_exibe_resumo(self):
+        self.client.force_login(self.professor)
+        resposta = self.client.get(reverse('atividades:painel_professor'))
+        self.assertContains(resposta, 'No prazo')
+        self.assertContains(resposta, reverse('atividades:ver_envios', args=[self.atividade.pk]))
+        self.assertEqual(resposta.context['resumo']['envios_atrasados'], 1)
+
+    def test_sinais_invalidam_serie(self):
+        self.assertEqual(serie_envios(self.atividade)[-1]['envios_acumulados'], 3)
+        with self.assertNumQueries(0):
+            serie_envios(self.atividade)
+
+        AtividadeEnvio.objects.create(
+            atividade=self.atividade, aluno=self.alunos[3], arquivo=SimpleUploadedFile('resposta.pdf', b'%PDF'),
+        )
+        self.assertEqual(serie_envios(self.atividade)[-1]['envios_acumulados'], 4)
+
+        AtividadeVisualizacao.objects.filter(atividade=self.atividade, aluno=self.alunos[3]).delete()
+        self.assertEqual(serie_envios(self.atividade)[-1]['visualizacoes_acumuladas'], 3)
+
+
+class ExportacaoEnviosTests(TestCase):
+    """ZIP dos envios em streaming com manifesto e exportação incremental"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.professor = User.objects.create_user('prof', 'prof@etec.sp.gov.br', 'x', user_type='professor')
+        cls.alunos = [User.objects.create_user(f'aluno{i}', f'aluno{i}@etec.sp.gov.br', 'x') for i in range(3)]
+        cls.atividade = Atividade.objects.create(
+            professor=cls.professor, titulo='Trabalho', descricao='Descrição', tipo='ATIVIDADE',
+            todos=True, prazo_entrega=timezone.now() - timedelta(days=1),
+        )
+
+    def setUp(self):
+        # Mídia própria por teste: os nomes no ZIP vêm do nome salvo, sem sufixo do storage
+        self.media = tempfile.mkdtemp()
+        self.media_override = override_settings(MEDIA_ROOT=self.media)
+        self.media_override.enable()
+        self.client.force_login(self.professor)
+
+    def tearDown(self):
+        self.media_override.disable()
+        shutil.rmtree(self.media, ignore_errors=True)
+
+    def enviar(self, aluno, atraso_horas=0, nome='resposta.pdf'):
+        envio = AtividadeEnvio.objects.create(
+            atividade=self.atividade, aluno=aluno, arquivo=SimpleUploadedFile(nome, f'%PDF {aluno.username}'.encode()),
+        )
+        AtividadeEnvio.objects.filter(pk=envio.pk).update(
+            enviado_em=self.atividade.prazo_entrega + timedelta(hours=atraso_horas),
+        )
+        return envio
+
+    def baixar(self, **params):
+        resposta = self.client.get(reverse('atividades:baixar_envios_zip', args=[self.atividade.pk]), params)
+        self.assertEqual(resposta.status_code, 200)
+        arquivo = zipfile.ZipFile(io.BytesIO(b''.join(resposta.streaming_content)))
+        self.assertIsNone(arquivo.testzip())
+        manifesto = arquivo.read('manifesto.csv').decode('utf-8-sig').splitlines()
+        return arquivo, list(csv.DictReader(manifesto))
+
+    def test_zip_e_manifesto(self):
+        self.enviar(self.alunos[0], atraso_horas=-2)
+        self.enviar(self.alunos[1], atraso_horas=2, nome='foto.png')
+
+        arquivo, manifesto = self.baixar()
+
+        self.assertEqual(sorted(arquivo.namelist()), ['aluno0_resposta.pdf', 'aluno1_foto.png', 'manifesto.csv'])
+        self.assertEqual(arquivo.read('aluno0_resposta.pdf'), b'%PDF aluno0')
+        self.assertEqual(arquivo.getinfo('aluno1_foto.png').compress_type, zipfile.ZIP_STORED)
+        self.assertEqual(
+            [(linha['aluno'], linha['situacao_prazo']) for linha in manifesto],
+            [('aluno0', 'no prazo'), ('aluno1', 'atrasado')],
+        )
+
+    def test_nota_zero_no_manifesto(self):
+        zerado = self.enviar(self.alunos[0])
+        AtividadeEnvio.objects.filter(pk=zerado.pk).update(nota=Decimal('0.00'), status='CORRIGIDA')
+        self.enviar(self.alunos[1], nome='outra.pdf')
+
+        _, manifesto = self.baixar()
+
+        self.assertEqual([linha['nota'] for linha in manifesto], ['0.00', ''])
+
+    def test_exportacao_completa_nao_avanca_registro(self):
+        self.enviar(self.alunos[0])
+        self.baixar()
+        self.atividade.refresh_from_db()
+        self.assertIsNone(self.atividade.envios_exportados_em)
+
+    def test_novos_exporta_so_o_que_chegou_depois(self):
+        exportado_em = timezone.now() - timedelta(hours=1)
+        self.enviar(self.alunos[0], atraso_horas=-2)
+        with mock.patch('atividades.exportacao.timezone.now', return_value=exportado_em):
+            _, manifesto = self.baixar(novos='1')
+        self.assertEqual([linha['aluno'] for linha in manifesto], ['aluno0'])
+        self.atividade.refresh_from_db()
+        self.assertEqual(self.atividade.envios_exportados_em, exportado_em)
+
+        envio = self.enviar(self.alunos[1], nome='revisao.pdf')
+        AtividadeEnvio.objects.filter(pk=envio.pk).update(enviado_em=exportado_em + timedelta(seconds=1))
+        with mock.patch('atividades.exportacao.timezone.now', return_value=exportado_em + timedelta(minutes=1)):
+            arquivo, _ = self.baixar(novos='1')
+        self.assertEqual(arquivo.namelist(), ['aluno1_revisao.pdf', 'manifesto.csv'])
+        self.atividade.refresh_from_db()
+        self.assertEqual(self.atividade.envios_exportados_em, exportado_em + timedelta(minutes=1))
+
+        _, manifesto = self.baixar()
+        self.assertEqual([linha['aluno'] for linha in manifesto], ['aluno0', 'aluno1'])
+
+
+@override_settings(MEDIA_ROOT=MEDIA_TESTES)
+class CorrecaoNotasTests(TestCase):
+    """Correção em lote por JSON e planilha: tudo ou nada, entradas inválidas viram 400"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.professor = User.objects.create_user('prof', 'prof@etec.sp.gov.br', 'x', user_type='professor')
+        cls.atividade = Atividade.objects.create(
+            professor=cls.professor, titulo='Trabalho', descricao='Descrição', tipo='ATIVIDADE', todos=True,
+        )
+        cls.envios = [
+            AtividadeEnvio.objects.create(
+                atividade=cls.atividade,
+                aluno=User.objects.create_user(f'aluno{i}', f'aluno{i}@etec.sp.gov.br', 'x'),
+                arquivo=SimpleUploadedFile('resposta.pdf', b'%PDF'),
+            )
+            for i in range(2)
+        ]
+
+    def setUp(self):
+        self.client.force_login(self.professor)
+
+    def corrigir(self, correcoes):
+        return self.client.post(
+            reverse('atividades:corrigir_envios', args=[self.atividade.pk]),
+            data={'correcoes': correcoes}, content_type='application/json',
+        )
+
+    def test_json_valido(self):
+        resposta = self.corrigir([
+            {'envio_id': self.envios[0].pk, 'nota': '8,5', 'feedback': 'Bom'},
+            {'envio_id': self.envios[1].pk, 'nota': 10, 'status': 'enviada'},
+        ])
+        self.assertEqual(resposta.status_code, 200)
+        notas = dict(AtividadeEnvio.objects.values_list('pk', 'nota'))
+        self.assertEqual(notas, {self.envios[0].pk: Decimal('8.50'), self.envios[1].pk: Decimal('10.00')})
+        self.assertFalse(AtividadeEnvio.objects.exclude(status='CORRIGIDA').exists())
+
+    def test_entradas_invalidas(self):
+        for correcoes in [
+            [{'envio_id': self.envios[0].pk, 'nota': 'nan'}],
+            [{'envio_id': self.envios[0].pk, 'nota': 'sNaN'}],
+            [{'envio_id': self.envios[0].pk, 'nota': 'Infinity'}],
+            [{'envio_id': self.envios[0].pk, 'nota': '11'}],
+            [{'envio_id': self.envios[0].pk, 'status': 1}],
+            [{'envio_id': self.envios[0].pk, 'status': ['CORRIGIDA']}],
+            [self.envios[0].pk],
+            ['8.5', None],
+        ]:
+            with self.subTest(correcoes=correcoes):
+                resposta = self.corrigir(correcoes)
+                self.assertEqual(resposta.status_code, 400)
+                self.assertTrue(resposta.json()['erros'])
+
+    def test_linhas_mistas_nao_gravam_nada(self):
+        resposta = self.corrigir([
+            {'envio_id': self.envios[0].pk, 'nota': '7'},
+            {'envio_id': self.envios[1].pk, 'nota': 'NaN'},
+            'texto',
+        ])
+        self.assertEqual(resposta.status_code, 400)
+        self.assertEqual([erro.split(':')[0] for erro in resposta.json()['erros']], ['Linha 2', 'Linha 3'])
+        self.assertFalse(AtividadeEnvio.objects.filter(nota__isnull=False).exists())
+
+    def test_planilha_ida_e_volta(self):
+        url = reverse('atividades:planilha_notas', args=[self.atividade.pk])
+        linhas = self.client.get(url).content.decode('utf-8-sig').splitlines()
+        linhas[1] = linhas[1].replace(';ENVIADA;;', ';ENVIADA;9,25;')
+        linhas[2] = linhas[2].replace(';ENVIADA;;', ';ENVIADA;nan;')
+        arquivo = SimpleUploadedFile('notas.csv', '\n'.join(linhas).encode('utf-8-sig'))
+
+        resposta = self.client.post(url, {'planilha': arquivo})
+        self.assertEqual(resposta.status_code, 400)
+        self.assertEqual(len(resposta.json()['erros']), 1)
+
+        linhas[2] = linhas[2].replace(';nan;', ';;')
+        arquivo = SimpleUploadedFile('notas.csv', '\n'.join(linhas).encode('utf-8-sig'))
+        resposta = self.client.post(url, {'planilha': arquivo})
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(AtividadeEnvio.objects.get(nota__isnull=False).nota, Decimal('9.25'))
+
+
+class ValidacaoSeletivaTests(TestCase):
+    """full_clean() só roda na criação ou quando um campo validado muda"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.professor = User.objects.create_user('prof', 'prof@etec.sp.gov.br', 'x', user_type='professor')
+        cls.atividade = Atividade.objects.create(
+            professor=cls.professor, titulo='Trabalho', descricao='Descrição', tipo='ATIVIDADE', todos=True,
+        )
+
+    def test_flag_nao_valida(self):
+        atividade = Atividade.objects.get(pk=self.atividade.pk)
+        atividade.foi_visualizado = True
+        with mock.patch.object(Atividade, 'full_clean') as full_clean:
+            atividade.save(update_fields=['foi_visualizado'])
+            atividade.visualizacoes += 1
+            atividade.save()
+        full_clean.assert_not_called()
+
+    def test_campo_validado_alterado_valida(self):
+        atividade = Atividade.objects.get(pk=self.atividade.pk)
+        atividade.todos = False
+        with self.assertRaises(ValidationError):
+            atividade.save()
+
+
+class RegistroVisualizacaoTests(TestCase):
+    """Primeira visualização: INSERT sem conflito + UPDATE de contador e flag"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.professor = User.objects.create_user('prof', 'prof@etec.sp.gov.br', 'x', user_type='professor')
+        cls.alunos = [User.objects.create_user(f'aluno{i}', f'aluno{i}@etec.sp.gov.br', 'x') for i in range(3)]
+        cls.atividade = Atividade.objects.create(
+            professor=cls.professor, titulo='Trabalho', descricao='Descrição', tipo='ATIVIDADE', todos=True,
+        )
+        cls.aviso = Atividade.objects.create(
+            professor=cls.professor, titulo='Prova', descricao='Descrição', tipo='AVISO_PROVA', todos=True,
+        )
+
+    def test_primeira_visualizacao_conta_uma_vez(self):
+        atividade = Atividade.objects.get(pk=self.atividade.pk)
+        self.assertTrue(registrar_visualizacao(atividade, self.alunos[0]))
+        self.assertFalse(registrar_visualizacao(atividade, self.alunos[0]))
+        self.assertEqual((atividade.visualizacoes, atividade.foi_visualizado), (1, True))
+
+        atividade.refresh_from_db()
+        self.assertEqual((atividade.visualizacoes, atividade.foi_visualizado), (1, True))
+        self.assertEqual(AtividadeVisualizacao.objects.filter(atividade=atividade).count(), 1)
+
+    def test_lote_grava_por_tamanho(self):
+        lote = LoteVisualizacoes(tamanho=4, intervalo=3600)
+        AtividadeVisualizacao.objects.create(atividade=self.aviso, aluno=self.alunos[0])
+        for aluno in self.alunos:
+            lote.adicionar(self.aviso.pk, aluno.pk)
+        lote.adicionar(self.aviso.pk, self.alunos[0].pk)
+        self.assertEqual(AtividadeVisualizacao.objects.filter(atividade=self.aviso).count(), 1)
+
+        lote.adicionar(self.atividade.pk, self.alunos[0].pk)
+        self.assertEqual(len(lote), 0)
+        self.aviso.refresh_from_db()
+        self.assertEqual(AtividadeVisualizacao.objects.filter(atividade=self.aviso).count(), 3)
+        self.assertEqual((self.aviso.visualizacoes, self.aviso.foi_visualizado), (2, True))
+
+    def test_lote_grava_pelo_timer(self):
+        gravado = threading.Event()
+        gravados = []
+
+        def gravar(pendentes):
+            gravados.append(set(pendentes))
+            gravado.set()
+            return len(pendentes)
+
+        lote = LoteVisualizacoes(tamanho=100, intervalo=0.05)
+        with mock.patch('atividades.visualizacoes.gravar_lote', side_effect=gravar):
+            lote.adicionar(self.aviso.pk, self.alunos[0].pk)
+            lote.adicionar(self.aviso.pk, self.alunos[1].pk)
+            self.assertTrue(gravado.wait(5))
+
+        self.assertEqual(gravados, [{(self.aviso.pk, self.alunos[0].pk), (self.aviso.pk, self.alunos[1].pk)}])
+        self.assertEqual(len(lote), 0)
+        self.assertIsNone(lote._timer)
+
+    def test_lote_volta_para_a_fila_se_a_gravacao_falhar(self):
+        gravado = threading.Event()
+        tentativas = []
+
+        def gravar(pendentes):
+            tentativas.append(set(pendentes))
+            if len(tentativas) == 1:
+                raise OperationalError('database is locked')
+            gravado.set()
+            return len(pendentes)
+
+        lote = LoteVisualizacoes(tamanho=2, intervalo=0.05)
+        with mock.patch('atividades.visualizacoes.gravar_lote', side_effect=gravar), \
+                self.assertLogs('atividades.visualizacoes', 'ERROR'):
+            lote.adicionar(self.aviso.pk, self.alunos[0].pk)
+            lote.adicionar(self.aviso.pk, self.alunos[1].pk)  # enche o lote: a gravação falha
+            self.assertTrue(gravado.wait(5))  # o lote voltou para a fila e o timer tenta de novo
+
+        esperado = {(self.aviso.pk, self.alunos[0].pk), (self.aviso.pk, self.alunos[1].pk)}
+        self.assertEqual(tentativas, [esperado, esperado])
+        self.assertEqual(len(lote), 0)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_TESTES, EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class AgendadorPrazosTests(TestCase):
+    """Situação do prazo em lote, agenda em heap e lembretes para quem não enviou"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.professor = User.objects.create_user('prof', 'prof@etec.sp.gov.br', 'x', user_type='professor')
+        cls.alunos = [
+            User.objects.create_user(f'aluno{i}', f'aluno{i}@etec.sp.gov.br', 'x', ano_escolar=i + 1)
+            for i in range(3)
+        ]
+
+    def criar(self, titulo, prazo, **anos):
+        return Atividade.objects.create(
+            professor=self.professor, titulo=titulo, descricao='Descrição', tipo='ATIVIDADE',
+            prazo_entrega=prazo, **(anos or {'todos': True}),
+        )
+
+    def test_situacao_calculada_e_atualizada_em_lote(self):
+        agora = timezone.now()
+        longe = self.criar('Longe', agora + timedelta(days=5))
+        perto = self.criar('Perto', agora + timedelta(hours=2))
+        self.assertEqual((longe.situacao, perto.situacao), ('ABERTA', 'ENCERRANDO'))
+
+        self.assertEqual(atualizar_situacoes(agora + timedelta(hours=3)), 1)
+        perto.refresh_from_db()
+        self.assertEqual(perto.situacao, 'ENCERRADA')
+
+        itens, _ = feed_aluno(self.alunos[0], status='pendentes')
+        self.assertEqual([item['atividade'].titulo for item in itens], ['Longe'])
+
+    def test_pendentes_sem_agendador(self):
+        # Prazo vencido com a situação ainda desatualizada: o feed confere o prazo
+        vencida = self.criar('Vencida', timezone.now() - timedelta(hours=1))
+        Atividade.objects.filter(pk=vencida.pk).update(situacao='ABERTA')
+        self.criar('Sem prazo', None)
+
+        itens, _ = feed_aluno(self.alunos[0], status='pendentes')
+        self.assertEqual([item['atividade'].titulo for item in itens], ['Sem prazo'])
+
+    def test_agenda_encerra_e_envia_lembretes(self):
+        agora = timezone.now()
+        atividade = self.criar('Trabalho', agora + timedelta(hours=30), ano_1=True, ano_2=True)
+        AtividadeEnvio.objects.create(
+            atividade=atividade, aluno=self.alunos[0], arquivo=SimpleUploadedFile('resposta.pdf', b'%PDF'),
+        )
+
+        agenda = AgendaPrazos()
+        agenda.carregar(timedelta(hours=12), agora=agora)
+        self.assertEqual(agenda.vencidos(agora), [])
+
+        eventos = agenda.vencidos(agora + timedelta(hours=7))
+        self.assertEqual([evento for _, evento, _ in eventos], ['lembrete'])
+        for evento in eventos:
+            processar_evento(*evento)
+        self.assertEqual(list(atividade.lembretes.values_list('aluno__username', flat=True)), ['aluno1'])
+
+        self.assertEqual(enviar_lembretes(), 1)
+        self.assertEqual(mail.outbox[0].to, ['aluno1@etec.sp.gov.br'])
+        self.assertEqual(enviar_lembretes(), 0)
+
+        # Recarregar não agenda de novo o que já foi disparado
+        agenda.carregar(timedelta(hours=12), agora=agora + timedelta(hours=7))
+        eventos = agenda.vencidos(agora + timedelta(hours=31))
+        self.assertEqual([evento for _, evento, _ in eventos], ['encerrar'])
+        processar_evento(*eventos[0])
+        atividade.refresh_from_db()
+        self.assertEqual(atividade.situacao, 'ENCERRADA')
+
+    def test_lembretes_nao_entregues_ficam_pendentes(self):
+        atividade = self.criar('Trabalho', timezone.now() + timedelta(hours=3))
+        for aluno in self.alunos:
+            LembretePrazo.objects.create(atividade=atividade, aluno=aluno)
+        envio_original = mail.get_connection().__class__.send_messages
+
+        def servidor_instavel(conexao, mensagens):
+            if mensagens[0].to == ['aluno1@etec.sp.gov.br']:
+                raise smtplib.SMTPRecipientsRefused({'aluno1@etec.sp.gov.br': (550, b'mailbox unavailable')})
+            if mensagens[0].to == ['aluno2@etec.sp.gov.br']:
+                raise smtplib.SMTPServerDisconnected()
+            return envio_original(conexao, mensagens)
+
+        with mock.patch.object(mail.get_connection().__class__, 'send_messages', servidor_instavel):
+            self.assertEqual(enviar_lembretes(), 1)
+
+        self.assertEqual(
+            list(atividade.lembretes.filter(enviado_em__isnull=True).values_list('aluno__username', flat=True)),
+            ['aluno2'],
+        )
+        self.assertEqual(enviar_lembretes(), 1)
+        self.assertEqual([mensagem.to for mensagem in mail.outbox], [['aluno0@etec.sp.gov.br'], ['aluno2@etec.sp.gov.br']])
+
+
+@override_settings(MEDIA_ROOT=MEDIA_TESTES, ATIVIDADES_UPLOAD_BLOCO=4,
+                   ATIVIDADES_UPLOAD_PARCIAL_DIR=os.path.join(MEDIA_TESTES, 'parciais'))
+class EnvioEmBlocosTests(TestCase):
+    """Protocolo iniciar/bloco/finalizar com retomada e finalização idempotente"""
+
+    conteudo = b'%PDF-1.4 conteudo de teste'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.professor = User.objects.create_user('prof', 'prof@etec.sp.gov.br', 'x', user_type='professor')
+        cls.aluno = User.objects.create_user('aluno', 'aluno@etec.sp.gov.br', 'x')
+        cls.atividade = Atividade.objects.create(
+            professor=cls.professor, titulo='Trabalho', descricao='Descrição', tipo='ATIVIDADE', todos=True,
+        )
+
+    def setUp(self):
+        self.client.force_login(self.aluno)
+
+    def iniciar(self, sha256=None):
+        resposta = self.client.post(
+            reverse('atividades:envio_blocos_iniciar', args=[self.atividade.pk]),
+            data={'nome': 'resposta.pdf', 'tamanho': len(self.conteudo),
+                  'sha256': sha256 or hashlib.sha256(self.conteudo).hexdigest()},
+            content_type='application/json',
+        )
+        return resposta.json()
+
+    def enviar_bloco(self, upload_id, indice, dados=None):
+        if dados is None:
+            dados = self.conteudo[indice * 4:(indice + 1) * 4]
+        return self.client.put(
+            reverse('atividades:envio_blocos_bloco', args=[upload_id, indice]),
+            data=dados, content_type='application/octet-stream',
+        )
+
+    def finalizar(self, upload_id):
+        return self.client.post(reverse('atividades:envio_blocos_finalizar', args=[upload_id]))
+
+    def test_retomada_envia_so_o_que_falta(self):
+        inicio = self.iniciar()
+        self.assertEqual(inicio['total_blocos'], 7)
+        for indice in (0, 2, 6):
+            self.assertEqual(self.enviar_bloco(inicio['upload_id'], indice).status_code, 200)
+        self.assertEqual(self.enviar_bloco(inicio['upload_id'], 1, b'xx').status_code, 400)
+        self.assertEqual(self.finalizar(inicio['upload_id']).status_code, 400)
+
+        retomada = self.iniciar()
+        self.assertEqual(retomada['upload_id'], inicio['upload_id'])
+        self.assertEqual(retomada['faltando'], [1, 3, 4, 5])
+        for indice in retomada['faltando']:
+            self.enviar_bloco(retomada['upload_id'], indice)
+
+        self.assertTrue(self.finalizar(inicio['upload_id']).json()['success'])
+        self.assertTrue(self.finalizar(inicio['upload_id']).json()['success'])
+
+        envio = AtividadeEnvio.objects.get(atividade=self.atividade, aluno=self.aluno)
+        with envio.arquivo.open('rb') as arquivo:
+            self.assertEqual(arquivo.read(), self.conteudo)
+        self.assertEqual(EnvioParcial.objects.get().envio, envio)
+
+    def test_hash_divergente_descarta_blocos(self):
+        inicio = self.iniciar(sha256='0' * 64)
+        for indice in range(inicio['total_blocos']):
+            self.enviar_bloco(inicio['upload_id'], indice)
+
+        resposta = self.finalizar(inicio['upload_id'])
+        self.assertEqual(resposta.status_code, 400)
+        self.assertEqual(len(resposta.json()['faltando']), inicio['total_blocos'])
+        self.assertFalse(AtividadeEnvio.objects.exists())
+
+    def test_prazo_conferido_no_ultimo_bloco(self):
+        inicio = self.iniciar()
+        for indice in range(inicio['total_blocos']):
+            self.enviar_bloco(inicio['upload_id'], indice)
+        ultimo_bloco = EnvioParcial.objects.get().atualizado_em
+        Atividade.objects.filter(pk=self.atividade.pk).update(prazo_entrega=ultimo_bloco + timedelta(seconds=1))
+
+        # A finalização chega depois do prazo, mas os blocos chegaram antes
+        with mock.patch('django.utils.timezone.now', return_value=ultimo_bloco + timedelta(minutes=5)):
+            self.assertTrue(self.finalizar(inicio['upload_id']).json()['success'])
+            envio = AtividadeEnvio.objects.get()
+        self.assertEqual(envio.enviado_em, ultimo_bloco)
+
+    def test_bloco_depois_do_prazo_recusado(self):
+        inicio = self.iniciar()
+        Atividade.objects.filter(pk=self.atividade.pk).update(prazo_entrega=timezone.now() - timedelta(minutes=1))
+        resposta = self.enviar_bloco(inicio['upload_id'], 0)
+        self.assertEqual(resposta.status_code, 400)
+        self.assertEqual(resposta.json()['error'], 'O prazo de entrega expirou.')
+
+    def test_limite_e_limpeza_dos_envios_parciais(self):
+        primeiro = self.iniciar()
+        self.enviar_bloco(primeiro['upload_id'], 0)
+        pasta = os.path.join(settings.ATIVIDADES_UPLOAD_PARCIAL_DIR, primeiro['upload_id'])
+        self.assertTrue(os.path.isdir(pasta))
+
+        # Outro arquivo para a mesma atividade substitui a tentativa anterior
+        segundo = self.iniciar(sha256='1' * 64)
+        self.assertEqual(list(EnvioParcial.objects.values_list('pk', flat=True)), [uuid.UUID(segundo['upload_id'])])
+        self.assertFalse(os.path.exists(pasta))
+
+        outras = [
+            Atividade.objects.create(
+                professor=self.professor, titulo=f'Outra {i}', descricao='Descrição', tipo='ATIVIDADE', todos=True,
+            )
+            for i in range(2)
+        ]
+        with self.settings(ATIVIDADES_UPLOAD_PARCIAIS_POR_ALUNO=2):
+            url = reverse('atividades:envio_blocos_iniciar', args=[outras[0].pk])
+            dados = {'nome': 'resposta.pdf', 'tamanho': 4, 'sha256': '2' * 64}
+            self.assertEqual(self.client.post(url, dados, content_type='application/json').status_code, 200)
+            url = reverse('atividades:envio_blocos_iniciar', args=[outras[1].pk])
+            self.assertEqual(self.client.post(url, dados, content_type='application/json').status_code, 400)
+
+        self.assertEqual(limpar_envios_abandonados(timezone.now() + timedelta(seconds=1)), 2)
+        self.assertFalse(EnvioParcial.objects.exists())
+
+
+class CalendarioIcsTests(TestCase):
+    """Feed .ics por token com ETag/Last-Modified e 304 sem consultar o banco"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.professor = User.objects.create_user('prof', 'prof@etec.sp.gov.br', 'x', user_type='professor')
+        cls.aluno = User.objects.create_user('aluno', 'aluno@etec.sp.gov.br', 'x', ano_escolar=1)
+        prazo = timezone.now() + timedelta(days=3)
+        for titulo, tipo, anos in [('Trabalho, parte 1', 'ATIVIDADE', {'ano_1': True}),
+                                   ('Prova de Química', 'AVISO_PROVA', {'todos': True}),
+                                   ('Outro ano', 'ATIVIDADE', {'ano_2': True}),
+                                   ('Recado', 'AVISO_SIMPLES', {'todos': True})]:
+            Atividade.objects.create(
+                professor=cls.professor, titulo=titulo, descricao='Descrição', tipo=tipo,
+                prazo_entrega=prazo, **anos,
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.url = reverse('atividades:calendario', args=[gerar_token(self.aluno)])
+
+    def test_feed_e_revalidacao(self):
+        resposta = self.client.get(self.url)
+        self.assertEqual(resposta.status_code, 200)
+        conteudo = resposta.content.decode()
+        self.assertIn('SUMMARY:[Prazo] Trabalho\\, parte 1', conteudo)
+        self.assertIn('SUMMARY:[Prova] Prova de Química', conteudo)
+        self.assertNotIn('Outro ano', conteudo)
+        self.assertNotIn('Recado', conteudo)
+
+        with self.assertNumQueries(0):
+            revalidacao = self.client.get(self.url, HTTP_IF_NONE_MATCH=resposta['ETag'])
+        self.assertEqual(revalidacao.status_code, 304)
+
+        atividade = Atividade.objects.get(titulo='Prova de Química')
+        atividade.prazo_entrega += timedelta(days=1)
+        atividade.save()
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=resposta['ETag']).status_code, 200)
+
+    def test_so_mudanca_de_ano_ou_ativo_invalida(self):
+        etag = self.client.get(self.url)['ETag']
+
+        outro = User.objects.get(pk=self.professor.pk)
+        outro.first_name = 'Professora'
+        outro.save()
+        aluno = User.objects.get(pk=self.aluno.pk)
+        aluno.first_name = 'Ana'
+        aluno.save()
+        aluno.save(update_fields=['last_login'])
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        aluno.ano_escolar = 2
+        aluno.save()
+        resposta = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resposta.status_code, 200)
+        self.assertIn('Outro ano', resposta.content.decode())
+
+    def test_token_invalido(self):
+        url = reverse('atividades:calendario', args=['token-falso'])
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class CargaEnviosTests(SimpleTestCase):
+    """
+    O teste de carga roda em banco e pastas temporários, sem tocar nos do projeto.
+    Roda em outro processo (o comando cria o próprio banco de testes), com
+    pastas do projeto que não existem: se algo for gravado nelas, elas aparecem.
+    """
+
+    def test_modo_blocos_nao_escreve_nas_pastas_do_projeto(self):
+        pasta = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, pasta, ignore_errors=True)
+        media, parciais = os.path.join(pasta, 'media'), os.path.join(pasta, 'parciais')
+        with open(os.path.join(pasta, 'configuracao_carga.py'), 'w') as arquivo:
+            arquivo.write(
+                'from studymate.settings import *\n'
+                f'MEDIA_ROOT = {media!r}\n'
+                f'ATIVIDADES_UPLOAD_PARCIAL_DIR = {parciais!r}\n'
+            )
+
+        resultado = subprocess.run(
+            [sys.executable, 'manage.py', 'carga_envios', '--settings', 'configuracao_carga',
+             '--alunos', '3', '--atividades', '1', '--concorrencia', '1', '--modo', 'blocos', '--tamanho-kb', '8'],
+            cwd=settings.BASE_DIR, capture_output=True, text=True, timeout=300,
+            env={**os.environ, 'PYTHONPATH': os.pathsep.join([pasta, str(settings.BASE_DIR)])},
+        )
+
+        self.assertEqual(resultado.returncode, 0, resultado.stderr)
+        self.assertIn('concorrência   1: 3 ok', resultado.stdout)
+        self.assertFalse(os.path.exists(media))
+        self.assertFalse(os.path.exists(parciais))
@@ -0,0 +1,219 @@
+"""
+Envio de atividades em blocos (upload retomável).
+
+Protocolo:
+1. iniciar: o aluno informa nome, tamanho e SHA-256 do arquivo e recebe o
+   id do envio, o tamanho do bloco e os blocos que o servidor já tem
+   (retomada após queda ou recarregar a página);
+2. bloco: cada bloco é uma requisição curta com o corpo cru, então
+   conexões lentas não prendem um worker durante o upload inteiro;
+3. finalizar: monta o arquivo, confere o SHA-256 e cria o AtividadeEnvio.
+   Chamar de novo devolve o mesmo envio (idempotente).
+
+O prazo vale para os blocos: cada bloco precisa chegar antes do prazo, e
+a finalização confere o prazo no momento do último bloco (atualizado_em),
+não no da chamada. Assim um envio que terminou a tempo não é recusado por
+uma finalização que chegou segundos depois.
+
+Cada aluno tem no máximo ATIVIDADES_UPLOAD_PARCIAIS_POR_ALUNO envios em
+andamento; iniciar um envio com outro arquivo para a mesma atividade
+descarta o anterior. O comando limpar_envios_parciais remove os abandonados
+e os registros de envios já finalizados.
+"""
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import AtividadeEnvio, EnvioParcial, validate_file_extension_atividade
+
+TAMANHO_MAXIMO = 10 * 1024 * 1024  # 10MB, igual ao envio tradicional
+
+_SHA256 = re.compile(r'^[0-9a-f]{64}$')
+
+
+def _pasta_base():
+    return str(getattr(settings, 'ATIVIDADES_UPLOAD_PARCIAL_DIR', os.path.join(tempfile.gettempdir(), 'studymate_uploads')))
+
+
+def _maximo_por_aluno():
+    return getattr(settings, 'ATIVIDADES_UPLOAD_PARCIAIS_POR_ALUNO', 5)
+
+
+def pasta_blocos(parcial):
+    return os.path.join(_pasta_base(), str(parcial.pk))
+
+
+def blocos_recebidos(parcial):
+    """Índices dos blocos já gravados, em ordem"""
+    try:
+        nomes = os.listdir(pasta_blocos(parcial))
+    except FileNotFoundError:
+        return []
+    return sorted(int(nome) for nome in nomes if nome.isdigit())
+
+
+def _descartar(parciais):
+    """Remove os envios em blocos e as pastas dos seus blocos; retorna quantos eram"""
+    total = 0
+    for parcial in parciais.only('pk').iterator():
+        shutil.rmtree(pasta_blocos(parcial), ignore_errors=True)
+        total += 1
+    parciais.delete()
+    return total
+
+
+def validar_envio(atividade, aluno, momento=None):
+    """
+    Mesmas regras do envio tradicional; levanta ValueError com a mensagem.
+    O prazo é conferido em `momento` (padrão: agora).
+    """
+    momento = momento or timezone.now()
+    if not atividade.permite_envio:
+        raise ValueError('Esta atividade não permite envio.')
+    if atividade.prazo_entrega and momento > atividade.prazo_entrega:
+        raise ValueError('O prazo de entrega expirou.')
+    if AtividadeEnvio.objects.filter(atividade=atividade, aluno=aluno).exists():
+        raise ValueError('Você já enviou esta atividade.')
+
+
+def iniciar_envio(atividade, aluno, nome_arquivo, tamanho, sha256):
+    """
+    Cria (ou retoma) o envio em blocos. Um envio aberto do mesmo aluno,
+    para a mesma atividade e com o mesmo conteúdo é reaproveitado.
+    """
+    validar_envio(atividade, aluno)
+
+    nome_arquivo = os.path.basename(str(nome_arquivo or '')).strip()
+    sha256 = str(sha256 or '').lower()
+    try:
+        tamanho = int(tamanho)
+    except (TypeError, ValueError):
+        raise ValueError('Tamanho do arquivo inválido.')
+
+    if not nome_arquivo:
+        raise ValueError('Informe o nome do arquivo.')
+    if not 0 < tamanho <= TAMANHO_MAXIMO:
+        raise ValueError('O arquivo deve ter entre 1 byte e 10MB.')
+    if not _SHA256.match(sha256):
+        raise ValueError('Hash SHA-256 inválido.')
+    try:
+        validate_file_extension_atividade(File(None, name=nome_arquivo))
+    except ValidationError as e:
+        raise ValueError(e.messages[0])
+
+    parcial = EnvioParcial.objects.filter(
+        atividade=atividade, aluno=aluno, envio__isnull=True,
+        nome_arquivo=nome_arquivo, tamanho=tamanho, sha256=sha256,
+    ).first()
+    if parcial is None:
+        # Outro arquivo para a mesma atividade: a tentativa anterior não serve mais
+        _descartar(EnvioParcial.objects.filter(atividade=atividade, aluno=aluno, envio__isnull=True))
+        if EnvioParcial.objects.filter(aluno=aluno, envio__isnull=True).count() >= _maximo_por_aluno():
+            raise ValueError('Você tem muitos envios em andamento. Conclua um deles antes de começar outro.')
+        parcial = EnvioParcial.objects.create(
+            atividade=atividade,
+            aluno=aluno,
+            nome_arquivo=nome_arquivo,
+            tamanho=tamanho,
+            tamanho_bloco=getattr(settings, 'ATIVIDADES_UPLOAD_BLOCO', 1024 * 1024),
+            sha256=sha256,
+        )
+    return parcial
+
+
+def gravar_bloco(parcial, indice, dados):
+    """
+    Grava um bloco. Reenviar um bloco já recebido apenas o substitui.
+    A escrita vai para um arquivo temporário e é renomeada no fim, então
+    um bloco interrompido nunca aparece como recebido.
+    """
+    if parcial.envio_id:
+        raise ValueError('Este envio já foi finalizado.')
+    if parcial.atividade.esta_encerrada():
+        raise ValueError('O prazo de entrega expirou.')
+    if not 0 <= indice < parcial.total_blocos:
+        raise ValueError('Bloco fora do intervalo.')
+    if len(dados) != parcial.tamanho_do_bloco(indice):
+        raise ValueError(f'Tamanho do bloco {indice} incorreto.')
+
+    pasta = pasta_blocos(parcial)
+    os.makedirs(pasta, exist_ok=True)
+    descritor, temporario = tempfile.mkstemp(dir=pasta, suffix='.parte')
+    with os.fdopen(descritor, 'wb') as arquivo:
+        arquivo.write(dados)
+    os.replace(temporario, os.path.join(pasta, str(indice)))
+    # Mantém o envio fora da limpeza de abandonados enquanto houver progresso
+    EnvioParcial.objects.filter(pk=parcial.pk).update(atualizado_em=timezone.now())
+
+
+def finalizar_envio(parcial):
+    """
+    Monta o arquivo a partir dos blocos, confere o SHA-256 e cria o envio.
+    Se o envio já foi finalizado (ex.: resposta perdida e nova tentativa),
+    devolve o mesmo AtividadeEnvio.
+    """
+    if parcial.envio_id:
+        return parcial.envio
+
+    faltando = sorted(set(range(parcial.total_blocos)) - set(blocos_recebidos(parcial)))
+    if faltando:
+        raise ValueError(f'Faltam {len(faltando)} bloco(s).')
+
+    pasta = pasta_blocos(parcial)
+    hash_arquivo = hashlib.sha256()
+    with tempfile.TemporaryFile() as montado:
+        for indice in range(parcial.total_blocos):
+            with open(os.path.join(pasta, str(indice)), 'rb') as bloco:
+                for dados in iter(lambda: bloco.read(64 * 1024), b''):
+                    hash_arquivo.update(dados)
+                    montado.write(dados)
+
+        if hash_arquivo.hexdigest() != parcial.sha256:
+            # Conteúdo corrompido: descarta os blocos para o cliente reenviar tudo
+            shutil.rmtree(pasta, ignore_errors=True)
+            raise ValueError('O arquivo recebido não confere com o hash informado. Envie novamente.')
+
+        # O prazo é conferido no último bloco recebido, não na finalização
+        validar_envio(parcial.atividade, parcial.aluno, momento=parcial.atualizado_em)
+
+        montado.seek(0)
+        envio = AtividadeEnvio(atividade=parcial.atividade, aluno=parcial.aluno)
+        envio.arquivo.save(parcial.nome_arquivo, File(montado), save=False)
+        try:
+            with transaction.atomic():
+                envio.save()
+                # enviado_em é o momento do último bloco (auto_now_add usaria o da finalização)
+                AtividadeEnvio.objects.filter(pk=envio.pk).update(enviado_em=parcial.atualizado_em)
+                envio.enviado_em = parcial.atualizado_em
+                atualizados = EnvioParcial.objects.filter(pk=parcial.pk, envio__isnull=True).update(envio=envio)
+                if not atualizados:
+                    raise IntegrityError('envio finalizado em paralelo')
+        except IntegrityError:
+            # Outra finalização concorrente venceu: remove o arquivo duplicado
+            envio.arquivo.delete(save=False)
+            parcial.refresh_from_db()
+            if parcial.envio_id:
+                return parcial.envio
+            raise ValueError('Você já enviou esta atividade.')
+
+    parcial.envio = envio
+    shutil.rmtree(pasta, ignore_errors=True)
+    return envio
+
+
+def limpar_envios_abandonados(antes_de):
+    """
+    Remove envios em blocos não finalizados e sem atividade desde a data,
+    e os registros de envios finalizados antes dela (o AtividadeEnvio fica).
+    """
+    abandonados = _descartar(EnvioParcial.objects.filter(envio__isnull=True, atualizado_em__lt=antes_de))
+    EnvioParcial.objects.filter(envio__isnull=False, atualizado_em__lt=antes_de).delete()
+    return abandonados
@@ -8,14 +8,24 @@ urlpatterns = [
     path('', views.lista_atividades, name='lista'),
     path('<int:pk>/', views.detalhe_atividade, name='detalhe'),
     path('<int:pk>/enviar/', views.enviar_atividade, name='enviar'),
+    path('<int:pk>/enviar/blocos/', views.iniciar_envio_blocos, name='envio_blocos_iniciar'),
+    path('envio/<uuid:upload_id>/', views.status_envio_blocos, name='envio_blocos_status'),
+    path('envio/<uuid:upload_id>/bloco/<int:indice>/', views.enviar_bloco, name='envio_blocos_bloco'),
+    path('envio/<uuid:upload_id>/finalizar/', views.finalizar_envio_blocos, name='envio_blocos_finalizar'),
     path('<int:pk>/salvar/', views.salvar_atividade, name='salvar'),
     path('<int:pk>/anexo/', views.baixar_anexo, name='baixar_anexo'),
+    path('calendario/<str:token>.ics', views.calendario_ics, name='calendario'),
     
     
     # PROFESSORES
     path('professor/', views.painel_professor, name='painel_professor'),
+    path('professor/dados/', views.painel_dados, name='painel_dados'),
+    path('professor/<int:pk>/serie/', views.serie_envios_atividade, name='serie_envios'),
     path('professor/criar/', views.criar_atividade, name='criar'),
     path('professor/<int:pk>/envios/', views.ver_envios, name='ver_envios'),
     path('professor/envio/<int:pk>/baixar/', views.baixar_envio, name='baixar_envio'),
+    path('professor/<int:pk>/envios/zip/', views.baixar_envios_zip, name='baixar_envios_zip'),
+    path('professor/<int:pk>/notas/', views.corrigir_envios, name='corrigir_envios'),
+    path('professor/<int:pk>/notas/planilha/', views.planilha_notas, name='planilha_notas'),
     path('professor/<int:pk>/excluir/', views.excluir_atividade, name='excluir'),
 ]
\ No newline at end of file
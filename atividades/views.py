@@ -1,15 +1,24 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from django.contrib.auth.decorators import login_required, user_passes_test
-from django.http import JsonResponse, HttpResponseForbidden, FileResponse, Http404, HttpResponse
-from django.views.decorators.http import require_http_methods, require_POST
+from django.http import JsonResponse, HttpResponseForbidden, FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.views.decorators.http import condition, require_http_methods, require_POST
 from django.core.paginator import Paginator
 from django.db.models import F, Q
 from django.contrib import messages
 from django.utils import timezone
 from datetime import timedelta
-from .models import Atividade, AtividadeVisualizacao, AtividadeEnvio, AtividadeSalva
+from .models import Atividade, AtividadeVisualizacao, AtividadeEnvio, AtividadeSalva, EnvioParcial
 from .forms import AtividadeForm, AtividadeEnvioForm
+from .feed import feed_aluno, total_feed
+from .dashboard import atividades_com_metricas, resumo_painel, serie_envios
+from .exportacao import gerar_zip_envios
+from .correcao import aplicar_correcoes, exportar_planilha, ler_planilha
+from .visualizacoes import registrar_visualizacao
+from .uploads import blocos_recebidos, finalizar_envio, gravar_bloco, iniciar_envio
+from .calendario import etag_feed, feed_do_token, gerar_token, ultima_modificacao_feed
 import os
+import json
 import mimetypes
 import re
 
@@ -32,6 +41,38 @@ def lista_atividades(request):
     """
     user = request.user
     
+    filtro_tipo = request.GET.get('tipo', '')
+    filtro_status = request.GET.get('status', '')
+    filtro_order = request.GET.get('order', 'recent')
+    tem_filtros_ativos = any([filtro_tipo, filtro_status, filtro_order != 'recent'])
+    
+    # ========================================
+    # ALUNOS: FEED ANOTADO E PAGINADO POR CURSOR
+    # ========================================
+    if is_aluno(user) and not is_professor(user):
+        atividades_anotadas, proximo_cursor = feed_aluno(
+            user,
+            tipo=filtro_tipo,
+            status=filtro_status,
+            order=filtro_order,
+            cursor=request.GET.get('cursor'),
+        )
+        
+        context = {
+            'atividades_anotadas': atividades_anotadas,
+            'filtro_tipo': filtro_tipo,
+            'filtro_status': filtro_status,
+            'filtro_order': filtro_order,
+            'tem_filtros_ativos': tem_filtros_ativos,
+            'total_atividades': total_feed(user, filtro_tipo, filtro_status, filtro_order),
+            'proximo_cursor': proximo_cursor,
+            'url_calendario': request.build_absolute_uri(
+                reverse('atividades:calendario', args=[gerar_token(user)])
+            ),
+        }
+        
+        return render(request, 'atividades/lista_aluno.html', context)
+    
     # ========================================
     # PROFESSORES: SUAS PRÓPRIAS ATIVIDADES
     # ========================================
@@ -41,105 +82,37 @@ def lista_atividades(request):
         
         atividades = Atividade.objects.filter(professor=user)
     
-    # ========================================
-    # ALUNOS: ATIVIDADES DISPONÍVEIS
-    # ========================================
-    elif is_aluno(user):
-        atividades = Atividade.objects.all()
-    
     # ========================================
     # ADMINISTRADORES: TODAS AS ATIVIDADES
     # ========================================
     else:
         atividades = Atividade.objects.all()
     
+    atividades = atividades.select_related('professor')
+    
     # ========================================
     # SISTEMA DE FILTROS (IGUAL AO NOTES)
     # ========================================
-    filtro_tipo = request.GET.get('tipo', '')
-    filtro_status = request.GET.get('status', '')
-    filtro_order = request.GET.get('order', 'recent')
     
     # FILTRO 1: TIPO
     if filtro_tipo:
         atividades = atividades.filter(tipo=filtro_tipo)
     
-    # FILTRO 2: STATUS (apenas para alunos)
-    if is_aluno(user):
-        if filtro_status == 'pendentes':
-            # Atividades não enviadas e dentro do prazo
-            atividades = atividades.exclude(
-                envios__aluno=user
-            ).filter(
-                Q(prazo_entrega__gte=timezone.now()) | Q(prazo_entrega__isnull=True)
-            )
-        
-        elif filtro_status == 'enviadas':
-            # Atividades já enviadas pelo aluno
-            atividades = atividades.filter(envios__aluno=user)
-        
-        elif filtro_status == 'abertas':
-            # Atividades em aberto (não enviadas)
-            atividades = atividades.exclude(envios__aluno=user)
-    
-    # FILTRO 3: ORDENAÇÃO
+    # FILTRO 2: ORDENAÇÃO
     order_map = {
         'recent': '-criado_em',
         'views': '-visualizacoes',
         'deadline': 'prazo_entrega',
-        'saved': None  # Tratado separadamente
     }
     
-    if filtro_order == 'saved' and is_aluno(user):
-        # Apenas atividades salvas pelo aluno
-        atividades_salvas_ids = AtividadeSalva.objects.filter(
-            aluno=user
-        ).values_list('atividade_id', flat=True)
-        
-        atividades = atividades.filter(id__in=atividades_salvas_ids).order_by('-criado_em')
-    
-    elif filtro_order in order_map and order_map[filtro_order]:
-        atividades = atividades.order_by(order_map[filtro_order])
-    
-    else:
-        atividades = atividades.order_by('-criado_em')
-    
-    # ========================================
-    # ANOTAR INFORMAÇÕES ADICIONAIS
-    # ========================================
-    atividades_anotadas = []
-    
-    for atividade in atividades:
-        item = {
-            'atividade': atividade,
-            'visualizou': False,
-            'envio': None,
-            'salvou': False,
-        }
-        
-        # Informações específicas para alunos
-        if is_aluno(user):
-            item['visualizou'] = AtividadeVisualizacao.objects.filter(
-                atividade=atividade, 
-                aluno=user
-            ).exists()
-            
-            item['envio'] = AtividadeEnvio.objects.filter(
-                atividade=atividade, 
-                aluno=user
-            ).first()
-            
-            item['salvou'] = AtividadeSalva.objects.filter(
-                atividade=atividade,
-                aluno=user
-            ).exists()
-        
-        atividades_anotadas.append(item)
+    atividades = atividades.order_by(order_map.get(filtro_order, '-criado_em'))
     
-    # ========================================
-    # VERIFICAR SE HÁ RESULTADOS
-    # ========================================
-    tem_filtros_ativos = any([filtro_tipo, filtro_status, filtro_order != 'recent'])
+    atividades_anotadas = [{
+        'atividade': atividade,
+        'visualizou': False,
+        'envio': None,
+        'salvou': False,
+    } for atividade in atividades]
     
     context = {
         'atividades_anotadas': atividades_anotadas,
@@ -266,21 +239,9 @@ def detalhe_atividade(request, pk):
         messages.error(request, 'Você não tem acesso a esta atividade.')
         return redirect('atividades:lista')
     
-    # Registrar visualização
+    # Registrar visualização (INSERT + UPDATE em uma transação)
     if request.user.user_type == 'aluno':
-        visualizacao, created = AtividadeVisualizacao.objects.get_or_create(
-            atividade=atividade,
-            aluno=request.user
-        )
-        
-        if created:
-            Atividade.objects.filter(pk=pk).update(visualizacoes=F('visualizacoes') + 1)
-            
-            if not atividade.foi_visualizado:
-                atividade.foi_visualizado = True
-                atividade.save(update_fields=['foi_visualizado'])
-            
-            atividade.refresh_from_db()
+        registrar_visualizacao(atividade, request.user)
     
     envio = AtividadeEnvio.objects.filter(
         atividade=atividade,
@@ -349,6 +310,89 @@ def enviar_atividade(request, pk):
         }, status=400)
 
 
+def _estado_envio_parcial(parcial):
+    recebidos = blocos_recebidos(parcial)
+    return {
+        'success': True,
+        'upload_id': str(parcial.pk),
+        'tamanho_bloco': parcial.tamanho_bloco,
+        'total_blocos': parcial.total_blocos,
+        'recebidos': recebidos,
+        'faltando': sorted(set(range(parcial.total_blocos)) - set(recebidos)),
+        'finalizado': parcial.envio_id is not None,
+    }
+
+
+@login_required
+@require_POST
+def iniciar_envio_blocos(request, pk):
+    """
+    Inicia (ou retoma) o envio em blocos: recebe nome, tamanho e sha256
+    do arquivo e devolve os blocos que ainda faltam
+    """
+    if not is_aluno(request.user):
+        return JsonResponse({'success': False, 'error': 'Acesso negado'}, status=403)
+    
+    atividade = get_object_or_404(Atividade, pk=pk)
+    
+    try:
+        dados = json.loads(request.body)
+        parcial = iniciar_envio(
+            atividade, request.user, dados.get('nome'), dados.get('tamanho'), dados.get('sha256')
+        )
+    except json.JSONDecodeError:
+        return JsonResponse({'success': False, 'error': 'JSON inválido.'}, status=400)
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    
+    return JsonResponse(_estado_envio_parcial(parcial))
+
+
+@login_required
+def status_envio_blocos(request, upload_id):
+    """Blocos recebidos e faltantes de um envio em blocos"""
+    parcial = get_object_or_404(EnvioParcial, pk=upload_id, aluno=request.user)
+    return JsonResponse(_estado_envio_parcial(parcial))
+
+
+@login_required
+@require_http_methods(['PUT', 'POST'])
+def enviar_bloco(request, upload_id, indice):
+    """Recebe um bloco do arquivo (corpo cru da requisição)"""
+    parcial = get_object_or_404(
+        EnvioParcial.objects.select_related('atividade'), pk=upload_id, aluno=request.user
+    )
+    
+    try:
+        gravar_bloco(parcial, indice, request.body)
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    
+    return JsonResponse({'success': True, 'indice': indice})
+
+
+@login_required
+@require_POST
+def finalizar_envio_blocos(request, upload_id):
+    """Monta o arquivo, confere o hash e cria o envio (idempotente)"""
+    parcial = get_object_or_404(
+        EnvioParcial.objects.select_related('atividade', 'aluno', 'envio'),
+        pk=upload_id, aluno=request.user
+    )
+    
+    try:
+        finalizar_envio(parcial)
+    except ValueError as e:
+        resposta = _estado_envio_parcial(parcial)
+        resposta.update({'success': False, 'error': str(e)})
+        return JsonResponse(resposta, status=400)
+    
+    return JsonResponse({
+        'success': True,
+        'message': 'Atividade enviada com sucesso!'
+    })
+
+
 @login_required
 @require_POST
 def salvar_atividade(request, pk):
@@ -407,7 +451,20 @@ def baixar_anexo(request, pk):
     return response
 
 
-# Função gerar_ics() REMOVIDA - Agora usa Google Calendar direto no template
+@condition(etag_func=etag_feed, last_modified_func=ultima_modificacao_feed)
+def calendario_ics(request, token):
+    """
+    Feed iCalendar dos prazos do usuário (assinatura por URL com token).
+    Sem login: aplicativos de agenda não mantêm sessão.
+    """
+    conteudo = feed_do_token(token, request.build_absolute_uri('/').rstrip('/'))
+    if conteudo is None:
+        raise Http404('Calendário não encontrado')
+    
+    response = HttpResponse(conteudo, content_type='text/calendar; charset=utf-8')
+    response['Content-Disposition'] = 'inline; filename="studymate.ics"'
+    response['Cache-Control'] = 'private, no-cache'
+    return response
 
 
 # VIEWS PARA PROFESSORES
@@ -418,23 +475,65 @@ def painel_professor(request):
     """
     Painel de controle do professor
     """
-    atividades = Atividade.objects.filter(professor=request.user).order_by('-criado_em')
+    atividades = list(atividades_com_metricas(request.user))
     
-    atividades_anotadas = []
-    for atividade in atividades:
-        atividades_anotadas.append({
-            'atividade': atividade,
-            'total_visualizacoes': atividade.total_visualizacoes(),
-            'total_envios': atividade.total_envios(),
-        })
+    atividades_anotadas = [{
+        'atividade': atividade,
+        'total_visualizacoes': atividade.total_visualizacoes,
+        'total_envios': atividade.total_envios,
+        'envios_pendentes': atividade.envios_pendentes,
+        'envios_no_prazo': atividade.envios_no_prazo,
+        'envios_atrasados': atividade.envios_atrasados,
+    } for atividade in atividades]
     
     context = {
         'atividades_anotadas': atividades_anotadas,
+        'resumo': resumo_painel(atividades),
     }
     
     return render(request, 'atividades/painel_professor.html', context)
 
 
+@login_required
+@user_passes_test(is_professor)
+def painel_dados(request):
+    """
+    Métricas do painel em JSON (uma consulta para todas as atividades)
+    """
+    atividades = list(atividades_com_metricas(request.user))
+    
+    return JsonResponse({
+        'success': True,
+        'resumo': resumo_painel(atividades),
+        'atividades': [{
+            'id': atividade.pk,
+            'titulo': atividade.titulo,
+            'tipo': atividade.tipo,
+            'prazo_entrega': atividade.prazo_entrega.isoformat() if atividade.prazo_entrega else None,
+            'total_visualizacoes': atividade.total_visualizacoes,
+            'total_envios': atividade.total_envios,
+            'envios_pendentes': atividade.envios_pendentes,
+            'envios_no_prazo': atividade.envios_no_prazo,
+            'envios_atrasados': atividade.envios_atrasados,
+        } for atividade in atividades],
+    })
+
+
+@login_required
+@user_passes_test(is_professor)
+def serie_envios_atividade(request, pk):
+    """
+    Série diária da taxa de envio de uma atividade (em cache)
+    """
+    atividade = get_object_or_404(Atividade, pk=pk, professor=request.user)
+    
+    return JsonResponse({
+        'success': True,
+        'atividade': atividade.pk,
+        'serie': serie_envios(atividade),
+    })
+
+
 @login_required
 @user_passes_test(is_professor)
 def criar_atividade(request):
@@ -493,6 +592,93 @@ def baixar_envio(request, pk):
     return response
 
 
+@login_required
+@user_passes_test(is_professor)
+def baixar_envios_zip(request, pk):
+    """
+    Download de todos os envios da atividade em um ZIP gerado em streaming.
+    Com ?novos=1, inclui apenas envios posteriores à última exportação.
+    """
+    atividade = get_object_or_404(Atividade, pk=pk, professor=request.user)
+    apenas_novos = request.GET.get('novos') == '1'
+    
+    response = StreamingHttpResponse(
+        gerar_zip_envios(atividade, apenas_novos=apenas_novos),
+        content_type='application/zip'
+    )
+    sufixo = '_novos' if apenas_novos else ''
+    response['Content-Disposition'] = f'attachment; filename="envios_atividade_{atividade.pk}{sufixo}.zip"'
+    
+    return response
+
+
+@login_required
+@user_passes_test(is_professor)
+@require_POST
+def corrigir_envios(request, pk):
+    """
+    Correção em lote via JSON:
+    {"correcoes": [{"envio_id": 1, "nota": "8.5", "feedback": "...", "status": "CORRIGIDA"}, ...]}
+    """
+    atividade = get_object_or_404(Atividade, pk=pk, professor=request.user)
+    
+    try:
+        correcoes = json.loads(request.body).get('correcoes', [])
+    except (ValueError, AttributeError):
+        return JsonResponse({'success': False, 'error': 'JSON inválido.'}, status=400)
+    
+    if not isinstance(correcoes, list) or not correcoes:
+        return JsonResponse({'success': False, 'error': 'Nenhuma correção enviada.'}, status=400)
+    
+    total, erros = aplicar_correcoes(atividade, correcoes)
+    
+    if erros:
+        return JsonResponse({'success': False, 'erros': erros}, status=400)
+    
+    return JsonResponse({
+        'success': True,
+        'message': f'{total} envio(s) corrigido(s).'
+    })
+
+
+@login_required
+@user_passes_test(is_professor)
+@require_http_methods(["GET", "POST"])
+def planilha_notas(request, pk):
+    """
+    GET: baixa a planilha CSV de notas da atividade.
+    POST: importa a planilha preenchida (campo "planilha") de uma só vez.
+    """
+    atividade = get_object_or_404(Atividade, pk=pk, professor=request.user)
+    
+    if request.method == 'GET':
+        response = HttpResponse(exportar_planilha(atividade), content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="notas_atividade_{atividade.pk}.csv"'
+        return response
+    
+    planilha = request.FILES.get('planilha')
+    if not planilha:
+        return JsonResponse({'success': False, 'error': 'Envie a planilha no campo "planilha".'}, status=400)
+    
+    try:
+        correcoes = ler_planilha(planilha)
+    except UnicodeDecodeError:
+        return JsonResponse({'success': False, 'error': 'A planilha deve estar em CSV (UTF-8).'}, status=400)
+    
+    if not correcoes:
+        return JsonResponse({'success': False, 'error': 'A planilha está vazia.'}, status=400)
+    
+    total, erros = aplicar_correcoes(atividade, correcoes)
+    
+    if erros:
+        return JsonResponse({'success': False, 'erros': erros}, status=400)
+    
+    return JsonResponse({
+        'success': True,
+        'message': f'{total} envio(s) corrigido(s) pela planilha.'
+    })
+
+
 @login_required
 @user_passes_test(is_professor)
 def excluir_atividade(request, pk):
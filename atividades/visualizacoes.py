@@ -0,0 +1,195 @@
+"""
+Registro das visualizações de atividades pelos alunos.
+
+A primeira visualização é gravada em uma única transação: INSERT com
+ON CONFLICT DO NOTHING e, só quando a linha foi de fato inserida, um
+UPDATE que incrementa o contador e marca a atividade como visualizada.
+
+Tipos com pico de acesso (avisos de prova, ver ATIVIDADES_VISUALIZACAO_EM_LOTE)
+são acumulados em memória por processo e gravados em lote: um INSERT de
+várias linhas e um UPDATE por atividade. Um timer grava o lote no máximo
+ATIVIDADES_LOTE_INTERVALO segundos depois da primeira visualização pendente,
+mesmo que não chegue nenhuma outra. Se a gravação falhar (ex.: "database
+is locked" no SQLite), o lote volta para a fila e o timer tenta de novo.
+Como as gravações não passam
+pelo save(), a série do painel é invalidada aqui (ver atividades/signals.py).
+"""
+import atexit
+import logging
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .dashboard import invalidar_serie
+from .models import Atividade, AtividadeVisualizacao
+
+logger = logging.getLogger(__name__)
+
+# 3 parâmetros por linha; fica abaixo do limite de variáveis do SQLite
+LINHAS_POR_INSERT = 300
+
+
+def _sql_insercao(linhas, retornar=False):
+    qn = connection.ops.quote_name
+    valores = ', '.join(['(%s, %s, %s)'] * linhas)
+    sql = (
+        f'INSERT INTO {qn(AtividadeVisualizacao._meta.db_table)} '
+        f'({qn("atividade_id")}, {qn("aluno_id")}, {qn("visualizado_em")}) '
+        f'VALUES {valores} '
+        f'ON CONFLICT ({qn("atividade_id")}, {qn("aluno_id")}) DO NOTHING'
+    )
+    if retornar:
+        sql += f' RETURNING {qn("atividade_id")}'
+    return sql
+
+
+def _parametros(atividade_id, aluno_id, visualizado_em):
+    return [atividade_id, aluno_id, connection.ops.adapt_datetimefield_value(visualizado_em)]
+
+
+def _contabilizar(novas):
+    """Soma as novas visualizações por atividade (dentro da transação do chamador)"""
+    for atividade_id, total in novas.items():
+        Atividade.objects.filter(pk=atividade_id).update(
+            visualizacoes=F('visualizacoes') + total,
+            foi_visualizado=True,
+        )
+
+
+def registrar_visualizacao(atividade, aluno):
+    """
+    Registra a visualização do aluno e devolve True se foi a primeira.
+    A instância recebida é atualizada em memória, sem refresh_from_db().
+    Nos tipos em lote a gravação é adiada e o retorno é sempre False.
+    """
+    if atividade.tipo in getattr(settings, 'ATIVIDADES_VISUALIZACAO_EM_LOTE', []):
+        lote_visualizacoes().adicionar(atividade.pk, aluno.pk)
+        return False
+
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(_sql_insercao(1), _parametros(atividade.pk, aluno.pk, timezone.now()))
+            inserida = cursor.rowcount == 1
+        if inserida:
+            _contabilizar({atividade.pk: 1})
+
+    if inserida:
+        atividade.visualizacoes += 1
+        atividade.foi_visualizado = True
+        invalidar_serie(atividade.pk)
+    return inserida
+
+
+def gravar_lote(visualizacoes):
+    """
+    Grava {(atividade_id, aluno_id): visualizado_em} em uma transação.
+    Retorna quantas visualizações eram novas.
+    """
+    itens = list(visualizacoes.items())
+    novas = Counter()
+
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            if connection.features.can_return_rows_from_bulk_insert:
+                for inicio in range(0, len(itens), LINHAS_POR_INSERT):
+                    bloco = itens[inicio:inicio + LINHAS_POR_INSERT]
+                    parametros = []
+                    for (atividade_id, aluno_id), visualizado_em in bloco:
+                        parametros += _parametros(atividade_id, aluno_id, visualizado_em)
+                    cursor.execute(_sql_insercao(len(bloco), retornar=True), parametros)
+                    novas.update(linha[0] for linha in cursor.fetchall())
+            else:
+                # Sem RETURNING: uma linha por vez, usando o rowcount
+                for (atividade_id, aluno_id), visualizado_em in itens:
+                    cursor.execute(_sql_insercao(1), _parametros(atividade_id, aluno_id, visualizado_em))
+                    if cursor.rowcount == 1:
+                        novas[atividade_id] += 1
+        _contabilizar(novas)
+
+    for atividade_id in novas:
+        invalidar_serie(atividade_id)
+    return sum(novas.values())
+
+
+class LoteVisualizacoes:
+    """
+    Visualizações pendentes do processo. São gravadas quando o lote chega
+    a `tamanho` ou, por um timer, `intervalo` segundos depois da primeira
+    visualização pendente.
+    """
+
+    def __init__(self, tamanho, intervalo):
+        self.tamanho = tamanho
+        self.intervalo = intervalo
+        self._pendentes = {}
+        self._trava = threading.Lock()
+        self._timer = None
+
+    def adicionar(self, atividade_id, aluno_id):
+        with self._trava:
+            self._pendentes.setdefault((atividade_id, aluno_id), timezone.now())
+            cheio = len(self._pendentes) >= self.tamanho
+            if not cheio:
+                self._agendar()
+        if cheio:
+            self.descarregar()
+
+    def _agendar(self):
+        """Arma o timer se ainda não houver um (chamar com a trava)"""
+        if self._timer is None:
+            self._timer = threading.Timer(self.intervalo, self._descarregar_agendado)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def descarregar(self):
+        """
+        Grava o que estiver pendente; retorna quantas visualizações eram novas.
+        Se a gravação falhar, as visualizações voltam para a fila.
+        """
+        with self._trava:
+            pendentes, self._pendentes = self._pendentes, {}
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        if not pendentes:
+            return 0
+        try:
+            return gravar_lote(pendentes)
+        except DatabaseError:
+            logger.exception('Erro ao gravar %s visualizações; ficam na fila', len(pendentes))
+            with self._trava:
+                # As que voltam são mais antigas que as chegadas nesse meio tempo
+                self._pendentes = {**self._pendentes, **pendentes}
+                self._agendar()
+            return 0
+
+    def _descarregar_agendado(self):
+        try:
+            self.descarregar()
+        finally:
+            connection.close()  # a thread do timer abre a própria conexão
+
+    def __len__(self):
+        return len(self._pendentes)
+
+
+_lote = None
+_lote_trava = threading.Lock()
+
+
+def lote_visualizacoes():
+    """Lote do processo, criado no primeiro uso a partir das configurações"""
+    global _lote
+    if _lote is None:
+        with _lote_trava:
+            if _lote is None:
+                _lote = LoteVisualizacoes(
+                    tamanho=getattr(settings, 'ATIVIDADES_LOTE_VISUALIZACOES', 200),
+                    intervalo=getattr(settings, 'ATIVIDADES_LOTE_INTERVALO', 5),
+                )
+                atexit.register(_lote.descarregar)
+    return _lote
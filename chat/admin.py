@@ -2,7 +2,7 @@ from django.contrib import admin
 
 # Register your models here.
 from django.contrib import admin
-from .models import Chat, Mensagem, MensagemApagada
+from .models import Chat, Mensagem, MensagemApagada, MensagemArquivada
 
 
 @admin.register(Chat)
@@ -46,4 +46,13 @@ class MensagemApagadaAdmin(admin.ModelAdmin):
     list_filter = ('data_apagada',)
     search_fields = ('usuario__username', 'mensagem__mensagem')
     readonly_fields = ('data_apagada',)
-    date_hierarchy = 'data_apagada'
\ No newline at end of file
+    date_hierarchy = 'data_apagada'
+
+
+@admin.register(MensagemArquivada)
+class MensagemArquivadaAdmin(admin.ModelAdmin):
+    list_display = ('id', 'remetente', 'chat', 'data_envio', 'arquivada_em')
+    list_filter = ('arquivada_em',)
+    search_fields = ('remetente__username', 'mensagem')
+    readonly_fields = ('data_envio', 'data_leitura', 'arquivada_em')
+    date_hierarchy = 'data_envio'
@@ -0,0 +1,129 @@
+"""
+Arquivamento de mensagens antigas do chat.
+
+Mensagens mais antigas que CHAT_ARQUIVAR_APOS_DIAS saem da tabela Mensagem
+(quente) e vão para MensagemArquivada (fria). As linhas de MensagemApagada
+dessas mensagens são compactadas em duas flags na própria linha arquivada.
+As mensagens arquivadas continuam na busca textual (ver chat/busca.py).
+"""
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.urls import reverse
+from django.utils import timezone
+
+from .busca import indexar_arquivadas
+from .models import Mensagem, MensagemApagada, MensagemArquivada
+
+
+def data_corte_padrao():
+    """Retorna a data limite padrão para arquivamento"""
+    dias = getattr(settings, 'CHAT_ARQUIVAR_APOS_DIAS', 180)
+    return timezone.now() - timedelta(days=dias)
+
+
+def inicio_ano_letivo(referencia=None):
+    """
+    Retorna o início do ano letivo corrente (1º de fevereiro).
+    Arquivar tudo antes dessa data mantém a tabela quente limitada
+    ao ano letivo atual.
+    """
+    referencia = timezone.localtime(referencia or timezone.now())
+    ano = referencia.year if referencia.month >= 2 else referencia.year - 1
+    return timezone.make_aware(datetime(ano, 2, 1))
+
+
+def arquivar_mensagens(antes_de=None, lote=500):
+    """
+    Move mensagens enviadas antes de `antes_de` para MensagemArquivada.
+    Trabalha em lotes, cada um em sua própria transação, para não segurar
+    o lock de escrita do SQLite por muito tempo.
+
+    Mensagens apagadas pelos dois participantes são descartadas.
+    Retorna um dicionário com os totais de arquivadas e descartadas.
+    """
+    antes_de = antes_de or data_corte_padrao()
+    totais = {'arquivadas': 0, 'descartadas': 0}
+
+    while True:
+        with transaction.atomic():
+            ids = list(
+                Mensagem.objects.filter(data_envio__lt=antes_de)
+                .order_by('id')
+                .values_list('id', flat=True)[:lote]
+            )
+            if not ids:
+                break
+
+            apagadas_por = {}
+            for mensagem_id, usuario_id in MensagemApagada.objects.filter(
+                mensagem_id__in=ids
+            ).values_list('mensagem_id', 'usuario_id'):
+                apagadas_por.setdefault(mensagem_id, set()).add(usuario_id)
+
+            arquivadas = []
+            for msg in Mensagem.objects.filter(id__in=ids).select_related('chat'):
+                quem_apagou = apagadas_por.get(msg.id, set())
+                if msg.remetente_id == msg.chat.remetente_id:
+                    destinatario_id = msg.chat.destinatario_id
+                else:
+                    destinatario_id = msg.chat.remetente_id
+
+                apagada_remetente = msg.remetente_id in quem_apagou
+                apagada_destinatario = destinatario_id in quem_apagou
+
+                if apagada_remetente and apagada_destinatario:
+                    totais['descartadas'] += 1
+                    continue
+
+                arquivadas.append(MensagemArquivada(
+                    id=msg.id,
+                    chat_id=msg.chat_id,
+                    remetente_id=msg.remetente_id,
+                    mensagem=msg.mensagem,
+                    anexo=msg.anexo.name or None,
+                    data_envio=msg.data_envio,
+                    lida=msg.lida,
+                    data_leitura=msg.data_leitura,
+                    apagada_remetente=apagada_remetente,
+                    apagada_destinatario=apagada_destinatario,
+                ))
+
+            MensagemArquivada.objects.bulk_create(arquivadas, ignore_conflicts=True)
+            MensagemApagada.objects.filter(mensagem_id__in=ids).delete()
+            Mensagem.objects.filter(id__in=ids).delete()
+            # O delete tirou as mensagens do índice de busca: as arquivadas voltam
+            indexar_arquivadas(arquivadas)
+            totais['arquivadas'] += len(arquivadas)
+
+    return totais
+
+
+def mensagens_arquivadas_visiveis(chat, usuario):
+    """Mensagens arquivadas do chat que o usuário não apagou"""
+    return chat.mensagens_arquivadas.exclude(
+        Q(remetente=usuario, apagada_remetente=True) |
+        Q(~Q(remetente=usuario), apagada_destinatario=True)
+    )
+
+
+def serializar_mensagem(msg, usuario, arquivada=False):
+    """Converte uma mensagem (viva ou arquivada) em dicionário para o JSON do histórico"""
+    if msg.anexo:
+        nome_url = 'chat:anexo_arquivado' if arquivada else 'chat:anexo'
+        anexo_url = reverse(nome_url, args=[msg.id])
+    else:
+        anexo_url = None
+
+    return {
+        'id': msg.id,
+        'mensagem': msg.mensagem,
+        'enviada': msg.remetente_id == usuario.id,
+        'hora': timezone.localtime(msg.data_envio).strftime('%H:%M'),
+        'lida': msg.lida,
+        'anexo_url': anexo_url,
+        'anexo_nome': msg.anexo.name if msg.anexo else None,
+        'arquivada': arquivada,
+    }
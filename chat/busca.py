@@ -0,0 +1,182 @@
+"""
+Busca textual nas mensagens do chat.
+
+Usa uma tabela virtual FTS5 do SQLite (chat_mensagem_busca) cujo rowid é o
+id da mensagem. O índice é mantido pelos signals de Mensagem (ver
+chat/signals.py) e pode ser reconstruído com `manage.py reconstruir_busca_chat`.
+Mensagens arquivadas continuam no índice (MensagemArquivada mantém o id
+original); o arquivamento reindexa as que moveu.
+"""
+import re
+
+from django.db import connection
+from django.urls import reverse
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Mensagem, MensagemArquivada
+
+TABELA_BUSCA = 'chat_mensagem_busca'
+
+# Marcadores temporários do snippet(), trocados por <mark> depois do escape
+_INICIO_DESTAQUE = '\x02'
+_FIM_DESTAQUE = '\x03'
+
+
+_suporte_fts5 = {}
+
+
+def _tem_fts5(conexao):
+    """SQLite compilado com FTS5? Testa criando uma tabela virtual temporária"""
+    if conexao.vendor != 'sqlite':
+        return False
+    if conexao.alias not in _suporte_fts5:
+        try:
+            with conexao.cursor() as cursor:
+                cursor.execute('CREATE VIRTUAL TABLE temp.chat_teste_fts5 USING fts5(texto)')
+                cursor.execute('DROP TABLE temp.chat_teste_fts5')
+            _suporte_fts5[conexao.alias] = True
+        except Exception:
+            _suporte_fts5[conexao.alias] = False
+    return _suporte_fts5[conexao.alias]
+
+
+def busca_disponivel():
+    return _tem_fts5(connection)
+
+
+def criar_indice(schema_editor=None):
+    """Cria a tabela virtual FTS5 (usado pela migration)"""
+    conexao = schema_editor.connection if schema_editor else connection
+    if not _tem_fts5(conexao):
+        return
+    with conexao.cursor() as cursor:
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABELA_BUSCA} "
+            f"USING fts5(mensagem, tokenize='unicode61 remove_diacritics 2')"
+        )
+
+
+def indexar_mensagem(mensagem):
+    """Insere ou atualiza uma mensagem no índice"""
+    if not busca_disponivel():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABELA_BUSCA} WHERE rowid = %s", [mensagem.id])
+        cursor.execute(
+            f"INSERT INTO {TABELA_BUSCA} (rowid, mensagem) VALUES (%s, %s)",
+            [mensagem.id, mensagem.mensagem]
+        )
+
+
+def indexar_arquivadas(mensagens):
+    """Devolve ao índice mensagens recém-arquivadas (o delete da Mensagem as removeu)"""
+    if not busca_disponivel() or not mensagens:
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"INSERT INTO {TABELA_BUSCA} (rowid, mensagem) VALUES (%s, %s)",
+            [(mensagem.id, mensagem.mensagem) for mensagem in mensagens]
+        )
+
+
+def remover_mensagem(mensagem_id):
+    """Remove uma mensagem do índice"""
+    if not busca_disponivel():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABELA_BUSCA} WHERE rowid = %s", [mensagem_id])
+
+
+def reconstruir_indice():
+    """Recria o índice inteiro a partir das mensagens vivas e arquivadas. Retorna o total indexado."""
+    if not busca_disponivel():
+        return 0
+    criar_indice()
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABELA_BUSCA}")
+        cursor.execute(
+            f"INSERT INTO {TABELA_BUSCA} (rowid, mensagem) "
+            f"SELECT id, mensagem FROM chat_mensagem "
+            f"UNION ALL SELECT id, mensagem FROM chat_mensagemarquivada"
+        )
+        cursor.execute(f"SELECT COUNT(*) FROM {TABELA_BUSCA}")
+        return cursor.fetchone()[0]
+
+
+def montar_consulta(termo):
+    """
+    Converte o texto digitado em uma consulta FTS5 segura: cada palavra vira
+    um termo entre aspas com busca por prefixo, sem operadores do usuário.
+    """
+    palavras = re.findall(r'\w+', termo)
+    return ' '.join(f'"{palavra}"*' for palavra in palavras)
+
+
+def _destacar(trecho):
+    """Escapa o trecho e troca os marcadores por <mark>"""
+    html = escape(trecho)
+    html = html.replace(_INICIO_DESTAQUE, '<mark>').replace(_FIM_DESTAQUE, '</mark>')
+    return mark_safe(html)
+
+
+def buscar_mensagens(usuario, termo, limite=30):
+    """
+    Busca mensagens (vivas e arquivadas) nos chats do usuário, ignorando as
+    que ele apagou. Retorna lista de dicionários com trecho destacado e link
+    para a mensagem.
+    """
+    consulta = montar_consulta(termo)
+    if not consulta or not busca_disponivel():
+        return []
+
+    sql = f"""
+        SELECT {TABELA_BUSCA}.rowid, snippet({TABELA_BUSCA}, 0, %s, %s, '…', 12), ar.id IS NOT NULL
+        FROM {TABELA_BUSCA}
+        LEFT JOIN chat_mensagem m ON m.id = {TABELA_BUSCA}.rowid
+        LEFT JOIN chat_mensagemarquivada ar ON ar.id = {TABELA_BUSCA}.rowid AND m.id IS NULL
+        JOIN chat_chat c ON c.id = COALESCE(m.chat_id, ar.chat_id)
+        WHERE {TABELA_BUSCA} MATCH %s
+          AND (c.remetente_id = %s OR c.destinatario_id = %s)
+          AND (
+              (m.id IS NOT NULL AND NOT EXISTS (
+                  SELECT 1 FROM chat_mensagemapagada a
+                  WHERE a.mensagem_id = m.id AND a.usuario_id = %s
+              ))
+              OR (ar.id IS NOT NULL AND NOT (
+                  CASE WHEN ar.remetente_id = %s THEN ar.apagada_remetente ELSE ar.apagada_destinatario END
+              ))
+          )
+        ORDER BY {TABELA_BUSCA}.rank
+        LIMIT %s
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [
+            _INICIO_DESTAQUE, _FIM_DESTAQUE, consulta,
+            usuario.id, usuario.id, usuario.id, usuario.id, limite,
+        ])
+        linhas = cursor.fetchall()
+
+    vivas = Mensagem.objects.select_related(
+        'chat__remetente', 'chat__destinatario'
+    ).in_bulk([linha[0] for linha in linhas if not linha[2]])
+    arquivadas = MensagemArquivada.objects.select_related(
+        'chat__remetente', 'chat__destinatario'
+    ).in_bulk([linha[0] for linha in linhas if linha[2]])
+
+    resultados = []
+    for mensagem_id, trecho, arquivada in linhas:
+        mensagem = (arquivadas if arquivada else vivas)[mensagem_id]
+        resultados.append({
+            'mensagem_id': mensagem_id,
+            'chat_id': mensagem.chat_id,
+            'outro_usuario': mensagem.chat.get_outro_usuario(usuario).username,
+            'data_envio': mensagem.data_envio,
+            'trecho': _destacar(trecho),
+            'arquivada': bool(arquivada),
+            'url': (
+                f"{reverse('chat:conversa', args=[mensagem.chat_id])}"
+                f"?mensagem={mensagem_id}#msg-{mensagem_id}"
+            ),
+        })
+    return resultados
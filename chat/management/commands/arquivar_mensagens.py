@@ -0,0 +1,45 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from chat.arquivo import arquivar_mensagens, data_corte_padrao, inicio_ano_letivo
+
+
+class Command(BaseCommand):
+    help = 'Move mensagens antigas do chat para a tabela de arquivo'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dias',
+            type=int,
+            help='Arquiva mensagens com mais de N dias (padrão: CHAT_ARQUIVAR_APOS_DIAS)',
+        )
+        parser.add_argument(
+            '--ano-letivo',
+            action='store_true',
+            help='Arquiva tudo que for anterior ao início do ano letivo corrente',
+        )
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=500,
+            help='Quantidade de mensagens movidas por transação',
+        )
+
+    def handle(self, *args, **options):
+        if options['ano_letivo']:
+            antes_de = inicio_ano_letivo()
+        elif options['dias'] is not None:
+            antes_de = timezone.now() - timedelta(days=options['dias'])
+        else:
+            antes_de = data_corte_padrao()
+
+        self.stdout.write(f'Arquivando mensagens anteriores a {timezone.localtime(antes_de):%d/%m/%Y %H:%M}...')
+
+        totais = arquivar_mensagens(antes_de=antes_de, lote=options['lote'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{totais['arquivadas']} mensagem(ns) arquivada(s), "
+            f"{totais['descartadas']} descartada(s) (apagadas pelos dois participantes)."
+        ))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from chat.busca import busca_disponivel, reconstruir_indice
+
+
+class Command(BaseCommand):
+    help = 'Reconstrói o índice de busca textual das mensagens do chat'
+
+    def handle(self, *args, **options):
+        if not busca_disponivel():
+            self.stdout.write(self.style.WARNING('Busca textual indisponível: requer SQLite com FTS5.'))
+            return
+
+        total = reconstruir_indice()
+        self.stdout.write(self.style.SUCCESS(f'{total} mensagem(ns) indexada(s).'))
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:22
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MensagemArquivada',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False, verbose_name='ID')),
+                ('mensagem', models.TextField(verbose_name='Mensagem')),
+                ('anexo', models.FileField(blank=True, null=True, upload_to='chat_anexos/', verbose_name='Anexo')),
+                ('data_envio', models.DateTimeField(verbose_name='Enviado em')),
+                ('lida', models.BooleanField(default=False, verbose_name='Lida')),
+                ('data_leitura', models.DateTimeField(blank=True, null=True, verbose_name='Lida em')),
+                ('apagada_remetente', models.BooleanField(default=False, verbose_name='Apagada pelo remetente')),
+                ('apagada_destinatario', models.BooleanField(default=False, verbose_name='Apagada pelo destinatário')),
+                ('arquivada_em', models.DateTimeField(auto_now_add=True, verbose_name='Arquivada em')),
+            ],
+            options={
+                'verbose_name': 'Mensagem Arquivada',
+                'verbose_name_plural': 'Mensagens Arquivadas',
+                'ordering': ['data_envio'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='mensagem',
+            index=models.Index(fields=['data_envio'], name='chat_mensag_data_en_1a6794_idx'),
+        ),
+        migrations.AddField(
+            model_name='mensagemarquivada',
+            name='chat',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='mensagens_arquivadas', to='chat.chat', verbose_name='Chat'),
+        ),
+        migrations.AddField(
+            model_name='mensagemarquivada',
+            name='remetente',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='mensagens_arquivadas_enviadas', to=settings.AUTH_USER_MODEL, verbose_name='Remetente'),
+        ),
+        migrations.AddIndex(
+            model_name='mensagemarquivada',
+            index=models.Index(fields=['chat', '-id'], name='chat_mensag_chat_id_255f5a_idx'),
+        ),
+    ]
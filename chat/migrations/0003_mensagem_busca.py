@@ -0,0 +1,32 @@
+from django.db import migrations
+
+
+def criar_indice_busca(apps, schema_editor):
+    from chat.busca import TABELA_BUSCA, _tem_fts5, criar_indice
+    if not _tem_fts5(schema_editor.connection):
+        return
+    criar_indice(schema_editor)
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {TABELA_BUSCA} (rowid, mensagem) "
+            f"SELECT id, mensagem FROM chat_mensagem"
+        )
+
+
+def remover_indice_busca(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    from chat.busca import TABELA_BUSCA
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {TABELA_BUSCA}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0002_mensagemarquivada'),
+    ]
+
+    operations = [
+        migrations.RunPython(criar_indice_busca, remover_indice_busca),
+    ]
@@ -0,0 +1,67 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def preencher_par_canonico(apps, schema_editor):
+    """
+    Preenche o par (menor id, maior id) e funde chats duplicados A↔B/B↔A:
+    as mensagens vão para o chat mais antigo e os demais são removidos.
+    """
+    Chat = apps.get_model('chat', 'Chat')
+    Mensagem = apps.get_model('chat', 'Mensagem')
+    MensagemArquivada = apps.get_model('chat', 'MensagemArquivada')
+
+    vistos = {}
+    for chat in Chat.objects.order_by('data_criacao', 'id'):
+        par = tuple(sorted([chat.remetente_id, chat.destinatario_id]))
+        if par in vistos:
+            Mensagem.objects.filter(chat_id=chat.id).update(chat_id=vistos[par])
+            MensagemArquivada.objects.filter(chat_id=chat.id).update(chat_id=vistos[par])
+            chat.delete()
+            continue
+        vistos[par] = chat.id
+        Chat.objects.filter(pk=chat.pk).update(
+            participante_menor_id=par[0],
+            participante_maior_id=par[1],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0003_mensagem_busca'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chat',
+            name='participante_menor',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Participante (menor id)'),
+        ),
+        migrations.AddField(
+            model_name='chat',
+            name='participante_maior',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Participante (maior id)'),
+        ),
+        migrations.RunPython(preencher_par_canonico, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='chat',
+            name='participante_menor',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Participante (menor id)'),
+        ),
+        migrations.AlterField(
+            model_name='chat',
+            name='participante_maior',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Participante (maior id)'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='chat',
+            unique_together=set(),
+        ),
+        migrations.AddConstraint(
+            model_name='chat',
+            constraint=models.UniqueConstraint(fields=('participante_menor', 'participante_maior'), name='chat_par_participantes_unico'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+from django.db import migrations
+
+
+def indexar_arquivadas(apps, schema_editor):
+    """Mensagens já arquivadas voltam para o índice de busca"""
+    from chat.busca import TABELA_BUSCA, _tem_fts5
+    if not _tem_fts5(schema_editor.connection):
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {TABELA_BUSCA} (rowid, mensagem) "
+            f"SELECT id, mensagem FROM chat_mensagemarquivada "
+            f"WHERE id NOT IN (SELECT rowid FROM {TABELA_BUSCA})"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0004_chat_par_canonico'),
+    ]
+
+    operations = [
+        migrations.RunPython(indexar_arquivadas, migrations.RunPython.noop),
+    ]
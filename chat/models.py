@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction, IntegrityError
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 from django.core.exceptions import ValidationError
@@ -23,6 +23,33 @@ def validate_file_extension_chat(file):
         raise ValidationError(f'Extensão {ext} não permitida. Use: {", ".join(allowed)}')
 
 
+class ChatManager(models.Manager):
+    """
+    Manager com busca pelo par canônico de participantes
+    """
+    
+    def do_par(self, usuario_a, usuario_b):
+        """Filtra o chat entre dois usuários, em qualquer direção"""
+        menor, maior = sorted([usuario_a.pk, usuario_b.pk])
+        return self.filter(participante_menor_id=menor, participante_maior_id=maior)
+    
+    def obter_ou_criar(self, usuario, outro_usuario):
+        """
+        Retorna (chat, criado) entre dois usuários sem nunca duplicar o par.
+        Requisições concorrentes que tentarem criar o mesmo chat esbarram
+        na constraint única e reaproveitam o chat criado pela outra.
+        """
+        chat = self.do_par(usuario, outro_usuario).first()
+        if chat:
+            return chat, False
+        
+        try:
+            with transaction.atomic():
+                return self.create(remetente=usuario, destinatario=outro_usuario), True
+        except IntegrityError:
+            return self.do_par(usuario, outro_usuario).get(), False
+
+
 class Chat(models.Model):
     """
     Modelo para armazenar conversas entre usuários
@@ -41,15 +68,44 @@ class Chat(models.Model):
     )
     data_criacao = models.DateTimeField(auto_now_add=True, verbose_name='Criado em')
     
+    # Par canônico (menor id, maior id): identifica o chat independente da direção
+    participante_menor = models.ForeignKey(
+        User,
+        related_name='+',
+        on_delete=models.CASCADE,
+        editable=False,
+        verbose_name='Participante (menor id)'
+    )
+    participante_maior = models.ForeignKey(
+        User,
+        related_name='+',
+        on_delete=models.CASCADE,
+        editable=False,
+        verbose_name='Participante (maior id)'
+    )
+    
+    objects = ChatManager()
+    
     class Meta:
         verbose_name = 'Chat'
         verbose_name_plural = 'Chats'
         ordering = ['-data_criacao']
-        unique_together = ('remetente', 'destinatario')
+        constraints = [
+            models.UniqueConstraint(
+                fields=['participante_menor', 'participante_maior'],
+                name='chat_par_participantes_unico',
+            ),
+        ]
     
     def __str__(self):
         return f"Chat: {self.remetente.username} ↔ {self.destinatario.username}"
     
+    def save(self, *args, **kwargs):
+        menor, maior = sorted([self.remetente_id, self.destinatario_id])
+        self.participante_menor_id = menor
+        self.participante_maior_id = maior
+        super().save(*args, **kwargs)
+    
     def get_ultima_mensagem(self):
         """Retorna a última mensagem do chat"""
         return self.mensagens.order_by('-data_envio').first()
@@ -100,6 +156,9 @@ class Mensagem(models.Model):
         verbose_name = 'Mensagem'
         verbose_name_plural = 'Mensagens'
         ordering = ['data_envio']
+        indexes = [
+            models.Index(fields=['data_envio']),
+        ]
     
     def __str__(self):
         return f"{self.remetente.username}: {self.mensagem[:50]}"
@@ -157,4 +216,47 @@ class MensagemApagada(models.Model):
         unique_together = ('mensagem', 'usuario')
     
     def __str__(self):
-        return f"{self.usuario.username} apagou mensagem {self.mensagem.id}"
\ No newline at end of file
+        return f"{self.usuario.username} apagou mensagem {self.mensagem.id}"
+
+
+class MensagemArquivada(models.Model):
+    """
+    Histórico frio: mensagens antigas movidas para fora da tabela Mensagem.
+    Mantém o mesmo id da mensagem original para que a paginação por id
+    continue funcionando entre as duas tabelas.
+    """
+    id = models.BigIntegerField(primary_key=True, verbose_name='ID')
+    chat = models.ForeignKey(
+        Chat,
+        related_name="mensagens_arquivadas",
+        on_delete=models.CASCADE,
+        verbose_name='Chat'
+    )
+    remetente = models.ForeignKey(
+        User,
+        related_name="mensagens_arquivadas_enviadas",
+        on_delete=models.CASCADE,
+        verbose_name='Remetente'
+    )
+    mensagem = models.TextField(verbose_name='Mensagem')
+    anexo = models.FileField(upload_to='chat_anexos/', null=True, blank=True, verbose_name='Anexo')
+    data_envio = models.DateTimeField(verbose_name='Enviado em')
+    lida = models.BooleanField(default=False, verbose_name='Lida')
+    data_leitura = models.DateTimeField(null=True, blank=True, verbose_name='Lida em')
+    
+    # MensagemApagada compactada: um chat só tem dois participantes
+    apagada_remetente = models.BooleanField(default=False, verbose_name='Apagada pelo remetente')
+    apagada_destinatario = models.BooleanField(default=False, verbose_name='Apagada pelo destinatário')
+    
+    arquivada_em = models.DateTimeField(auto_now_add=True, verbose_name='Arquivada em')
+    
+    class Meta:
+        verbose_name = 'Mensagem Arquivada'
+        verbose_name_plural = 'Mensagens Arquivadas'
+        ordering = ['data_envio']
+        indexes = [
+            models.Index(fields=['chat', '-id']),
+        ]
+    
+    def __str__(self):
+        return f"[arquivo] {self.remetente.username}: {self.mensagem[:50]}"
@@ -0,0 +1,19 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .busca import indexar_mensagem, remover_mensagem
+from .models import Mensagem
+
+
+@receiver(post_save, sender=Mensagem)
+def indexar_mensagem_salva(sender, instance, update_fields=None, **kwargs):
+    """Mantém o índice de busca atualizado a cada mensagem salva"""
+    if update_fields and 'mensagem' not in update_fields:
+        return
+    indexar_mensagem(instance)
+
+
+@receiver(post_delete, sender=Mensagem)
+def remover_mensagem_apagada(sender, instance, **kwargs):
+    """Remove do índice mensagens excluídas (ou arquivadas)"""
+    remover_mensagem(instance.id)
@@ -1,3 +1,232 @@
-from django.test import TestCase
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError, connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import User
+from .arquivo import arquivar_mensagens
+from .busca import busca_disponivel, reconstruir_indice
+from .models import Chat, ChatManager, Mensagem, MensagemApagada, MensagemArquivada
+
+
+class ArquivoChatTests(TestCase):
+    """Mensagens antigas movidas para MensagemArquivada, histórico paginado e anexos arquivados"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.media = tempfile.mkdtemp()
+        cls.media_override = override_settings(MEDIA_ROOT=cls.media, CHAT_JANELA_MENSAGENS=2)
+        cls.media_override.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.media_override.disable()
+        shutil.rmtree(cls.media, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.ana = User.objects.create_user('ana', 'ana@etec.sp.gov.br', 'x')
+        self.bia = User.objects.create_user('bia', 'bia@etec.sp.gov.br', 'x')
+        self.chat = Chat.objects.create(remetente=self.ana, destinatario=self.bia)
+
+    def _mensagem(self, texto, remetente=None, dias=0, **campos):
+        mensagem = Mensagem.objects.create(chat=self.chat, remetente=remetente or self.ana, mensagem=texto, **campos)
+        if dias:
+            Mensagem.objects.filter(pk=mensagem.pk).update(data_envio=timezone.now() - timedelta(days=dias))
+        return mensagem
+
+    def test_arquivamento_compacta_mensagens_apagadas(self):
+        so_ana = self._mensagem('apagada pela ana', dias=400)
+        so_bia = self._mensagem('apagada pela bia', remetente=self.bia, dias=400)
+        as_duas = self._mensagem('apagada pelas duas', dias=400)
+        recente = self._mensagem('recente')
+        MensagemApagada.objects.create(mensagem=so_ana, usuario=self.ana)
+        MensagemApagada.objects.create(mensagem=so_bia, usuario=self.ana)
+        MensagemApagada.objects.create(mensagem=as_duas, usuario=self.ana)
+        MensagemApagada.objects.create(mensagem=as_duas, usuario=self.bia)
+
+        totais = arquivar_mensagens(lote=1)
+
+        self.assertEqual(totais, {'arquivadas': 2, 'descartadas': 1})
+        self.assertEqual(list(Mensagem.objects.values_list('pk', flat=True)), [recente.pk])
+        self.assertFalse(MensagemApagada.objects.exists())
+        arquivadas = {msg.pk: (msg.apagada_remetente, msg.apagada_destinatario) for msg in MensagemArquivada.objects.all()}
+        # so_bia foi enviada pela bia e apagada pela ana (destinatária)
+        self.assertEqual(arquivadas, {so_ana.pk: (True, False), so_bia.pk: (False, True)})
+
+    def test_historico_pagina_entre_as_tabelas(self):
+        antigas = [self._mensagem(f'antiga {i}', dias=400) for i in range(3)]
+        MensagemApagada.objects.create(mensagem=antigas[1], usuario=self.bia)
+        novas = [self._mensagem(f'nova {i}') for i in range(3)]
+        arquivar_mensagens()
+
+        self.client.force_login(self.bia)
+        resposta = self.client.get(reverse('chat:conversa', args=[self.chat.pk]))
+        self.assertEqual([msg.pk for msg in resposta.context['mensagens']], [novas[1].pk, novas[2].pk])
+        self.assertTrue(resposta.context['tem_anteriores'])
+
+        url = reverse('chat:historico', args=[self.chat.pk])
+        pagina = self.client.get(url, {'antes': novas[1].pk}).json()
+        self.assertEqual([msg['id'] for msg in pagina['mensagens']], [antigas[2].pk, novas[0].pk])
+        self.assertEqual([msg['arquivada'] for msg in pagina['mensagens']], [True, False])
+        self.assertTrue(pagina['tem_mais'])
+
+        # A bia apagou antigas[1]: a próxima página pula direto para antigas[0]
+        pagina = self.client.get(url, {'antes': antigas[2].pk}).json()
+        self.assertEqual([msg['id'] for msg in pagina['mensagens']], [antigas[0].pk])
+        self.assertFalse(pagina['tem_mais'])
+
+    def test_tem_anteriores_ignora_arquivadas_apagadas_pelo_usuario(self):
+        antiga = self._mensagem('antiga', dias=400)
+        MensagemApagada.objects.create(mensagem=antiga, usuario=self.bia)
+        self._mensagem('nova')
+        arquivar_mensagens()
+
+        self.client.force_login(self.bia)
+        self.assertFalse(self.client.get(reverse('chat:conversa', args=[self.chat.pk])).context['tem_anteriores'])
+        self.client.force_login(self.ana)
+        self.assertTrue(self.client.get(reverse('chat:conversa', args=[self.chat.pk])).context['tem_anteriores'])
+
+    def test_anexo_arquivado_so_para_participantes(self):
+        anexo = SimpleUploadedFile('resumo.pdf', b'%PDF-1.4 conteudo', content_type='application/pdf')
+        mensagem = self._mensagem('segue o arquivo', dias=400, anexo=anexo)
+        arquivar_mensagens()
+        url = reverse('chat:anexo_arquivado', args=[mensagem.pk])
+
+        self.client.force_login(self.bia)
+        resposta = self.client.get(url)
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(b''.join(resposta.streaming_content), b'%PDF-1.4 conteudo')
+
+        self.client.force_login(User.objects.create_user('caio', 'caio@etec.sp.gov.br', 'x'))
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class BuscaChatTests(TestCase):
+    """Busca FTS5 em mensagens vivas e arquivadas, respeitando as apagadas"""
+
+    def setUp(self):
+        self.ana = User.objects.create_user('ana', 'ana@etec.sp.gov.br', 'x')
+        self.bia = User.objects.create_user('bia', 'bia@etec.sp.gov.br', 'x')
+        self.caio = User.objects.create_user('caio', 'caio@etec.sp.gov.br', 'x')
+        self.chat = Chat.objects.create(remetente=self.ana, destinatario=self.bia)
+
+    def _buscar(self, termo):
+        resposta = self.client.get(reverse('chat:buscar'), {'q': termo})
+        return [resultado['mensagem_id'] for resultado in resposta.json()['resultados']]
+
+    def test_busca_inclui_arquivadas_e_pula_para_elas(self):
+        self.assertTrue(busca_disponivel())
+        antiga = Mensagem.objects.create(chat=self.chat, remetente=self.ana, mensagem='Revisão de fotossíntese')
+        Mensagem.objects.filter(pk=antiga.pk).update(data_envio=timezone.now() - timedelta(days=400))
+        apagada = Mensagem.objects.create(chat=self.chat, remetente=self.bia, mensagem='fotossintese apagada')
+        MensagemApagada.objects.create(mensagem=apagada, usuario=self.ana)
+        viva = Mensagem.objects.create(chat=self.chat, remetente=self.bia, mensagem='Fotossíntese <b>hoje</b>')
+        arquivar_mensagens()
+
+        self.client.force_login(self.ana)
+        resposta = self.client.get(reverse('chat:buscar'), {'q': 'fotossintese'}).json()
+        self.assertEqual(sorted(r['mensagem_id'] for r in resposta['resultados']), [antiga.pk, viva.pk])
+        self.assertIn('&lt;b&gt;', next(r['trecho'] for r in resposta['resultados'] if r['mensagem_id'] == viva.pk))
+
+        pagina = self.client.get(reverse('chat:conversa', args=[self.chat.pk]), {'mensagem': antiga.pk})
+        self.assertEqual(pagina.context['mensagens'][0].pk, antiga.pk)
+        self.assertFalse(pagina.context['tem_anteriores'])
+
+        self.client.force_login(self.caio)
+        self.assertEqual(self._buscar('fotossintese'), [])
+
+    def test_reconstruir_indice(self):
+        Mensagem.objects.create(chat=self.chat, remetente=self.ana, mensagem='equação do segundo grau')
+        self.assertEqual(reconstruir_indice(), 1)
+        self.client.force_login(self.bia)
+        self.assertEqual(len(self._buscar('equacao')), 1)
+        self.assertEqual(self._buscar('"; DROP TABLE chat_chat; --'), [])
+
+
+class ParCanonicoTests(TestCase):
+    """Um único chat por par de usuários, em qualquer direção"""
+
+    def setUp(self):
+        self.ana = User.objects.create_user('ana', 'ana@etec.sp.gov.br', 'x')
+        self.bia = User.objects.create_user('bia', 'bia@etec.sp.gov.br', 'x')
+
+    def test_constraint_barra_par_invertido(self):
+        chat = Chat.objects.create(remetente=self.bia, destinatario=self.ana)
+        self.assertEqual(
+            (chat.participante_menor_id, chat.participante_maior_id),
+            tuple(sorted([self.ana.pk, self.bia.pk])),
+        )
+        with self.assertRaises(IntegrityError):
+            Chat.objects.create(remetente=self.ana, destinatario=self.bia)
+
+    def test_obter_ou_criar_reaproveita_chat_existente(self):
+        chat, criado = Chat.objects.obter_ou_criar(self.ana, self.bia)
+        self.assertTrue(criado)
+        self.assertEqual(Chat.objects.obter_ou_criar(self.bia, self.ana), (chat, False))
+
+    def test_obter_ou_criar_concorrente(self):
+        # A outra requisição cria o chat entre a busca e o create desta
+        existente = Chat.objects.create(remetente=self.bia, destinatario=self.ana)
+        do_par = ChatManager.do_par
+        buscas = []
+
+        def do_par_atrasado(manager, usuario_a, usuario_b):
+            buscas.append(usuario_a)
+            if len(buscas) == 1:
+                return manager.none()
+            return do_par(manager, usuario_a, usuario_b)
+
+        with mock.patch.object(ChatManager, 'do_par', do_par_atrasado):
+            chat, criado = Chat.objects.obter_ou_criar(self.ana, self.bia)
+
+        self.assertEqual((chat, criado), (existente, False))
+        self.assertEqual(Chat.objects.count(), 1)
+
+
+class MigracaoParCanonicoTests(TransactionTestCase):
+    """0004 funde os chats duplicados A↔B/B↔A no mais antigo"""
+
+    antes = [('chat', '0003_mensagem_busca')]
+    depois = [('chat', '0004_chat_par_canonico')]
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+        super().tearDown()
+
+    def test_duplicados_sao_fundidos(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.antes)
+        apps = executor.loader.project_state(self.antes).apps
+        ChatAntigo = apps.get_model('chat', 'Chat')
+        MensagemAntiga = apps.get_model('chat', 'Mensagem')
+
+        # accounts não volta junto com o chat: os usuários usam o modelo atual
+        ana, bia, caio = (User.objects.create_user(nome, f'{nome}@etec.sp.gov.br', 'x') for nome in ('ana', 'bia', 'caio'))
+        original = ChatAntigo.objects.create(remetente_id=ana.pk, destinatario_id=bia.pk)
+        duplicado = ChatAntigo.objects.create(remetente_id=bia.pk, destinatario_id=ana.pk)
+        outro = ChatAntigo.objects.create(remetente_id=caio.pk, destinatario_id=ana.pk)
+        MensagemAntiga.objects.create(chat=original, remetente_id=ana.pk, mensagem='oi')
+        MensagemAntiga.objects.create(chat=duplicado, remetente_id=bia.pk, mensagem='olá')
+
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.depois)
+        apps = executor.loader.project_state(self.depois).apps
+        ChatNovo = apps.get_model('chat', 'Chat')
+        MensagemNova = apps.get_model('chat', 'Mensagem')
+
+        self.assertEqual(sorted(ChatNovo.objects.values_list('pk', flat=True)), [original.pk, outro.pk])
+        self.assertEqual(MensagemNova.objects.filter(chat_id=original.pk).count(), 2)
+        self.assertEqual(
+            ChatNovo.objects.values_list('participante_menor_id', 'participante_maior_id').get(pk=outro.pk),
+            (ana.pk, caio.pk),
+        )
@@ -10,6 +10,12 @@ urlpatterns = [
     # Conversa específica
     path('<int:chat_id>/', views.conversa, name='conversa'),
     
+    # Histórico anterior à janela ao vivo (inclui mensagens arquivadas)
+    path('<int:chat_id>/historico/', views.historico, name='historico'),
+    
+    # Busca nas mensagens
+    path('buscar/', views.buscar, name='buscar'),
+    
     # Nova conversa
     path('novo/', views.nova_conversa, name='novo'),
     
@@ -24,6 +30,7 @@ urlpatterns = [
     
     # Baixar anexo
     path('anexo/<int:mensagem_id>/', views.baixar_anexo, name='anexo'),
+    path('anexo/arquivo/<int:mensagem_id>/', views.baixar_anexo_arquivado, name='anexo_arquivado'),
     
     # Marcar como lida
     path('lida/<int:mensagem_id>/', views.marcar_como_lida, name='lida'),
@@ -5,8 +5,11 @@ from django.views.decorators.http import require_POST
 from django.contrib import messages
 from django.db.models import Q, Max, Count, F
 from django.utils import timezone
-from .models import Chat, Mensagem, MensagemApagada
+from django.conf import settings
+from .models import Chat, Mensagem, MensagemApagada, MensagemArquivada
 from .forms import MensagemForm
+from .arquivo import mensagens_arquivadas_visiveis, serializar_mensagem
+from .busca import buscar_mensagens
 from accounts.models import User
 import os
 import mimetypes
@@ -21,6 +24,8 @@ def lista_chats(request):
     
     chats = Chat.objects.filter(
         Q(remetente=user) | Q(destinatario=user)
+    ).select_related(
+        'remetente__perfil', 'destinatario__perfil'
     ).annotate(
         ultima_mensagem_data=Max('mensagens__data_envio')
     ).order_by('-ultima_mensagem_data')
@@ -56,7 +61,9 @@ def conversa(request, chat_id):
     """
     Exibe a conversa de um chat específico - CORRIGIDO: RASCUNHOS
     """
-    chat = get_object_or_404(Chat, id=chat_id)
+    chat = get_object_or_404(
+        Chat.objects.select_related('remetente__perfil', 'destinatario__perfil'), id=chat_id
+    )
     user = request.user
     
     if user not in [chat.remetente, chat.destinatario]:
@@ -69,15 +76,48 @@ def conversa(request, chat_id):
         usuario=user
     ).values_list('mensagem_id', flat=True)
     
-    mensagens = chat.mensagens.exclude(
+    mensagens_visiveis = chat.mensagens.exclude(
         id__in=mensagens_apagadas_ids
-    ).select_related('remetente').order_by('data_envio')
+    )
     
-    mensagens.filter(
+    mensagens_visiveis.filter(
         remetente=outro_usuario,
         lida=False
     ).update(lida=True, data_leitura=timezone.now())
     
+    # JANELA AO VIVO: apenas as últimas mensagens; o restante vem do histórico
+    janela = getattr(settings, 'CHAT_JANELA_MENSAGENS', 50)
+    foco = request.GET.get('mensagem', '')
+    tem_posteriores = False
+    
+    if foco.isdigit():
+        # Pular para uma mensagem (resultado da busca): janela começa nela.
+        # Os ids arquivados são todos menores que os vivos, então o arquivo vem primeiro.
+        arquivadas_visiveis = mensagens_arquivadas_visiveis(chat, user)
+        a_partir = list(
+            arquivadas_visiveis.select_related('remetente')
+            .filter(id__gte=int(foco)).order_by('id')[:janela + 1]
+        )
+        for msg in a_partir:
+            msg.arquivada = True
+        if len(a_partir) <= janela:
+            a_partir += list(
+                mensagens_visiveis.select_related('remetente')
+                .filter(id__gte=int(foco)).order_by('id')[:janela + 1 - len(a_partir)]
+            )
+        tem_posteriores = len(a_partir) > janela
+        mensagens = a_partir[:janela]
+        tem_anteriores = (
+            mensagens_visiveis.filter(id__lt=int(foco)).exists()
+            or arquivadas_visiveis.filter(id__lt=int(foco)).exists()
+        )
+    else:
+        ultimas = list(
+            mensagens_visiveis.select_related('remetente').order_by('-id')[:janela + 1]
+        )
+        tem_anteriores = len(ultimas) > janela or mensagens_arquivadas_visiveis(chat, user).exists()
+        mensagens = ultimas[:janela][::-1]
+    
     # PROCESSAR ENVIO DE MENSAGEM
     if request.method == 'POST':
         form = MensagemForm(request.POST, request.FILES)
@@ -105,6 +145,9 @@ def conversa(request, chat_id):
         'chat': chat,
         'outro_usuario': outro_usuario,
         'mensagens': mensagens,
+        'tem_anteriores': tem_anteriores,
+        'tem_posteriores': tem_posteriores,
+        'mensagem_foco': int(foco) if foco.isdigit() else None,
         'form': form,
         'draft_text': draft_text,
     }
@@ -112,6 +155,77 @@ def conversa(request, chat_id):
     return render(request, 'chat/conversa.html', context)
 
 
+@login_required
+def historico(request, chat_id):
+    """
+    Retorna mensagens anteriores à janela ao vivo (scroll para cima).
+    Busca primeiro na tabela Mensagem e só consulta o arquivo quando
+    as mensagens ao vivo acabam.
+    """
+    chat = get_object_or_404(Chat, id=chat_id)
+    user = request.user
+    
+    if user not in [chat.remetente, chat.destinatario]:
+        return JsonResponse({'success': False, 'error': 'Acesso negado'}, status=403)
+    
+    try:
+        antes = int(request.GET.get('antes', ''))
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Parâmetro "antes" inválido'}, status=400)
+    
+    janela = getattr(settings, 'CHAT_JANELA_MENSAGENS', 50)
+    
+    mensagens_apagadas_ids = MensagemApagada.objects.filter(
+        usuario=user
+    ).values_list('mensagem_id', flat=True)
+    
+    ao_vivo = list(
+        chat.mensagens.exclude(id__in=mensagens_apagadas_ids)
+        .filter(id__lt=antes)
+        .order_by('-id')[:janela + 1]
+    )
+    itens = [serializar_mensagem(msg, user) for msg in ao_vivo[:janela]]
+    
+    if len(ao_vivo) > janela:
+        tem_mais = True
+    else:
+        restante = janela - len(itens)
+        arquivadas = list(
+            mensagens_arquivadas_visiveis(chat, user)
+            .filter(id__lt=antes)
+            .order_by('-id')[:restante + 1]
+        )
+        itens += [serializar_mensagem(msg, user, arquivada=True) for msg in arquivadas[:restante]]
+        tem_mais = len(arquivadas) > restante
+    
+    itens.reverse()
+    
+    return JsonResponse({
+        'success': True,
+        'mensagens': itens,
+        'tem_mais': tem_mais,
+    })
+
+
+@login_required
+def buscar(request):
+    """
+    Busca textual nas mensagens dos chats do usuário
+    """
+    termo = request.GET.get('q', '').strip()
+    
+    resultados = [{
+        'mensagem_id': r['mensagem_id'],
+        'chat_id': r['chat_id'],
+        'outro_usuario': r['outro_usuario'],
+        'data_envio': timezone.localtime(r['data_envio']).strftime('%d/%m %H:%M'),
+        'trecho': r['trecho'],
+        'url': r['url'],
+    } for r in buscar_mensagens(request.user, termo)] if termo else []
+    
+    return JsonResponse({'success': True, 'resultados': resultados})
+
+
 @login_required
 def nova_conversa(request):
     """
@@ -157,16 +271,9 @@ def nova_conversa(request):
             messages.error(request, 'Usuário não encontrado.')
             return redirect('chat:novo')
         
-        chat = Chat.objects.filter(
-            Q(remetente=request.user, destinatario=destinatario) |
-            Q(remetente=destinatario, destinatario=request.user)
-        ).first()
+        chat, criado = Chat.objects.obter_ou_criar(request.user, destinatario)
         
-        if not chat:
-            chat = Chat.objects.create(
-                remetente=request.user,
-                destinatario=destinatario
-            )
+        if criado:
             messages.success(request, f'Chat iniciado com {destinatario.username}!')
         else:
             messages.info(request, f'Você já tem uma conversa com {destinatario.username}.')
@@ -312,6 +419,36 @@ def baixar_anexo(request, mensagem_id):
     return response
 
 
+@login_required
+def baixar_anexo_arquivado(request, mensagem_id):
+    """
+    Baixa anexo de uma mensagem arquivada
+    """
+    mensagem = get_object_or_404(MensagemArquivada, id=mensagem_id)
+    
+    if request.user not in [mensagem.chat.remetente, mensagem.chat.destinatario]:
+        raise Http404('Acesso negado')
+    
+    if not mensagem.anexo:
+        raise Http404('Anexo não encontrado')
+    
+    file_path = mensagem.anexo.path
+    
+    if not os.path.exists(file_path):
+        raise Http404('Arquivo não encontrado no servidor')
+    
+    mime_type, _ = mimetypes.guess_type(file_path)
+    if mime_type is None:
+        mime_type = 'application/octet-stream'
+    
+    filename = os.path.basename(file_path)
+    
+    response = FileResponse(open(file_path, 'rb'), content_type=mime_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    
+    return response
+
+
 @login_required
 def marcar_como_lida(request, mensagem_id):
     """
@@ -6,6 +6,8 @@ from django.db.models import F, Q
 from django.views.decorators.http import require_POST
 from django.contrib import messages
 from .models import Materia, Note, Comment, NoteLike, NoteView, NoteRecommendation
+from perfil.estatisticas import ajustar as ajustar_estatisticas_perfil
+from perfil.popups import invalidar as invalidar_popups_perfil
 import mimetypes
 import os
 import re
@@ -109,7 +111,7 @@ def note_detail(request, pk):
     if can_recommend:
         user_has_recommended = NoteRecommendation.objects.filter(note=note, teacher=request.user).exists()
     
-    comments = note.comments.select_related('author').all()
+    comments = note.comments.select_related('author', 'author__perfil').all()
     
     context = {
         'note': note,
@@ -349,6 +351,9 @@ def download_note(request, pk):
     
     Note.objects.filter(pk=pk).update(downloads=F('downloads') + 1)
     note.refresh_from_db(fields=['downloads'])
+    # update() não dispara sinais: atualiza o perfil do autor aqui
+    ajustar_estatisticas_perfil(note.author_id, downloads_received=1)
+    invalidar_popups_perfil(note.author_id)
     
     note.check_auto_recommend()
     
@@ -1,17 +1,17 @@
 from django.contrib import admin
-from .models import PerfilUsuario
+from .models import Classificacao, EstatisticasPerfil, PerfilUsuario, RegistroAcesso
 
 
 @admin.register(PerfilUsuario)
 class PerfilUsuarioAdmin(admin.ModelAdmin):
     list_display = ('user', 'last_edit', 'streak_count', 'pode_editar_status')
     search_fields = ('user__username', 'user__email')
-    readonly_fields = ('last_edit', 'last_login_date', 'streak_count')
+    readonly_fields = ('photo_hash', 'last_edit', 'last_login_date', 'streak_count')
     list_filter = ('last_login_date',)
     
     fieldsets = (
         ('Usuário', {
-            'fields': ('user', 'photo')
+            'fields': ('user', 'photo', 'photo_hash')
         }),
         ('Controle de Edições', {
             'fields': ('last_edit',),
@@ -30,4 +30,27 @@ class PerfilUsuarioAdmin(admin.ModelAdmin):
             return "✅ Sim"
         else:
             return f"❌ Não (falta {obj.dias_ate_proxima_edicao()} dias)"
-    pode_editar_status.short_description = 'Pode editar?'
\ No newline at end of file
+    pode_editar_status.short_description = 'Pode editar?'
+
+
+@admin.register(EstatisticasPerfil)
+class EstatisticasPerfilAdmin(admin.ModelAdmin):
+    list_display = ('user', 'notes_count', 'likes_received', 'downloads_received', 'recommendations_given', 'atualizado_em')
+    search_fields = ('user__username',)
+    readonly_fields = ('user', 'notes_count', 'likes_received', 'downloads_received', 'recommendations_given', 'atualizado_em')
+
+
+@admin.register(RegistroAcesso)
+class RegistroAcessoAdmin(admin.ModelAdmin):
+    list_display = ('user', 'dia')
+    list_filter = ('dia',)
+    search_fields = ('user__username',)
+    date_hierarchy = 'dia'
+
+
+@admin.register(Classificacao)
+class ClassificacaoAdmin(admin.ModelAdmin):
+    list_display = ('ranking', 'posicao', 'user', 'valor', 'atualizado_em')
+    list_filter = ('ranking',)
+    search_fields = ('user__username',)
+    ordering = ('ranking', 'ordem')
@@ -4,4 +4,7 @@ from django.apps import AppConfig
 class PerfilConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'perfil'
-    verbose_name = 'Perfil do Usuário'
\ No newline at end of file
+    verbose_name = 'Perfil do Usuário'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,146 @@
+"""
+Fotos de perfil: normalização e variantes em tamanhos fixos.
+
+- No upload, a foto é aberta com o Pillow, girada conforme a orientação
+  do EXIF, convertida para RGB e regravada em JPEG sem metadados (GPS,
+  câmera etc. não são copiados). Essa é a foto "original" do perfil.
+- Os arquivos são endereçados pelo conteúdo: o nome é o SHA-256 da foto
+  normalizada (profile_pics/ab/abcd….jpg). A mesma foto enviada de novo
+  reaproveita os arquivos já gravados.
+- As variantes de TAMANHOS px (WebP e JPEG) são geradas depois do commit
+  em um pool de threads, fora da requisição. Quando ficam prontas,
+  PerfilUsuario.photo_hash é preenchido; até lá a tag {% avatar %} usa a
+  foto normalizada.
+"""
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from .models import PerfilUsuario
+
+logger = logging.getLogger(__name__)
+
+TAMANHOS = (32, 64, 256)
+LADO_MAXIMO = 1024  # a foto normalizada não passa disso
+TAMANHO_MAXIMO_UPLOAD = 5 * 1024 * 1024
+PASTA = 'profile_pics'
+
+_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix='perfil-avatares')
+
+
+class FotoInvalida(ValueError):
+    pass
+
+
+def nome_original(photo_hash):
+    return f'{PASTA}/{photo_hash[:2]}/{photo_hash}.jpg'
+
+
+def nome_variante(photo_hash, tamanho, formato):
+    return f'{PASTA}/{photo_hash[:2]}/{photo_hash}_{tamanho}.{formato}'
+
+
+def _gravar(nome, conteudo):
+    """Grava só se ainda não existe (o nome já identifica o conteúdo)"""
+    if not default_storage.exists(nome):
+        default_storage.save(nome, ContentFile(conteudo))
+
+
+def _jpeg(imagem, **opcoes):
+    saida = BytesIO()
+    imagem.save(saida, 'JPEG', quality=85, optimize=True, progressive=True, **opcoes)
+    return saida.getvalue()
+
+
+# ========================================
+# NORMALIZAÇÃO (NA REQUISIÇÃO)
+# ========================================
+def normalizar(arquivo):
+    """
+    Corrige a orientação, remove metadados e grava a foto normalizada.
+    Devolve o hash do conteúdo. Levanta FotoInvalida se não for uma imagem.
+    """
+    if arquivo.size > TAMANHO_MAXIMO_UPLOAD:
+        raise FotoInvalida('A foto deve ter no máximo 5MB.')
+    try:
+        with Image.open(arquivo) as imagem:
+            imagem = ImageOps.exif_transpose(imagem)
+            if imagem.mode in ('RGBA', 'LA', 'P'):
+                imagem = imagem.convert('RGBA')
+                fundo = Image.new('RGB', imagem.size, 'white')
+                fundo.paste(imagem, mask=imagem.getchannel('A'))
+                imagem = fundo
+            else:
+                imagem = imagem.convert('RGB')
+            imagem.thumbnail((LADO_MAXIMO, LADO_MAXIMO), Image.LANCZOS)
+            conteudo = _jpeg(imagem)
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as e:
+        raise FotoInvalida('Arquivo de imagem inválido.') from e
+
+    photo_hash = hashlib.sha256(conteudo).hexdigest()
+    _gravar(nome_original(photo_hash), conteudo)
+    return photo_hash
+
+
+# ========================================
+# VARIANTES (EM SEGUNDO PLANO)
+# ========================================
+def gerar_variantes(photo_hash):
+    """Recorte quadrado central em cada tamanho, em WebP e JPEG"""
+    with default_storage.open(nome_original(photo_hash), 'rb') as arquivo:
+        with Image.open(arquivo) as original:
+            original.load()
+    for tamanho in TAMANHOS:
+        if default_storage.exists(nome_variante(photo_hash, tamanho, 'webp')):
+            continue
+        imagem = ImageOps.fit(original, (tamanho, tamanho), Image.LANCZOS)
+        _gravar(nome_variante(photo_hash, tamanho, 'jpg'), _jpeg(imagem))
+        saida = BytesIO()
+        imagem.save(saida, 'WEBP', quality=80, method=6)
+        # O WebP por último: a presença dele indica que o tamanho está completo
+        _gravar(nome_variante(photo_hash, tamanho, 'webp'), saida.getvalue())
+
+
+def processar(perfil_id, photo_hash):
+    """Gera as variantes e marca o perfil, se a foto ainda for a mesma"""
+    gerar_variantes(photo_hash)
+    PerfilUsuario.objects.filter(pk=perfil_id, photo=nome_original(photo_hash)).update(photo_hash=photo_hash)
+
+
+def _processar_em_segundo_plano(perfil_id, photo_hash):
+    try:
+        processar(perfil_id, photo_hash)
+    except Exception:
+        logger.exception('Erro ao gerar as variantes da foto %s', photo_hash)
+    finally:
+        # A thread do pool não passa pelo ciclo de requisição que fecharia a conexão
+        close_old_connections()
+
+
+def trocar_foto(perfil, arquivo):
+    """
+    Normaliza a foto enviada e aponta o perfil para ela (sem salvar).
+    Depois de salvar o perfil, chame agendar_variantes().
+    """
+    photo_hash = normalizar(arquivo)
+    perfil.photo.name = nome_original(photo_hash)
+    # Foto já enviada antes: as variantes estão prontas
+    prontas = all(default_storage.exists(nome_variante(photo_hash, tamanho, 'webp')) for tamanho in TAMANHOS)
+    perfil.photo_hash = photo_hash if prontas else ''
+    return photo_hash
+
+
+def agendar_variantes(perfil):
+    """Gera as variantes em segundo plano, depois do commit da transação atual"""
+    if not perfil.photo or perfil.photo_hash:
+        return
+    photo_hash = perfil.photo.name.rsplit('/', 1)[-1].split('.')[0]
+    if perfil.photo.name != nome_original(photo_hash):
+        return  # foto antiga, sem normalização: ver o comando gerar_avatares
+    transaction.on_commit(lambda: _pool.submit(_processar_em_segundo_plano, perfil.pk, photo_hash))
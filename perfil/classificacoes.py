@@ -0,0 +1,94 @@
+"""
+Rankings da escola (curtidas, downloads, ofensivas, alunos mais ativos por ano).
+
+As fontes já são mantidas de forma incremental: EstatisticasPerfil pelos
+sinais, ofensivas pelo lote diário e RegistroAcesso pelo middleware. A
+materialização só ordena esses valores e grava a tabela Classificacao
+(sem GROUP BY sobre curtidas/notes). A consulta às curtidas vira leitura
+de índice:
+
+- "sua posição": busca por (ranking, user), O(log n);
+- top-N paginado: intervalo de (ranking, ordem), sem OFFSET.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, F, Max
+from django.utils import timezone
+
+from .models import Classificacao, EstatisticasPerfil, PerfilUsuario, RegistroAcesso
+
+POR_PAGINA = 20
+DIAS_ATIVIDADE = 30  # janela dos rankings de alunos mais ativos
+
+RANKINGS = dict(Classificacao.RANKING_CHOICES)
+UNIDADES = {
+    'curtidas': 'curtidas',
+    'downloads': 'downloads',
+    'ofensiva': 'dias seguidos',
+    **{f'ativos-{ano}': f'dias de acesso nos últimos {DIAS_ATIVIDADE} dias' for ano in (1, 2, 3)},
+}
+
+
+def _valores(ranking):
+    """Consulta (user_id, valor) da fonte do ranking, só com valores positivos"""
+    if ranking in ('curtidas', 'downloads'):
+        campo = 'likes_received' if ranking == 'curtidas' else 'downloads_received'
+        return EstatisticasPerfil.objects.filter(
+            user__is_active=True, **{f'{campo}__gt': 0}
+        ).values(usuario=F('user_id'), valor=F(campo))
+
+    if ranking == 'ofensiva':
+        return PerfilUsuario.objects.filter(
+            user__is_active=True, streak_count__gt=0
+        ).values(usuario=F('user_id'), valor=F('streak_count'))
+
+    ano = int(ranking.split('-')[1])
+    desde = timezone.localdate() - timedelta(days=DIAS_ATIVIDADE)
+    return RegistroAcesso.objects.filter(
+        dia__gt=desde, user__is_active=True, user__user_type='aluno', user__ano_escolar=ano
+    ).values(usuario=F('user_id')).annotate(valor=Count('pk'))
+
+
+@transaction.atomic
+def materializar(ranking):
+    """Regrava o ranking inteiro; devolve o número de participantes"""
+    agora = timezone.now()
+    linhas = []
+    anterior, posicao = None, 0
+    consulta = _valores(ranking).order_by('-valor', 'usuario')
+    for ordem, linha in enumerate(consulta.iterator(), start=1):
+        if linha['valor'] != anterior:
+            posicao, anterior = ordem, linha['valor']
+        linhas.append(Classificacao(
+            ranking=ranking, user_id=linha['usuario'], ordem=ordem,
+            posicao=posicao, valor=linha['valor'], atualizado_em=agora,
+        ))
+
+    Classificacao.objects.filter(ranking=ranking).delete()
+    Classificacao.objects.bulk_create(linhas, batch_size=500)
+    return len(linhas)
+
+
+def materializar_todos():
+    return {ranking: materializar(ranking) for ranking in RANKINGS}
+
+
+def posicoes_do_usuario(usuario):
+    """{ranking: (posição, valor)} do usuário, em uma consulta"""
+    return {
+        ranking: (posicao, valor)
+        for ranking, posicao, valor in Classificacao.objects.filter(user=usuario).values_list('ranking', 'posicao', 'valor')
+    }
+
+
+def pagina(ranking, numero=1, por_pagina=None):
+    """Itens da página `numero` (a partir de 1) e o total de participantes"""
+    por_pagina = por_pagina or POR_PAGINA
+    inicio = (max(numero, 1) - 1) * por_pagina
+    itens = list(
+        Classificacao.objects.filter(ranking=ranking, ordem__gt=inicio, ordem__lte=inicio + por_pagina)
+        .order_by('ordem').values('posicao', 'valor', 'user_id', 'user__username', 'atualizado_em')
+    )
+    total = Classificacao.objects.filter(ranking=ranking).aggregate(total=Max('ordem'))['total'] or 0
+    return itens, total
@@ -0,0 +1,107 @@
+"""
+Disponibilidade de nome de usuário/e-mail enquanto o usuário digita.
+
+- A consulta é por igualdade nas colunas normalizadas (User.username_normalizado
+  e User.email_normalizado, com índice único), em vez de __iexact.
+- Cache negativo em memória: valores que não existem no banco ficam
+  guardados por CACHE_SEGUNDOS, então as teclas repetidas não consultam de
+  novo. Quando um usuário é salvo, os valores dele saem do cache (sinal em
+  perfil/signals.py). A garantia final é o índice único no save.
+- Limite por sessão: até LIMITE verificações a cada JANELA_SEGUNDOS; acima
+  disso a view responde 429 com Retry-After e o front-end reagenda.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+
+User = get_user_model()
+
+CACHE_SEGUNDOS = 30
+CACHE_MAXIMO = 2048
+LIMITE = 15
+JANELA_SEGUNDOS = 10
+
+CAMPOS = {
+    'username': 'username_normalizado',
+    'email': 'email_normalizado',
+}
+
+
+class CacheNegativo:
+    """Conjunto com validade e tamanho máximo (os mais antigos saem primeiro)"""
+
+    def __init__(self, segundos=CACHE_SEGUNDOS, maximo=CACHE_MAXIMO):
+        self.segundos = segundos
+        self.maximo = maximo
+        self._itens = OrderedDict()  # chave -> expira em
+        self._trava = threading.Lock()
+
+    def contem(self, chave, agora=None):
+        agora = agora or time.monotonic()
+        with self._trava:
+            expira = self._itens.get(chave)
+            if expira is None:
+                return False
+            if expira < agora:
+                del self._itens[chave]
+                return False
+            return True
+
+    def adicionar(self, chave, agora=None):
+        agora = agora or time.monotonic()
+        with self._trava:
+            self._itens.pop(chave, None)
+            self._itens[chave] = agora + self.segundos
+            while len(self._itens) > self.maximo:
+                self._itens.popitem(last=False)
+
+    def remover(self, chave):
+        with self._trava:
+            self._itens.pop(chave, None)
+
+
+livres = CacheNegativo()
+
+
+def disponivel(campo, valor):
+    """True se nenhum usuário usa `valor` (sem diferenciar maiúsculas)"""
+    valor = User.normalizar(valor)
+    if valor is None:
+        return False
+    chave = (campo, valor)
+    if livres.contem(chave):
+        return True
+    existe = User.objects.filter(**{CAMPOS[campo]: valor}).exists()
+    if not existe:
+        livres.adicionar(chave)
+    return not existe
+
+
+def usuario_salvo(usuario):
+    """Os valores do usuário deixam de estar livres"""
+    for campo, coluna in CAMPOS.items():
+        valor = getattr(usuario, coluna)
+        if valor is not None:
+            livres.remover((campo, valor))
+
+
+def limitar(request):
+    """
+    Conta a verificação na janela atual da sessão.
+    Devolve 0 se pode seguir, ou quantos segundos esperar.
+    """
+    if not request.session.session_key:
+        request.session.save()
+    janela = int(time.time() // JANELA_SEGUNDOS)
+    chave = f'perfil:disponibilidade:{request.session.session_key}:{janela}'
+    cache.add(chave, 0, JANELA_SEGUNDOS)
+    try:
+        total = cache.incr(chave)
+    except ValueError:
+        return 0  # a chave expirou entre o add e o incr: janela nova
+    if total <= LIMITE:
+        return 0
+    return max(1, (janela + 1) * JANELA_SEGUNDOS - int(time.time()))
@@ -0,0 +1,117 @@
+"""
+Estatísticas materializadas do perfil (EstatisticasPerfil).
+
+- Os sinais (perfil/signals.py) aplicam deltas com UPDATE ... = campo + n,
+  sem ler a linha. Downloads são contados com queryset.update() na view
+  de download, que não dispara sinal: ela chama ajustar() diretamente.
+- Sem linha ainda, nenhum delta é aplicado: a primeira leitura calcula
+  tudo do banco e cria a linha (já incluindo o que aconteceu antes).
+- reconciliar() recalcula com uma consulta agrupada por métrica e corrige
+  só as linhas divergentes.
+"""
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from notes.models import Note, NoteLike, NoteRecommendation
+from .models import EstatisticasPerfil
+
+User = get_user_model()
+
+CAMPOS = ('notes_count', 'likes_received', 'downloads_received', 'recommendations_given')
+
+
+def ajustar(usuario_id, **deltas):
+    """Soma os deltas na linha do usuário (nunca abaixo de zero)"""
+    deltas = {campo: delta for campo, delta in deltas.items() if delta}
+    if not deltas or usuario_id is None:
+        return
+    EstatisticasPerfil.objects.filter(user_id=usuario_id).update(
+        atualizado_em=timezone.now(),
+        **{campo: Greatest(F(campo) + delta, 0) for campo, delta in deltas.items()},
+    )
+
+
+def calcular(usuario_id):
+    """Valores a partir do banco (as consultas que o perfil fazia a cada acesso)"""
+    notes = Note.objects.filter(author_id=usuario_id).aggregate(
+        total=Count('pk'), downloads=Sum('downloads')
+    )
+    return {
+        'notes_count': notes['total'],
+        'likes_received': NoteLike.objects.filter(note__author_id=usuario_id).count(),
+        'downloads_received': notes['downloads'] or 0,
+        'recommendations_given': NoteRecommendation.objects.filter(teacher_id=usuario_id).count(),
+    }
+
+
+def estatisticas_do_usuario(usuario):
+    """Linha de estatísticas do usuário; criada na primeira leitura"""
+    try:
+        return EstatisticasPerfil.objects.get(user=usuario)
+    except EstatisticasPerfil.DoesNotExist:
+        pass
+    try:
+        with transaction.atomic():
+            return EstatisticasPerfil.objects.create(user=usuario, **calcular(usuario.pk))
+    except IntegrityError:
+        # Outra requisição criou a linha ao mesmo tempo
+        return EstatisticasPerfil.objects.get(user=usuario)
+
+
+def _valores_agrupados(usuarios):
+    """{user_id: valores} para todos os usuários, com uma consulta por métrica"""
+    valores = {pk: dict.fromkeys(CAMPOS, 0) for pk in usuarios}
+
+    def aplicar(consulta, campos):
+        for linha in consulta:
+            if linha['usuario'] in valores:
+                for campo, chave in campos.items():
+                    valores[linha['usuario']][campo] = linha[chave] or 0
+
+    aplicar(
+        Note.objects.values(usuario=F('author_id')).annotate(total=Count('pk'), soma=Sum('downloads')).order_by(),
+        {'notes_count': 'total', 'downloads_received': 'soma'},
+    )
+    aplicar(
+        NoteLike.objects.values(usuario=F('note__author_id')).annotate(total=Count('pk')).order_by(),
+        {'likes_received': 'total'},
+    )
+    aplicar(
+        NoteRecommendation.objects.values(usuario=F('teacher_id')).annotate(total=Count('pk')).order_by(),
+        {'recommendations_given': 'total'},
+    )
+    return valores
+
+
+def reconciliar(criar_faltantes=True):
+    """
+    Recalcula todas as linhas e grava só as divergentes.
+    Devolve (corrigidas, criadas).
+    """
+    usuarios = list(User.objects.values_list('pk', flat=True))
+    valores = _valores_agrupados(usuarios)
+
+    existentes = {linha.user_id: linha for linha in EstatisticasPerfil.objects.all()}
+    corrigidas = []
+    for usuario_id, linha in existentes.items():
+        esperado = valores.get(usuario_id)
+        if esperado is None:
+            continue
+        if any(getattr(linha, campo) != esperado[campo] for campo in CAMPOS):
+            for campo in CAMPOS:
+                setattr(linha, campo, esperado[campo])
+            corrigidas.append(linha)
+    EstatisticasPerfil.objects.bulk_update(corrigidas, CAMPOS, batch_size=500)
+
+    criadas = []
+    if criar_faltantes:
+        criadas = [
+            EstatisticasPerfil(user_id=usuario_id, **valores[usuario_id])
+            for usuario_id in usuarios if usuario_id not in existentes
+        ]
+        EstatisticasPerfil.objects.bulk_create(criadas, batch_size=500, ignore_conflicts=True)
+
+    return len(corrigidas), len(criadas)
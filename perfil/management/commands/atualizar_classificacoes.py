@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from perfil.classificacoes import RANKINGS, materializar
+
+
+class Command(BaseCommand):
+    help = (
+        'Regrava os rankings da escola a partir das estatísticas e ofensivas. '
+        'Agende periodicamente (ex.: a cada 15 minutos e depois do calcular_ofensivas).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--ranking',
+            action='append',
+            help=f'Ranking a atualizar (pode repetir); padrão: todos ({", ".join(RANKINGS)})',
+        )
+
+    def handle(self, *args, **options):
+        rankings = options['ranking'] or list(RANKINGS)
+        invalidos = set(rankings) - set(RANKINGS)
+        if invalidos:
+            raise CommandError(f'Ranking(s) inválido(s): {", ".join(sorted(invalidos))}')
+
+        for ranking in rankings:
+            total = materializar(ranking)
+            self.stdout.write(f'{RANKINGS[ranking]}: {total} participante(s).')
+        self.stdout.write(self.style.SUCCESS('Classificações atualizadas.'))
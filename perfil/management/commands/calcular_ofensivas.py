@@ -0,0 +1,48 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from perfil.ofensivas import processar_dia, recalcular
+
+
+class Command(BaseCommand):
+    help = (
+        'Atualiza as ofensivas (dias seguidos de acesso) a partir dos registros '
+        'de acesso. Agende uma vez por dia, logo depois da meia-noite (até ele '
+        'rodar, o perfil soma o acesso de ontem pelos registros) e antes de '
+        'atualizar_classificacoes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dia', help='Dia a processar (AAAA-MM-DD); padrão: ontem')
+        parser.add_argument(
+            '--dias',
+            type=int,
+            default=1,
+            help='Processa os N dias terminando em --dia (recupera execuções perdidas)',
+        )
+        parser.add_argument(
+            '--recalcular',
+            action='store_true',
+            help='Reconstrói todas as ofensivas a partir do histórico completo',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            ultimo = date.fromisoformat(options['dia']) if options['dia'] else timezone.localdate() - timedelta(days=1)
+        except ValueError:
+            raise CommandError('--dia deve estar no formato AAAA-MM-DD')
+
+        if options['recalcular']:
+            total = recalcular(ultimo)
+            self.stdout.write(self.style.SUCCESS(f'{total} perfil(is) recalculado(s) até {ultimo:%d/%m/%Y}.'))
+            return
+
+        for deslocamento in range(max(options['dias'], 1) - 1, -1, -1):
+            dia = ultimo - timedelta(days=deslocamento)
+            atualizados, zerados = processar_dia(dia)
+            self.stdout.write(
+                f'{dia:%d/%m/%Y}: {atualizados} ofensiva(s) atualizada(s), {zerados} zerada(s).'
+            )
+        self.stdout.write(self.style.SUCCESS('Ofensivas atualizadas.'))
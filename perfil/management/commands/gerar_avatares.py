@@ -0,0 +1,28 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from perfil.avatares import FotoInvalida, nome_original, normalizar, processar
+from perfil.models import PerfilUsuario
+
+
+class Command(BaseCommand):
+    help = 'Normaliza as fotos de perfil enviadas antes do pipeline e gera as variantes que faltam'
+
+    def handle(self, *args, **options):
+        processados = falhas = 0
+        perfis = PerfilUsuario.objects.exclude(photo='').exclude(photo__isnull=True).filter(photo_hash='')
+        for perfil in perfis.only('pk', 'photo').iterator():
+            try:
+                with default_storage.open(perfil.photo.name, 'rb') as arquivo:
+                    photo_hash = normalizar(arquivo)
+            except (FotoInvalida, OSError) as e:
+                falhas += 1
+                self.stderr.write(f'Perfil {perfil.pk}: {e}')
+                continue
+            PerfilUsuario.objects.filter(pk=perfil.pk).update(photo=nome_original(photo_hash))
+            processar(perfil.pk, photo_hash)
+            processados += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{processados} foto(s) processada(s), {falhas} com erro.'
+        ))
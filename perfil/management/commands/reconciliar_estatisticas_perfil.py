@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from perfil.estatisticas import reconciliar
+
+
+class Command(BaseCommand):
+    help = 'Recalcula as estatísticas materializadas dos perfis e corrige as divergentes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sem-criar',
+            action='store_true',
+            help='Só corrige linhas existentes (as que faltam são criadas no primeiro acesso ao perfil)',
+        )
+
+    def handle(self, *args, **options):
+        corrigidas, criadas = reconciliar(criar_faltantes=not options['sem_criar'])
+        self.stdout.write(self.style.SUCCESS(
+            f'{corrigidas} linha(s) corrigida(s), {criadas} criada(s).'
+        ))
@@ -0,0 +1,13 @@
+from .ofensivas import registrar_acesso
+
+
+class RegistroAcessoMiddleware:
+    """Registra o dia de acesso do usuário autenticado (uma gravação por dia e sessão)"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if request.user.is_authenticated:
+            registrar_acesso(request)
+        return self.get_response(request)
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:51
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_user_ano_escolar'),
+        ('perfil', '0003_remove_perfilusuario_last_name_change_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EstatisticasPerfil',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='estatisticas_perfil', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('notes_count', models.PositiveIntegerField(default=0, verbose_name='Notes criados')),
+                ('likes_received', models.PositiveIntegerField(default=0, verbose_name='Curtidas recebidas')),
+                ('downloads_received', models.PositiveIntegerField(default=0, verbose_name='Downloads recebidos')),
+                ('recommendations_given', models.PositiveIntegerField(default=0, verbose_name='Recomendações feitas')),
+                ('atualizado_em', models.DateTimeField(auto_now=True, verbose_name='Atualizado em')),
+            ],
+            options={
+                'verbose_name': 'Estatísticas do perfil',
+                'verbose_name_plural': 'Estatísticas dos perfis',
+            },
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:55
+
+from datetime import timedelta
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def preencher_acessos(apps, schema_editor):
+    """Reconstrói o histórico a partir da ofensiva atual (último login e dias seguidos)"""
+    PerfilUsuario = apps.get_model('perfil', 'PerfilUsuario')
+    RegistroAcesso = apps.get_model('perfil', 'RegistroAcesso')
+    registros = []
+    for perfil in PerfilUsuario.objects.exclude(last_login_date=None).iterator():
+        for deslocamento in range(max(perfil.streak_count, 1)):
+            registros.append(RegistroAcesso(user_id=perfil.user_id, dia=perfil.last_login_date - timedelta(days=deslocamento)))
+    RegistroAcesso.objects.bulk_create(registros, batch_size=500, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('perfil', '0004_estatisticasperfil'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RegistroAcesso',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia', models.DateField(verbose_name='Dia')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='acessos', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Registro de acesso',
+                'verbose_name_plural': 'Registros de acesso',
+                'indexes': [models.Index(fields=['dia'], name='perfil_regi_dia_63bd7c_idx')],
+                'unique_together': {('user', 'dia')},
+            },
+        ),
+        migrations.RunPython(preencher_acessos, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:57
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('perfil', '0005_registroacesso'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Classificacao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ranking', models.CharField(choices=[('curtidas', 'Mais curtidos'), ('downloads', 'Mais baixados'), ('ofensiva', 'Maiores ofensivas'), ('ativos-1', 'Mais ativos do 1º ano'), ('ativos-2', 'Mais ativos do 2º ano'), ('ativos-3', 'Mais ativos do 3º ano')], max_length=20, verbose_name='Ranking')),
+                ('ordem', models.PositiveIntegerField(verbose_name='Ordem')),
+                ('posicao', models.PositiveIntegerField(verbose_name='Posição')),
+                ('valor', models.PositiveIntegerField(verbose_name='Valor')),
+                ('atualizado_em', models.DateTimeField(verbose_name='Atualizado em')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='classificacoes', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Classificação',
+                'verbose_name_plural': 'Classificações',
+                'unique_together': {('ranking', 'ordem'), ('ranking', 'user')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('perfil', '0006_classificacao'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='perfilusuario',
+            name='photo_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64, verbose_name='Hash da foto'),
+        ),
+    ]
@@ -1,7 +1,6 @@
 from django.db import models
 from django.contrib.auth import get_user_model
 from django.utils import timezone
-from datetime import date, timedelta
 
 User = get_user_model()
 
@@ -14,11 +13,14 @@ class PerfilUsuario(models.Model):
     
     # FOTO DE PERFIL
     photo = models.ImageField(upload_to='profile_pics/', null=True, blank=True, verbose_name='Foto de Perfil')
+    # Preenchido quando as variantes de tamanho ficam prontas (ver perfil/avatares.py)
+    photo_hash = models.CharField(max_length=64, blank=True, editable=False, verbose_name='Hash da foto')
     
     # CONTROLE DE EDIÇÕES (7 DIAS)
     last_edit = models.DateTimeField(null=True, blank=True, verbose_name='Última edição do perfil')
     
     # SISTEMA DE FREQUÊNCIA (LOGIN STREAK)
+    # Calculados em lote a partir do RegistroAcesso (ver perfil/ofensivas.py)
     last_login_date = models.DateField(null=True, blank=True, verbose_name='Último login')
     streak_count = models.IntegerField(default=0, verbose_name='Dias consecutivos')
     
@@ -51,28 +53,79 @@ class PerfilUsuario(models.Model):
         diff = (timezone.now() - self.last_edit).days
         return max(0, 7 - diff)
     
-    def update_streak(self):
-        """
-        Atualiza o contador de dias consecutivos de login.
-        
-        Regras:
-        - Se último login foi ontem: incrementa contador
-        - Se último login foi hoje: não faz nada (já contou)
-        - Se último login foi há mais de 1 dia: reseta para 1
-        """
-        today = date.today()
-        
-        if self.last_login_date == today:
-            return
-        
-        if self.last_login_date == today - timedelta(days=1):
-            self.streak_count += 1
-        else:
-            self.streak_count = 1
-        
-        self.last_login_date = today
-        self.save(update_fields=['last_login_date', 'streak_count'])
-    
-    def streak_progress(self):
+    def streak_progress(self, dias=None):
         """Retorna progresso visual do streak (0-100%). Meta: 30 dias = 100%"""
-        return min((self.streak_count / 30) * 100, 100)
\ No newline at end of file
+        if dias is None:
+            dias = self.streak_count
+        return min((dias / 30) * 100, 100)
+
+class EstatisticasPerfil(models.Model):
+    """
+    Números do perfil já somados (uma linha por usuário).
+    Mantidos pelos sinais de notes/curtidas/recomendações (ver perfil/estatisticas.py);
+    o comando reconciliar_estatisticas_perfil corrige qualquer divergência.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='estatisticas_perfil')
+    notes_count = models.PositiveIntegerField(default=0, verbose_name='Notes criados')
+    likes_received = models.PositiveIntegerField(default=0, verbose_name='Curtidas recebidas')
+    downloads_received = models.PositiveIntegerField(default=0, verbose_name='Downloads recebidos')
+    recommendations_given = models.PositiveIntegerField(default=0, verbose_name='Recomendações feitas')
+    atualizado_em = models.DateTimeField(auto_now=True, verbose_name='Atualizado em')
+
+    class Meta:
+        verbose_name = 'Estatísticas do perfil'
+        verbose_name_plural = 'Estatísticas dos perfis'
+
+    def __str__(self):
+        return f"Estatísticas de {self.user.username}"
+
+
+class RegistroAcesso(models.Model):
+    """
+    Dias em que o usuário usou a plataforma (uma linha por dia, só inserções).
+    Base das ofensivas, calculadas em lote pelo comando calcular_ofensivas.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='acessos')
+    dia = models.DateField(verbose_name='Dia')
+
+    class Meta:
+        verbose_name = 'Registro de acesso'
+        verbose_name_plural = 'Registros de acesso'
+        unique_together = ('user', 'dia')
+        indexes = [
+            models.Index(fields=['dia']),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} em {self.dia:%d/%m/%Y}"
+
+
+class Classificacao(models.Model):
+    """
+    Rankings da escola já ordenados (uma linha por usuário e ranking).
+    Materializados periodicamente pelo comando atualizar_classificacoes
+    (ver perfil/classificacoes.py).
+    """
+    RANKING_CHOICES = [
+        ('curtidas', 'Mais curtidos'),
+        ('downloads', 'Mais baixados'),
+        ('ofensiva', 'Maiores ofensivas'),
+        ('ativos-1', 'Mais ativos do 1º ano'),
+        ('ativos-2', 'Mais ativos do 2º ano'),
+        ('ativos-3', 'Mais ativos do 3º ano'),
+    ]
+
+    ranking = models.CharField(max_length=20, choices=RANKING_CHOICES, verbose_name='Ranking')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='classificacoes')
+    ordem = models.PositiveIntegerField(verbose_name='Ordem')  # 1..n sem empates, usada na paginação
+    posicao = models.PositiveIntegerField(verbose_name='Posição')  # empates dividem a posição (1, 2, 2, 4)
+    valor = models.PositiveIntegerField(verbose_name='Valor')
+    atualizado_em = models.DateTimeField(verbose_name='Atualizado em')
+
+    class Meta:
+        verbose_name = 'Classificação'
+        verbose_name_plural = 'Classificações'
+        unique_together = [('ranking', 'ordem'), ('ranking', 'user')]
+
+    def __str__(self):
+        return f"{self.get_ranking_display()}: {self.posicao}º {self.user.username}"
@@ -0,0 +1,115 @@
+"""
+Ofensiva (dias seguidos de acesso) fora do caminho das requisições.
+
+- RegistroAcessoMiddleware grava no máximo uma linha de RegistroAcesso por
+  dia e sessão; a sessão guarda o dia já registrado, então as demais
+  requisições do dia não acessam o banco.
+- O comando calcular_ofensivas processa os dias encerrados em lote e
+  atualiza streak_count/last_login_date dos perfis.
+- O perfil soma o dia de hoje em memória (ofensiva_atual), sem gravar.
+  Entre a meia-noite e a execução do lote, ontem ainda não foi processado
+  (last_login_date é anteontem): ofensiva_atual confere o RegistroAcesso
+  de ontem para não mostrar a ofensiva zerada nessa janela.
+- O ranking 'ofensiva' lê streak_count como o lote deixou; agende
+  atualizar_classificacoes depois de calcular_ofensivas.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import PerfilUsuario, RegistroAcesso
+
+CHAVE_SESSAO = '_perfil_acesso_dia'
+
+
+def registrar_acesso(request):
+    """Registra o dia de hoje para o usuário; devolve True se gravou"""
+    hoje = timezone.localdate().isoformat()
+    if request.session.get(CHAVE_SESSAO) == hoje:
+        return False
+    RegistroAcesso.objects.bulk_create(
+        [RegistroAcesso(user=request.user, dia=hoje)], ignore_conflicts=True
+    )
+    request.session[CHAVE_SESSAO] = hoje
+    return True
+
+
+def acessou_hoje(request):
+    return request.session.get(CHAVE_SESSAO) == timezone.localdate().isoformat()
+
+
+def ofensiva_atual(perfil, acessou_hoje):
+    """
+    Ofensiva do último lote mais os dias que ele ainda não contou: hoje, se
+    houve acesso, e ontem, se o lote de ontem ainda não rodou.
+    """
+    hoje = timezone.localdate()
+    ontem = hoje - timedelta(days=1)
+    ultimo = perfil.last_login_date
+    if ultimo == hoje:
+        return perfil.streak_count
+    if ultimo == ontem:
+        base = perfil.streak_count
+    elif ultimo == hoje - timedelta(days=2) and RegistroAcesso.objects.filter(
+        user_id=perfil.user_id, dia=ontem
+    ).exists():
+        # Acessou ontem, mas o calcular_ofensivas de hoje ainda não rodou
+        base = perfil.streak_count + 1
+    else:
+        base = 0
+    return base + 1 if acessou_hoje else base
+
+
+@transaction.atomic
+def processar_dia(dia):
+    """
+    Atualiza as ofensivas com os acessos de `dia` (já encerrado).
+    Processar o mesmo dia de novo não altera nada.
+    Devolve (perfis atualizados, ofensivas zeradas).
+    """
+    ativos = set(RegistroAcesso.objects.filter(dia=dia).values_list('user_id', flat=True))
+    PerfilUsuario.objects.bulk_create(
+        [PerfilUsuario(user_id=usuario_id) for usuario_id in ativos], ignore_conflicts=True
+    )
+
+    atualizados = []
+    for perfil in PerfilUsuario.objects.filter(user_id__in=ativos).only('pk', 'last_login_date', 'streak_count'):
+        if perfil.last_login_date is not None and perfil.last_login_date >= dia:
+            continue
+        if perfil.last_login_date == dia - timedelta(days=1):
+            perfil.streak_count += 1
+        else:
+            perfil.streak_count = 1
+        perfil.last_login_date = dia
+        atualizados.append(perfil)
+    PerfilUsuario.objects.bulk_update(atualizados, ['last_login_date', 'streak_count'], batch_size=500)
+
+    # Quem não acessou em `dia` perde a ofensiva
+    zerados = PerfilUsuario.objects.filter(streak_count__gt=0, last_login_date__lt=dia).update(streak_count=0)
+    return len(atualizados), zerados
+
+
+@transaction.atomic
+def recalcular(ate):
+    """Reconstrói todas as ofensivas a partir do histórico completo, até o dia `ate`"""
+    resultado = {}
+    acessos = (
+        RegistroAcesso.objects.filter(dia__lte=ate)
+        .order_by('user_id', 'dia').values_list('user_id', 'dia').iterator()
+    )
+    for usuario_id, dia in acessos:
+        ultimo, seguidos = resultado.get(usuario_id, (None, 0))
+        seguidos = seguidos + 1 if ultimo == dia - timedelta(days=1) else 1
+        resultado[usuario_id] = (dia, seguidos)
+
+    PerfilUsuario.objects.bulk_create(
+        [PerfilUsuario(user_id=usuario_id) for usuario_id in resultado], ignore_conflicts=True
+    )
+    perfis = list(PerfilUsuario.objects.only('pk', 'user_id', 'last_login_date', 'streak_count'))
+    for perfil in perfis:
+        ultimo, seguidos = resultado.get(perfil.user_id, (None, 0))
+        perfil.last_login_date = ultimo
+        perfil.streak_count = seguidos if ultimo == ate else 0
+    PerfilUsuario.objects.bulk_update(perfis, ['last_login_date', 'streak_count'], batch_size=500)
+    return len(perfis)
@@ -0,0 +1,228 @@
+"""
+Dados dos popups do perfil (notes criados, curtidas, downloads, recomendações).
+
+- Páginas de POR_PAGINA itens com cursor (keyset): o token assinado guarda
+  os valores de ordenação do último item, então a próxima página é um
+  filtro "depois deste" no índice, sem OFFSET.
+- values() com só as colunas exibidas.
+- Respostas em cache por usuário com versão: os sinais de notes, curtidas,
+  comentários e recomendações (e a view de download) trocam a versão.
+  Visualizações não invalidam o cache; aparecem em até POPUP_CACHE_TIMEOUT.
+- 'curtidas-recebidas' e 'downloads' ordenam por contadores que mudam com o
+  uso. Entre uma página e outra um note pode passar para antes do cursor
+  (some das próximas páginas) ou cair para depois dele (aparece de novo);
+  e como cada página fica em cache por até POPUP_CACHE_TIMEOUT, páginas
+  vizinhas podem ter sido lidas em momentos diferentes. É aceito para um
+  popup; o front-end ignora itens repetidos. As outras listas ordenam por
+  datas que não mudam.
+- 'total' é a quantidade de itens da lista inteira, não da página.
+"""
+import hashlib
+import time
+
+from django.core import signing
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db.models import Count, Q
+from django.urls import reverse
+
+from notes.models import Comment, Note, NoteRecommendation
+
+POR_PAGINA = 20
+MAXIMO_POR_PAGINA = 50
+POPUP_CACHE_TIMEOUT = 60
+
+SALT_CURSOR = 'perfil.popups'
+CHAVE_VERSAO = 'perfil:popups:{}:versao'
+
+_TIPOS_ARQUIVO = dict(Note.FILE_TYPES)
+
+
+class CursorInvalido(ValueError):
+    pass
+
+
+# ========================================
+# VERSÃO DO CACHE POR USUÁRIO
+# ========================================
+def _versao(usuario_id):
+    chave = CHAVE_VERSAO.format(usuario_id)
+    versao = cache.get(chave)
+    if versao is None:
+        versao = int(time.time() * 1000)
+        cache.add(chave, versao, None)
+        versao = cache.get(chave, versao)
+    return versao
+
+
+def invalidar(usuario_id):
+    """Chamado quando algo exibido nos popups do usuário muda"""
+    if usuario_id is None:
+        return
+    try:
+        cache.incr(CHAVE_VERSAO.format(usuario_id))
+    except ValueError:
+        pass  # sem versão em cache: a próxima leitura cria uma nova
+
+
+# ========================================
+# CURSOR (KEYSET)
+# ========================================
+def _gerar_cursor(ordem, linha):
+    valores = [linha[campo] for campo in ordem]
+    valores = [valor.isoformat() if hasattr(valor, 'isoformat') else valor for valor in valores]
+    return signing.dumps(valores, salt=SALT_CURSOR, compress=True)
+
+
+def _filtro_depois(modelo, ordem, token):
+    """Q para itens depois do cursor com ordem toda decrescente: (a < x) | (a = x & b < y) | ..."""
+    try:
+        valores = signing.loads(token, salt=SALT_CURSOR)
+        if len(valores) != len(ordem):
+            raise CursorInvalido()
+        valores = [
+            (modelo._meta.pk if campo == 'pk' else modelo._meta.get_field(campo)).to_python(valor)
+            for campo, valor in zip(ordem, valores)
+        ]
+    except (signing.BadSignature, ValidationError, TypeError, ValueError) as e:
+        raise CursorInvalido('Cursor inválido.') from e
+
+    filtro = Q()
+    for indice, campo in enumerate(ordem):
+        iguais = {ordem[i]: valores[i] for i in range(indice)}
+        filtro |= Q(**iguais, **{f'{campo}__lt': valores[indice]})
+    return filtro
+
+
+# ========================================
+# CONSULTAS POR TIPO
+# ========================================
+def _notes_criados(usuario, url):
+    consulta = Note.objects.filter(author=usuario).values(
+        'pk', 'title', 'subject_new__nome', 'file_type', 'created_at'
+    )
+
+    def item(linha):
+        return {
+            'id': linha['pk'],
+            'title': linha['title'],
+            'subject': linha['subject_new__nome'] or 'Sem matéria',
+            'file_type': _TIPOS_ARQUIVO.get(linha['file_type'], linha['file_type']),
+            'created_at': linha['created_at'].strftime('%d/%m/%Y'),
+            'url': url(linha['pk']),
+        }
+    return Note, consulta, ('created_at', 'pk'), item
+
+
+def _curtidas_recebidas(usuario, url):
+    consulta = Note.objects.filter(author=usuario, likes__gt=0).values(
+        'pk', 'title', 'created_at', 'likes', 'views', 'downloads'
+    )
+
+    def item(linha):
+        return {
+            'id': linha['pk'],
+            'title': linha['title'],
+            'created_at': linha['created_at'].strftime('%d/%m/%Y'),
+            'likes': linha['likes'],
+            'views': linha['views'],
+            'downloads': linha['downloads'],
+            'url': url(linha['pk']),
+        }
+    return Note, consulta, ('likes', 'views', 'downloads', 'pk'), item
+
+
+def _downloads(usuario, url):
+    consulta = Note.objects.filter(author=usuario, downloads__gt=0).values(
+        'pk', 'title', 'subject_new__nome', 'downloads', 'likes', 'views', 'created_at'
+    )
+
+    def item(linha):
+        return {
+            'id': linha['pk'],
+            'title': linha['title'],
+            'tipo': 'Note',
+            'subject': linha['subject_new__nome'] or 'Sem matéria',
+            'downloads': linha['downloads'],
+            'likes': linha['likes'],
+            'views': linha['views'],
+            'created_at': linha['created_at'].strftime('%d/%m/%Y'),
+            'url': url(linha['pk']),
+        }
+    return Note, consulta, ('downloads', 'created_at', 'pk'), item
+
+
+def _recomendacoes(usuario, url):
+    consulta = NoteRecommendation.objects.filter(teacher=usuario).values(
+        'pk', 'recommended_at', 'note_id', 'note__title', 'note__subject_new__nome',
+        'note__views', 'note__likes', 'note__downloads',
+    )
+
+    def item(linha):
+        return {
+            'id': linha['note_id'],
+            'title': linha['note__title'],
+            'subject': linha['note__subject_new__nome'] or 'Sem matéria',
+            'views': linha['note__views'],
+            'likes': linha['note__likes'],
+            'downloads': linha['note__downloads'],
+            'recommended_at': linha['recommended_at'].strftime('%d/%m/%Y às %H:%M'),
+            'url': url(linha['note_id']),
+            'deleted': False,
+        }
+    return NoteRecommendation, consulta, ('recommended_at', 'pk'), item
+
+
+TIPOS = {
+    'notes-criados': _notes_criados,
+    'curtidas-recebidas': _curtidas_recebidas,
+    'downloads': _downloads,
+    'recomendacoes': _recomendacoes,
+}
+
+
+def _contar_comentarios(itens):
+    """Comentários só dos notes da página (uma consulta agrupada)"""
+    contagens = dict(
+        Comment.objects.filter(note_id__in=[item['id'] for item in itens])
+        .values_list('note_id').annotate(total=Count('pk')).order_by()
+    )
+    for item in itens:
+        item['comments_count'] = contagens.get(item['id'], 0)
+
+
+def pagina(usuario, tipo, cursor=None, limite=POR_PAGINA):
+    """
+    Uma página do popup: {'items', 'total', 'proximo'}.
+    Levanta KeyError para tipo desconhecido e CursorInvalido para cursor adulterado.
+    """
+    montar = TIPOS[tipo]
+    limite = max(1, min(int(limite), MAXIMO_POR_PAGINA))
+
+    pagina_cursor = hashlib.md5(cursor.encode()).hexdigest() if cursor else 'inicio'
+    chave = f'perfil:popups:{usuario.pk}:{_versao(usuario.pk)}:{tipo}:{limite}:{pagina_cursor}'
+    dados = cache.get(chave)
+    if dados is not None:
+        return dados
+
+    def url(pk):
+        return reverse('notes:detail', args=[pk])
+
+    modelo, consulta, ordem, item = montar(usuario, url)
+    total = consulta.count()
+    if cursor:
+        consulta = consulta.filter(_filtro_depois(modelo, ordem, cursor))
+    linhas = list(consulta.order_by(*[f'-{campo}' for campo in ordem])[:limite + 1])
+
+    proximo = None
+    if len(linhas) > limite:
+        linhas = linhas[:limite]
+        proximo = _gerar_cursor(ordem, linhas[-1])
+
+    itens = [item(linha) for linha in linhas]
+    if tipo == 'curtidas-recebidas':
+        _contar_comentarios(itens)
+
+    dados = {'items': itens, 'total': total, 'proximo': proximo}
+    cache.set(chave, dados, POPUP_CACHE_TIMEOUT)
+    return dados
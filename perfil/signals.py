@@ -0,0 +1,66 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from accounts.models import User
+from notes.models import Comment, Note, NoteLike, NoteRecommendation
+from .disponibilidade import usuario_salvo
+from .estatisticas import ajustar
+from .popups import invalidar
+
+
+def _autor_da_note(note_id):
+    return Note.objects.filter(pk=note_id).values_list('author_id', flat=True).first()
+
+
+@receiver(post_save, sender=Note)
+def contar_note_criado(sender, instance, created, **kwargs):
+    if created:
+        ajustar(instance.author_id, notes_count=1, downloads_received=instance.downloads)
+    invalidar(instance.author_id)
+
+
+@receiver(post_delete, sender=Note)
+def descontar_note_excluido(sender, instance, **kwargs):
+    # As curtidas são descontadas pelos sinais de cada NoteLike (apagadas em cascata antes da note)
+    ajustar(instance.author_id, notes_count=-1, downloads_received=-instance.downloads)
+    invalidar(instance.author_id)
+
+
+@receiver(post_save, sender=NoteLike)
+def contar_curtida(sender, instance, created, **kwargs):
+    if created:
+        ajustar(instance.note.author_id, likes_received=1)
+        invalidar(instance.note.author_id)
+
+
+@receiver(post_delete, sender=NoteLike)
+def descontar_curtida(sender, instance, **kwargs):
+    autor_id = _autor_da_note(instance.note_id)
+    ajustar(autor_id, likes_received=-1)
+    invalidar(autor_id)
+
+
+@receiver(post_save, sender=NoteRecommendation)
+def contar_recomendacao(sender, instance, created, **kwargs):
+    if created:
+        ajustar(instance.teacher_id, recommendations_given=1)
+        invalidar(instance.teacher_id)
+
+
+@receiver(post_delete, sender=NoteRecommendation)
+def descontar_recomendacao(sender, instance, **kwargs):
+    ajustar(instance.teacher_id, recommendations_given=-1)
+    invalidar(instance.teacher_id)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidar_popups_do_autor(sender, instance, **kwargs):
+    """Popup de curtidas mostra o número de comentários de cada note"""
+    if kwargs.get('created', True):
+        invalidar(_autor_da_note(instance.note_id))
+
+
+@receiver(post_save, sender=User)
+def ocupar_nome_e_email(sender, instance, **kwargs):
+    usuario_salvo(instance)
@@ -0,0 +1,57 @@
+"""
+{% avatar usuario 32 %}: foto de perfil na menor variante que cobre o tamanho
+exibido (e o dobro, para telas de alta densidade), em WebP com JPEG de
+reserva. Sem foto, mostra a inicial do nome.
+
+Em listas, carregue o perfil junto (select_related('author__perfil')) para
+não fazer uma consulta por avatar.
+"""
+from django import template
+from django.core.exceptions import ObjectDoesNotExist
+from django.core.files.storage import default_storage
+from django.utils.html import format_html
+
+from perfil.avatares import TAMANHOS, nome_variante
+
+register = template.Library()
+
+_ESTILO_IMG = 'width: 100%; height: 100%; object-fit: cover; border-radius: 50%;'
+
+
+def _variante(tamanho):
+    """Menor variante com pelo menos `tamanho` px (ou a maior que existe)"""
+    return next((t for t in TAMANHOS if t >= tamanho), TAMANHOS[-1])
+
+
+@register.simple_tag
+def avatar(usuario, tamanho=32):
+    tamanho = int(tamanho)
+    try:
+        perfil = usuario.perfil
+    except ObjectDoesNotExist:
+        perfil = None
+
+    if perfil is None or not perfil.photo:
+        return usuario.username[:1].upper()
+
+    if not perfil.photo_hash:
+        # Variantes ainda não geradas: usa a foto normalizada
+        return format_html(
+            '<img src="{}" alt="{}" width="{}" height="{}" loading="lazy" style="{}">',
+            perfil.photo.url, usuario.username, tamanho, tamanho, _ESTILO_IMG,
+        )
+
+    simples, dupla = _variante(tamanho), _variante(tamanho * 2)
+
+    def url(t, formato):
+        return default_storage.url(nome_variante(perfil.photo_hash, t, formato))
+
+    return format_html(
+        '<picture style="display: contents;">'
+        '<source type="image/webp" srcset="{} 1x, {} 2x">'
+        '<img src="{}" srcset="{} 1x, {} 2x" alt="{}" width="{}" height="{}" loading="lazy" style="{}">'
+        '</picture>',
+        url(simples, 'webp'), url(dupla, 'webp'),
+        url(simples, 'jpg'), url(simples, 'jpg'), url(dupla, 'jpg'),
+        usuario.username, tamanho, tamanho, _ESTILO_IMG,
+    )
@@ -1,3 +1,342 @@
-from django.test import TestCase
+import json
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.template import Context, Template
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import User
+from notes.models import Note, NoteLike, NoteRecommendation
+from PIL import Image
+
+from .avatares import nome_original, nome_variante, processar
+from .disponibilidade import disponivel, livres
+from .estatisticas import ajustar, estatisticas_do_usuario
+from .models import Classificacao, EstatisticasPerfil, PerfilUsuario, RegistroAcesso
+from .ofensivas import ofensiva_atual, processar_dia
+
+
+class EstatisticasPerfilTests(TestCase):
+    """Linha materializada mantida pelos sinais e corrigida pelo comando de reconciliação"""
+
+    def setUp(self):
+        self.autor = User.objects.create_user('autor', 'autor@etec.sp.gov.br', 'x', user_type='aluno')
+        self.leitor = User.objects.create_user('leitor', 'leitor@etec.sp.gov.br', 'x', user_type='aluno')
+        self.professor = User.objects.create_user('prof', 'prof@etec.sp.gov.br', 'x', user_type='professor')
+
+    def _note(self, titulo='Resumo', downloads=0):
+        return Note.objects.create(
+            author=self.autor, title=titulo, file_type='LINK',
+            link='https://exemplo.com', downloads=downloads,
+        )
+
+    def test_primeira_leitura_calcula_e_sinais_mantem(self):
+        note = self._note(downloads=3)
+        NoteLike.objects.create(note=note, user=self.leitor)
+
+        estatisticas = estatisticas_do_usuario(self.autor)
+        self.assertEqual((estatisticas.notes_count, estatisticas.likes_received, estatisticas.downloads_received), (1, 1, 3))
+
+        outra = self._note('Mapa mental')
+        NoteLike.objects.create(note=outra, user=self.professor)
+        NoteRecommendation.objects.create(note=outra, teacher=self.professor)
+        ajustar(self.autor.pk, downloads_received=1)  # como em notes.views.download_note
+
+        estatisticas.refresh_from_db()
+        self.assertEqual((estatisticas.notes_count, estatisticas.likes_received, estatisticas.downloads_received), (2, 2, 4))
+        self.assertEqual(estatisticas_do_usuario(self.professor).recommendations_given, 1)
+
+        # Excluir a note desconta ela, suas curtidas (em cascata) e seus downloads
+        note.delete()
+        estatisticas.refresh_from_db()
+        self.assertEqual((estatisticas.notes_count, estatisticas.likes_received, estatisticas.downloads_received), (1, 1, 1))
+
+    def test_perfil_le_uma_linha(self):
+        self._note(downloads=5)
+        estatisticas_do_usuario(self.autor)
+        self.client.force_login(self.autor)
+        resposta = self.client.get(reverse('perfil:perfil'))
+        self.assertEqual(resposta.context['notes_count'], 1)
+        self.assertEqual(resposta.context['downloads_count'], 5)
+
+    def test_reconciliacao_corrige_divergencias(self):
+        self._note(downloads=2)
+        estatisticas_do_usuario(self.autor)
+        EstatisticasPerfil.objects.filter(user=self.autor).update(notes_count=9, downloads_received=0)
+
+        saida = StringIO()
+        call_command('reconciliar_estatisticas_perfil', stdout=saida)
+        self.assertIn('1 linha(s) corrigida(s), 2 criada(s)', saida.getvalue())
+
+        estatisticas = EstatisticasPerfil.objects.get(user=self.autor)
+        self.assertEqual((estatisticas.notes_count, estatisticas.downloads_received), (1, 2))
+        self.assertEqual(EstatisticasPerfil.objects.count(), 3)
+
+
+class PopupsPerfilTests(TestCase):
+    """Popups paginados por cursor, em cache e invalidados pelos sinais"""
+
+    def setUp(self):
+        cache.clear()
+        self.autor = User.objects.create_user('autor', 'autor@etec.sp.gov.br', 'x', user_type='aluno')
+        self.leitor = User.objects.create_user('leitor', 'leitor@etec.sp.gov.br', 'x', user_type='aluno')
+        Note.objects.bulk_create([
+            Note(author=self.autor, title=f'Note {i}', file_type='LINK', link='https://exemplo.com', likes=i % 3)
+            for i in range(25)
+        ])
+        self.url = reverse('perfil:popup_data', args=['notes-criados'])
+        self.client.force_login(self.autor)
+
+    def test_paginas_por_cursor(self):
+        vistos, cursor = [], None
+        while True:
+            parametros = {'limite': 10, **({'cursor': cursor} if cursor else {})}
+            dados = self.client.get(self.url, parametros).json()
+            vistos += [item['id'] for item in dados['items']]
+            self.assertEqual(dados['total'], 25)
+            cursor = dados['proximo']
+            if not cursor:
+                break
+        self.assertEqual(len(vistos), 25)
+        self.assertEqual(len(set(vistos)), 25)
+        self.assertTrue(dados['items'][0]['url'].startswith('/notes/'))
+
+        resposta = self.client.get(self.url, {'cursor': 'adulterado'})
+        self.assertEqual(resposta.status_code, 400)
+
+    def test_cache_invalidado_por_curtida(self):
+        url = reverse('perfil:popup_data', args=['curtidas-recebidas'])
+        primeira = self.client.get(url, {'limite': 50}).json()
+        with self.assertNumQueries(2):  # só sessão e usuário
+            self.client.get(url, {'limite': 50})
+
+        note = Note.objects.filter(author=self.autor, likes=0).first()
+        NoteLike.objects.create(note=note, user=self.leitor)
+        Note.objects.filter(pk=note.pk).update(likes=1)
+
+        segunda = self.client.get(url, {'limite': 50}).json()
+        self.assertEqual(segunda['total'], primeira['total'] + 1)
+        self.assertIn('comments_count', segunda['items'][0])
+
+
+class OfensivasTests(TestCase):
+    """Registro de acesso diário e ofensivas calculadas em lote"""
+
+    def setUp(self):
+        self.usuario = User.objects.create_user('maria', 'maria@etec.sp.gov.br', 'x', user_type='aluno')
+        self.hoje = timezone.localdate()
+
+    def _dia(self, atras):
+        return self.hoje - timedelta(days=atras)
+
+    def test_middleware_grava_uma_vez_por_dia(self):
+        self.client.force_login(self.usuario)
+        self.client.get(reverse('study:home'))
+        with self.assertNumQueries(2):  # sessão e usuário; o dia já está na sessão
+            self.client.get(reverse('study:home'))
+        self.assertEqual(list(RegistroAcesso.objects.values_list('dia', flat=True)), [self.hoje])
+
+    def test_lote_incremental_e_recalculo(self):
+        for atras in (5, 3, 2, 1):
+            RegistroAcesso.objects.create(user=self.usuario, dia=self._dia(atras))
+        for atras in range(5, 0, -1):
+            processar_dia(self._dia(atras))
+        processar_dia(self._dia(1))  # reprocessar não muda nada
+
+        perfil = PerfilUsuario.objects.get(user=self.usuario)
+        self.assertEqual((perfil.last_login_date, perfil.streak_count), (self._dia(1), 3))
+        self.assertEqual(ofensiva_atual(perfil, acessou_hoje=True), 4)
+        self.assertEqual(ofensiva_atual(perfil, acessou_hoje=False), 3)
+
+        PerfilUsuario.objects.filter(pk=perfil.pk).update(streak_count=0)
+        call_command('calcular_ofensivas', '--recalcular', stdout=StringIO())
+        self.assertEqual(PerfilUsuario.objects.get(pk=perfil.pk).streak_count, 3)
+
+        # Um dia sem acesso zera a ofensiva
+        processar_dia(self.hoje)
+        self.assertEqual(PerfilUsuario.objects.get(pk=perfil.pk).streak_count, 0)
+
+    def test_ofensiva_antes_do_lote_de_ontem(self):
+        # Depois da meia-noite, antes do calcular_ofensivas: o lote parou em anteontem
+        for atras in (3, 2):
+            RegistroAcesso.objects.create(user=self.usuario, dia=self._dia(atras))
+            processar_dia(self._dia(atras))
+        perfil = PerfilUsuario.objects.get(user=self.usuario)
+        self.assertEqual((perfil.last_login_date, perfil.streak_count), (self._dia(2), 2))
+        self.assertEqual(ofensiva_atual(perfil, acessou_hoje=True), 1)
+
+        RegistroAcesso.objects.create(user=self.usuario, dia=self._dia(1))
+        self.assertEqual(ofensiva_atual(perfil, acessou_hoje=True), 4)
+        self.assertEqual(ofensiva_atual(perfil, acessou_hoje=False), 3)
+
+    def test_primeiro_login_sem_perfil(self):
+        resposta = self.client.post(
+            reverse('accounts:login'), {'credential': 'maria', 'password': 'x'}, follow=True
+        )
+        self.assertIn('Seja bem-vindo', str(list(resposta.context['messages'])[0]))
+        self.assertFalse(PerfilUsuario.objects.filter(user=self.usuario).exists())
+
+
+class ClassificacaoTests(TestCase):
+    """Rankings materializados: posição por índice e top-N paginado"""
+
+    def setUp(self):
+        self.usuarios = [
+            User.objects.create_user(f'aluno{i}', f'aluno{i}@etec.sp.gov.br', 'x', user_type='aluno', ano_escolar=1)
+            for i in range(5)
+        ]
+        for usuario, curtidas in zip(self.usuarios, [5, 9, 5, 0, 2]):
+            EstatisticasPerfil.objects.create(user=usuario, likes_received=curtidas)
+        RegistroAcesso.objects.create(user=self.usuarios[3], dia=timezone.localdate())
+
+    def test_materializacao_e_consultas(self):
+        call_command('atualizar_classificacoes', stdout=StringIO())
+
+        posicoes = list(Classificacao.objects.filter(ranking='curtidas').order_by('ordem').values_list('posicao', 'valor'))
+        self.assertEqual(posicoes, [(1, 9), (2, 5), (2, 5), (4, 2)])
+        self.assertEqual(Classificacao.objects.get(ranking='ativos-1').user, self.usuarios[3])
+
+        self.client.force_login(self.usuarios[4])
+        url = reverse('perfil:classificacao', args=['curtidas'])
+        with mock.patch('perfil.classificacoes.POR_PAGINA', 2):
+            primeira = self.client.get(url).json()
+            segunda = self.client.get(url, {'pagina': 2}).json()
+        self.assertEqual([item['posicao'] for item in primeira['items']], [1, 2])
+        self.assertTrue(primeira['tem_proxima'])
+        self.assertEqual(primeira['voce'], {'posicao': 4, 'valor': 2})
+        self.assertTrue(segunda['items'][-1]['voce'])
+        self.assertFalse(segunda['tem_proxima'])
+
+        self.assertEqual(self.client.get(reverse('perfil:classificacao', args=['xyz'])).status_code, 400)
+
+
+class AvataresTests(TestCase):
+    """Foto normalizada no upload e variantes geradas em segundo plano"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.media = tempfile.mkdtemp()
+        cls.media_override = override_settings(MEDIA_ROOT=cls.media)
+        cls.media_override.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.media_override.disable()
+        shutil.rmtree(cls.media, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.usuario = User.objects.create_user('foto', 'foto@etec.sp.gov.br', 'x', user_type='aluno')
+        self.client.force_login(self.usuario)
+
+    def _foto(self):
+        # 40x20 com orientação EXIF "girar 90°" e um metadado que não deve sobrar
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        exif[0x010F] = 'Câmera do celular'
+        saida = BytesIO()
+        Image.new('RGB', (40, 20), 'red').save(saida, 'JPEG', exif=exif)
+        return SimpleUploadedFile('foto.jpg', saida.getvalue(), content_type='image/jpeg')
+
+    def _enviar(self):
+        with mock.patch('perfil.avatares._pool') as pool, self.captureOnCommitCallbacks(execute=True):
+            resposta = self.client.post(reverse('perfil:editar'), {'photo': self._foto()})
+        return resposta, pool
+
+    def test_upload_normaliza_e_variantes_saem_em_segundo_plano(self):
+        resposta, pool = self._enviar()
+        self.assertTrue(resposta.json()['success'])
+
+        perfil = PerfilUsuario.objects.get(user=self.usuario)
+        photo_hash = perfil.photo.name.rsplit('/', 1)[-1][:-4]
+        self.assertEqual(perfil.photo.name, nome_original(photo_hash))
+        self.assertEqual(perfil.photo_hash, '')
+        pool.submit.assert_called_once()
+        with default_storage.open(perfil.photo.name) as arquivo, Image.open(arquivo) as imagem:
+            self.assertEqual(imagem.size, (20, 40))
+            self.assertEqual(len(imagem.getexif()), 0)
+
+        modelo = Template('{% load avatares %}{% avatar usuario 32 %}')
+        self.assertIn(perfil.photo.url, modelo.render(Context({'usuario': self.usuario})))
+
+        processar(perfil.pk, photo_hash)
+        with default_storage.open(nome_variante(photo_hash, 64, 'webp')) as arquivo, Image.open(arquivo) as imagem:
+            self.assertEqual(imagem.size, (64, 64))
+        html = modelo.render(Context({'usuario': User.objects.get(pk=self.usuario.pk)}))
+        self.assertIn(f'{photo_hash}_32.webp 1x, /media/{nome_variante(photo_hash, 64, "webp")} 2x', html)
+
+        # A mesma foto de novo reaproveita as variantes, sem agendar nada
+        PerfilUsuario.objects.filter(pk=perfil.pk).update(last_edit=None)
+        _, pool = self._enviar()
+        pool.submit.assert_not_called()
+        self.assertEqual(PerfilUsuario.objects.get(pk=perfil.pk).photo_hash, photo_hash)
+
+    def test_arquivo_que_nao_e_imagem(self):
+        arquivo = SimpleUploadedFile('foto.jpg', b'nada aqui', content_type='image/jpeg')
+        resposta = self.client.post(reverse('perfil:editar'), {'photo': arquivo})
+        self.assertEqual(resposta.status_code, 400)
+        self.assertFalse(PerfilUsuario.objects.get(user=self.usuario).photo)
+
+    def test_edicao_recusada_nao_grava_a_foto(self):
+        # E-mail já usado: o save falha e a foto normalizada não pode sobrar no disco
+        User.objects.create_user('outra', 'outra@etec.sp.gov.br', 'x', user_type='aluno')
+        arquivos = sum(len(nomes) for _, _, nomes in os.walk(self.media))
+        resposta = self.client.post(reverse('perfil:editar'), {'email': 'outra@etec.sp.gov.br', 'photo': self._foto()})
+        self.assertEqual(resposta.status_code, 400)
+        self.assertFalse(PerfilUsuario.objects.get(user=self.usuario).photo)
+        self.assertEqual(sum(len(nomes) for _, _, nomes in os.walk(self.media)), arquivos)
+
+
+class DisponibilidadeTests(TestCase):
+    """Verificação de nome/e-mail pelas colunas normalizadas, com cache negativo e limite por sessão"""
+
+    def setUp(self):
+        livres._itens.clear()
+        cache.clear()
+        self.usuario = User.objects.create_user('Maria', 'Maria@etec.sp.gov.br', 'x', user_type='aluno')
+        self.client.force_login(self.usuario)
+
+    def _verificar(self, campo, valor):
+        url = reverse(f'perfil:check_{campo}')
+        return self.client.post(url, json.dumps({campo: valor}), content_type='application/json')
+
+    def test_sem_diferenciar_maiusculas_e_cache_dos_livres(self):
+        outro = User.objects.create_user('joao', 'joao@etec.sp.gov.br', 'x')
+        self.assertEqual(outro.username_normalizado, 'joao')
+        self.assertFalse(self._verificar('username', 'JOAO').json()['available'])
+        self.assertFalse(self._verificar('email', 'Joao@Etec.sp.gov.br').json()['available'])
+        self.assertTrue(self._verificar('username', 'maria').json()['available'])  # o próprio nome
+
+        self.assertTrue(disponivel('username', 'Pedro'))
+        with self.assertNumQueries(0):
+            self.assertTrue(disponivel('username', 'pedro'))
+
+        # Ao ser ocupado, o valor sai do cache
+        User.objects.create_user('PEDRO', 'pedro@etec.sp.gov.br', 'x')
+        self.assertFalse(disponivel('username', 'pedro'))
+
+    def test_indice_unico_barra_nome_repetido(self):
+        User.objects.create_user('joao', 'joao@etec.sp.gov.br', 'x')
+        resposta = self.client.post(reverse('perfil:editar'), {'name': 'Joao'})
+        self.assertEqual(resposta.status_code, 400)
+        self.usuario.refresh_from_db()
+        self.assertEqual(self.usuario.username, 'Maria')
+
+    def test_limite_por_sessao(self):
+        with mock.patch('perfil.disponibilidade.LIMITE', 2):
+            self.assertEqual(self._verificar('username', 'ana').status_code, 200)
+            self.assertEqual(self._verificar('username', 'anab').status_code, 200)
+            resposta = self._verificar('username', 'anabe')
+        self.assertEqual(resposta.status_code, 429)
+        self.assertTrue(int(resposta['Retry-After']) >= 1)
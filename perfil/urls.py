@@ -17,4 +17,7 @@ urlpatterns = [
     
     # Dados dos popups em tempo real
     path('popup-data/<str:tipo>/', views.popup_data, name='popup_data'),
+    
+    # Rankings da escola
+    path('classificacao/<str:ranking>/', views.classificacao_data, name='classificacao'),
 ]
\ No newline at end of file
@@ -2,13 +2,19 @@ from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
 from django.http import JsonResponse
 from django.views.decorators.http import require_POST, require_http_methods
-from django.db.models import Sum, Count, Q
+from django.db import IntegrityError, transaction
 from django.utils import timezone
 from django.contrib.auth import authenticate
-from django.urls import reverse
 import json
+import logging
 from perfil.models import PerfilUsuario
-from notes.models import Note, NoteLike, NoteRecommendation
+from perfil.estatisticas import estatisticas_do_usuario
+from perfil.ofensivas import acessou_hoje, ofensiva_atual
+from perfil import classificacoes, disponibilidade
+from perfil.avatares import FotoInvalida, agendar_variantes, trocar_foto
+from perfil.popups import POR_PAGINA, TIPOS as TIPOS_POPUP, CursorInvalido, pagina as pagina_popup
+
+logger = logging.getLogger(__name__)
 
 
 @login_required
@@ -21,45 +27,43 @@ def perfil_view(request):
     # Obter ou criar perfil
     perfil, created = PerfilUsuario.objects.get_or_create(user=user)
     
-    # Atualizar streak quando acessar perfil
-    perfil.update_streak()
+    # Ofensiva do último cálculo em lote + hoje (sem gravar; ver perfil/ofensivas.py)
+    dias_ofensiva = ofensiva_atual(perfil, acessou_hoje(request))
     
     # ========================================
     # ESTATÍSTICAS BÁSICAS
+    # Uma linha já somada (ver perfil/estatisticas.py)
     # ========================================
-    
-    # Notes criados pelo usuário
-    notes_count = Note.objects.filter(author=user).count()
-    
-    # Curtidas RECEBIDAS nos notes do usuário
-    likes_count = NoteLike.objects.filter(note__author=user).count()
-    
-    # Downloads totais recebidos nos notes do usuário
-    downloads_count = Note.objects.filter(author=user).aggregate(
-        total=Sum('downloads')
-    )['total'] or 0
+    estatisticas = estatisticas_do_usuario(user)
     
     # Recomendações (professores)
     recommended_notes_count = 0
     if user.user_type == 'professor' or user.is_staff:
-        recommended_notes_count = NoteRecommendation.objects.filter(teacher=user).count()
+        recommended_notes_count = estatisticas.recommendations_given
     
     # ========================================
     # TEXTO DA OFENSIVA (CORRIGIDO)
     # ========================================
-    dias_ofensiva = perfil.streak_count
     if dias_ofensiva == 1:
         texto_ofensiva = "1 dia seguido"
     else:
         texto_ofensiva = f"{dias_ofensiva} dias seguidos"
     
+    # Posições nos rankings da escola (materializados; uma consulta)
+    posicoes = classificacoes.posicoes_do_usuario(user)
+    
     context = {
-        'streak_count': perfil.streak_count,
+        'posicoes': [
+            {'ranking': ranking, 'titulo': titulo, 'posicao': posicoes[ranking][0]}
+            for ranking, titulo in classificacoes.RANKINGS.items() if ranking in posicoes
+        ],
+        'rankings': classificacoes.RANKINGS.items(),
+        'streak_count': dias_ofensiva,
         'texto_ofensiva': texto_ofensiva,
-        'streak_progress': perfil.streak_progress(),
-        'notes_count': notes_count,
-        'likes_count': likes_count,
-        'downloads_count': downloads_count,
+        'streak_progress': perfil.streak_progress(dias_ofensiva),
+        'notes_count': estatisticas.notes_count,
+        'likes_count': estatisticas.likes_received,
+        'downloads_count': estatisticas.downloads_received,
         'recommended_notes_count': recommended_notes_count,
     }
     
@@ -72,165 +76,38 @@ def popup_data(request, tipo):
     """
     Retorna dados atualizados para os popups em tempo real.
     CADA POPUP FUNCIONA DE FORMA INDEPENDENTE!
+    Paginado: ?cursor=<proximo da página anterior>&limite=N (ver perfil/popups.py)
     """
-    user = request.user
-    items = []
+    if tipo not in TIPOS_POPUP:
+        return JsonResponse({
+            'success': False,
+            'error': f'Tipo de popup inválido: {tipo}'
+        }, status=400)
+    
+    # Recomendações: apenas professores
+    if tipo == 'recomendacoes' and request.user.user_type != 'professor' and not request.user.is_staff:
+        return JsonResponse({
+            'success': False,
+            'error': 'Apenas professores podem ver recomendações.'
+        }, status=403)
     
     try:
-        # ========================================
-        # POPUP 1: NOTES CRIADOS
-        # Mostra TODOS os notes criados pelo usuário
-        # ========================================
-        if tipo == 'notes-criados':
-            notes = Note.objects.filter(
-                author=user
-            ).select_related('subject_new').order_by('-created_at')
-            
-            for note in notes:
-                try:
-                    items.append({
-                        'id': note.pk,
-                        'title': note.title,
-                        'subject': note.subject_new.nome if note.subject_new else 'Sem matéria',
-                        'file_type': note.get_file_type_display(),
-                        'created_at': note.created_at.strftime('%d/%m/%Y'),
-                        'url': reverse('notes:detail', args=[note.pk])
-                    })
-                except Exception as e:
-                    print(f"Erro ao processar note {note.pk}: {e}")
-                    continue
-        
-        # ========================================
-        # POPUP 2: CURTIDAS RECEBIDAS
-        # Mostra TODOS os notes que RECEBERAM curtidas
-        # (INDEPENDENTE de terem sido recomendados ou não)
-        # ========================================
-        elif tipo == 'curtidas-recebidas':
-            # Buscar notes do usuário que têm PELO MENOS 1 curtida
-            notes = Note.objects.filter(
-                author=user,
-                likes__gt=0
-            ).annotate(
-                comments_count=Count('comments')
-            ).order_by('-likes', '-views', '-downloads')
-            
-            for note in notes:
-                try:
-                    items.append({
-                        'id': note.pk,
-                        'title': note.title,
-                        'created_at': note.created_at.strftime('%d/%m/%Y'),
-                        'likes': note.likes,
-                        'views': note.views,
-                        'downloads': note.downloads,
-                        'comments_count': note.comments_count,
-                        'url': reverse('notes:detail', args=[note.pk])
-                    })
-                except Exception as e:
-                    print(f"Erro ao processar note {note.pk}: {e}")
-                    continue
-        
-        # ========================================
-        # POPUP 3: DOWNLOADS
-        # Mostra notes que FORAM BAIXADOS (downloads > 0)
-        # (INDEPENDENTE de terem curtidas ou recomendações)
-        # ========================================
-        elif tipo == 'downloads':
-            # Buscar notes do usuário que foram baixados
-            notes_downloaded = Note.objects.filter(
-                author=user,
-                downloads__gt=0
-            ).select_related('subject_new').order_by('-downloads', '-created_at')
-            
-            for note in notes_downloaded:
-                try:
-                    items.append({
-                        'id': note.pk,
-                        'title': note.title,
-                        'tipo': 'Note',
-                        'subject': note.subject_new.nome if note.subject_new else 'Sem matéria',
-                        'downloads': note.downloads,
-                        'likes': note.likes,
-                        'views': note.views,
-                        'created_at': note.created_at.strftime('%d/%m/%Y'),
-                        'url': reverse('notes:detail', args=[note.pk])
-                    })
-                except Exception as e:
-                    print(f"Erro ao processar note {note.pk}: {e}")
-                    continue
-            
-            # TODO: Adicionar atividades e horários quando implementado
-            # atividades = Atividade.objects.filter(downloads__gt=0)
-            # horarios = Horario.objects.filter(downloads__gt=0)
-        
-        # ========================================
-        # POPUP 4: RECOMENDAÇÕES (APENAS PROFESSORES)
-        # Mostra notes que FORAM RECOMENDADOS pelo professor
-        # (INDEPENDENTE de terem curtidas ou downloads)
-        # ========================================
-        elif tipo == 'recomendacoes':
-            if user.user_type != 'professor' and not user.is_staff:
-                return JsonResponse({
-                    'success': False,
-                    'error': 'Apenas professores podem ver recomendações.'
-                }, status=403)
-            
-            # Buscar todas as recomendações feitas pelo professor
-            recomendacoes = NoteRecommendation.objects.filter(
-                teacher=user
-            ).select_related('note', 'note__subject_new').order_by('-recommended_at')
-            
-            for rec in recomendacoes:
-                try:
-                    # Verificar se o note ainda existe
-                    if rec.note:
-                        items.append({
-                            'id': rec.note.pk,
-                            'title': rec.note.title,
-                            'subject': rec.note.subject_new.nome if rec.note.subject_new else 'Sem matéria',
-                            'views': rec.note.views,
-                            'likes': rec.note.likes,
-                            'downloads': rec.note.downloads,
-                            'recommended_at': rec.recommended_at.strftime('%d/%m/%Y às %H:%M'),
-                            'url': reverse('notes:detail', args=[rec.note.pk]),
-                            'deleted': False
-                        })
-                    else:
-                        # Note foi deletado
-                        items.append({
-                            'id': None,
-                            'title': '❌ Note removido',
-                            'subject': 'N/A',
-                            'views': 0,
-                            'likes': 0,
-                            'downloads': 0,
-                            'recommended_at': rec.recommended_at.strftime('%d/%m/%Y às %H:%M'),
-                            'url': '#',
-                            'deleted': True
-                        })
-                except Exception as e:
-                    print(f"Erro ao processar recomendação {rec.pk}: {e}")
-                    continue
-        
-        else:
-            return JsonResponse({
-                'success': False,
-                'error': f'Tipo de popup inválido: {tipo}'
-            }, status=400)
-        
-        # Log de debug
-        print(f"[POPUP {tipo}] Retornando {len(items)} itens para usuário {user.username}")
+        limite = int(request.GET.get('limite', POR_PAGINA))
+    except ValueError:
+        limite = POR_PAGINA
+    
+    try:
+        dados = pagina_popup(request.user, tipo, cursor=request.GET.get('cursor'), limite=limite)
+        return JsonResponse({'success': True, **dados})
         
+    except CursorInvalido as e:
         return JsonResponse({
-            'success': True,
-            'items': items,
-            'total': len(items)
-        })
+            'success': False,
+            'error': str(e)
+        }, status=400)
         
     except Exception as e:
-        print(f"[ERRO CRÍTICO] popup_data ({tipo}): {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception('Erro ao carregar o popup %s', tipo)
         
         return JsonResponse({
             'success': False,
@@ -238,6 +115,46 @@ def popup_data(request, tipo):
         }, status=500)
 
 
+@login_required
+@require_http_methods(["GET"])
+def classificacao_data(request, ranking):
+    """
+    Ranking da escola paginado + posição do usuário
+    Endpoint: /perfil/classificacao/<ranking>/?pagina=N
+    """
+    if ranking not in classificacoes.RANKINGS:
+        return JsonResponse({
+            'success': False,
+            'error': f'Ranking inválido: {ranking}'
+        }, status=400)
+    
+    try:
+        numero = max(int(request.GET.get('pagina', 1)), 1)
+    except ValueError:
+        numero = 1
+    
+    itens, total = classificacoes.pagina(ranking, numero)
+    voce = classificacoes.posicoes_do_usuario(request.user).get(ranking)
+    
+    return JsonResponse({
+        'success': True,
+        'ranking': ranking,
+        'titulo': classificacoes.RANKINGS[ranking],
+        'unidade': classificacoes.UNIDADES[ranking],
+        'pagina': numero,
+        'tem_proxima': numero * classificacoes.POR_PAGINA < total,
+        'total': total,
+        'atualizado_em': itens[0]['atualizado_em'].isoformat() if itens else None,
+        'items': [{
+            'posicao': item['posicao'],
+            'username': item['user__username'],
+            'valor': item['valor'],
+            'voce': item['user_id'] == request.user.pk,
+        } for item in itens],
+        'voce': {'posicao': voce[0], 'valor': voce[1]} if voce else None,
+    })
+
+
 @login_required
 @require_http_methods(["POST"])
 def check_password(request):
@@ -330,24 +247,35 @@ def editar_perfil(request):
             
             user.set_password(new_password)
         
-        # Alterar foto
-        new_photo_url = None
-        if photo:
-            perfil.photo = photo
-            perfil.save()
-            new_photo_url = perfil.photo.url
-        
-        # Salvar alterações
-        user.save()
+        # Salvar alterações (o índice único das colunas normalizadas barra nome/e-mail repetido).
+        # A foto só é normalizada e gravada depois que o usuário salvou, para não sobrar
+        # arquivo de uma edição recusada; foto inválida desfaz o save.
+        try:
+            with transaction.atomic():
+                user.save()
+                if photo:
+                    trocar_foto(perfil, photo)
+        except IntegrityError:
+            return JsonResponse({
+                'success': False,
+                'error': 'Este nome ou e-mail já está sendo usado.'
+            }, status=400)
+        except FotoInvalida as e:
+            return JsonResponse({
+                'success': False,
+                'error': str(e)
+            }, status=400)
         
         # Atualizar timestamp de última edição
         perfil.last_edit = timezone.now()
         perfil.save()
+        if photo:
+            agendar_variantes(perfil)
         
         return JsonResponse({
             'success': True,
             'message': 'Perfil atualizado com sucesso!',
-            'new_photo_url': new_photo_url
+            'new_photo_url': perfil.photo.url if photo else None
         })
         
     except Exception as e:
@@ -368,19 +296,16 @@ def check_username(request):
     try:
         data = json.loads(request.body)
         username = data.get('username', '').strip()
-        current_username = data.get('current_username', '')
         
         # Se for o mesmo usuário atual, está disponível
-        if username.lower() == current_username.lower():
+        if username.lower() == request.user.username.lower():
             return JsonResponse({'available': True})
         
-        # Verificar se existe outro usuário com esse nome
-        from django.contrib.auth import get_user_model
-        User = get_user_model()
+        espera = disponibilidade.limitar(request)
+        if espera:
+            return _verificacao_limitada(espera)
         
-        exists = User.objects.filter(username__iexact=username).exists()
-        
-        return JsonResponse({'available': not exists})
+        return JsonResponse({'available': disponibilidade.disponivel('username', username)})
         
     except Exception as e:
         return JsonResponse({'available': False, 'error': str(e)})
@@ -395,19 +320,23 @@ def check_email(request):
     try:
         data = json.loads(request.body)
         email = data.get('email', '').strip().lower()
-        current_email = data.get('current_email', '').lower()
         
         # Se for o mesmo e-mail atual, está disponível
-        if email == current_email:
+        if email == request.user.email.lower():
             return JsonResponse({'available': True})
         
-        # Verificar se existe outro usuário com esse e-mail
-        from django.contrib.auth import get_user_model
-        User = get_user_model()
-        
-        exists = User.objects.filter(email__iexact=email).exists()
+        espera = disponibilidade.limitar(request)
+        if espera:
+            return _verificacao_limitada(espera)
         
-        return JsonResponse({'available': not exists})
+        return JsonResponse({'available': disponibilidade.disponivel('email', email)})
         
     except Exception as e:
-        return JsonResponse({'available': False, 'error': str(e)})
\ No newline at end of file
+        return JsonResponse({'available': False, 'error': str(e)})
+
+
+def _verificacao_limitada(espera):
+    """Muitas verificações seguidas na sessão: o front-end tenta de novo depois"""
+    response = JsonResponse({'available': None, 'retry_after': espera}, status=429)
+    response['Retry-After'] = str(espera)
+    return response
\ No newline at end of file
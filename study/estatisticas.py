@@ -0,0 +1,98 @@
+"""
+Estatísticas da home (/study/api/stats/).
+
+- Matérias e notes: contadores no cache, ajustados pelos sinais de
+  criação/exclusão (ver study/signals.py). Só há COUNT no banco quando o
+  contador ainda não existe ou expirou (ressincronização periódica).
+  A recontagem é single-flight: uma requisição conta (trava no cache com
+  um token, liberada só por quem a pegou) e as demais usam o último valor
+  conhecido no processo em vez de repetir o COUNT.
+- Alunos online: contagem O(1) do registro de presença em memória
+  (ver study/presenca.py), alimentado pelo heartbeat da home. A lista
+  de quem está online não vai aqui: a home acompanha as entradas/saídas
+  por /study/api/presenca/.
+- O ETag combina a versão da presença com os contadores, então consultas
+  sem mudança recebem 304.
+
+Contadores e trava ficam no cache padrão. Sem CACHES configurado ele é o
+LocMem, um por processo: com vários processos cada um teria contagens e
+ETags próprios, e o cliente que alterna entre eles recebe 200 em vez de
+304. Em produção com vários processos o cache precisa ser compartilhado
+(Redis/Memcached), como no calendário (ver atividades/calendario.py).
+Isso não resolve a presença, que é sempre do processo (ver
+study/presenca.py): com vários workers a contagem de online e a parte
+dela no ETag continuam variando de um processo para outro.
+"""
+import hashlib
+import uuid
+
+from django.core.cache import cache
+
+from materias.models import Subject
+from notes.models import Note
+from .presenca import presenca
+
+CONTADOR_TIMEOUT = 60 * 60  # ressincroniza os contadores com o banco a cada hora
+RECONTAGEM_TIMEOUT = 30  # a trava expira sozinha se o processo cair no meio
+
+CHAVE_CONTADOR = 'study:stats:contador:{}'
+CHAVE_RECONTAGEM = 'study:stats:recontando:{}'
+
+CONTADORES = {
+    'materias': Subject,
+    'notes': Note,
+}
+
+
+# Último valor visto de cada contador neste processo (usado durante recontagens)
+_ultimos = {}
+
+
+def _liberar(chave, token):
+    """Remove a trava só se ainda for a nossa (ela pode ter expirado e sido pega por outro)"""
+    if cache.get(chave) == token:
+        cache.delete(chave)
+
+
+def contagem(nome):
+    """Valor do contador; na falta dele, conta no banco (uma requisição por vez) e guarda"""
+    chave = CHAVE_CONTADOR.format(nome)
+    valor = cache.get(chave)
+    if valor is not None:
+        _ultimos[nome] = valor
+        return valor
+
+    trava = CHAVE_RECONTAGEM.format(nome)
+    token = uuid.uuid4().hex
+    if not cache.add(trava, token, RECONTAGEM_TIMEOUT) and nome in _ultimos:
+        return _ultimos[nome]
+    try:
+        valor = CONTADORES[nome].objects.count()
+        cache.add(chave, valor, CONTADOR_TIMEOUT)
+        _ultimos[nome] = valor
+        return valor
+    finally:
+        _liberar(trava, token)
+
+
+def ajustar_contador(nome, delta):
+    """Chamado pelos sinais; sem contador em cache, a próxima leitura conta no banco"""
+    try:
+        cache.incr(CHAVE_CONTADOR.format(nome), delta)
+    except ValueError:
+        pass
+
+
+def estatisticas():
+    """Dados da /study/api/stats/ e o ETag correspondente"""
+    dados = {
+        'success': True,
+        'materias_count': contagem('materias'),
+        'notes_count': contagem('notes'),
+        'alunos_online_count': presenca.total(),
+        'presenca_seq': presenca.versao(),
+    }
+    etag = hashlib.md5(
+        f"{dados['presenca_seq']}:{dados['materias_count']}:{dados['notes_count']}".encode()
+    ).hexdigest()
+    return dados, etag
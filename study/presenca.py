@@ -0,0 +1,133 @@
+"""
+Presença dos alunos na plataforma.
+
+Cada aba aberta envia um heartbeat (/study/api/ping/). O registro fica só
+em memória, sem escrever na tabela de usuários:
+
+- um OrderedDict em ordem de último ping funciona como janela deslizante:
+  quem está no início é o mais antigo, então expirar é retirar do começo
+  até achar alguém ainda dentro da janela, e a contagem é len() (O(1));
+- cada entrada/saída gera um evento numerado; os clientes pedem só os
+  eventos desde o último número que viram, em vez da lista completa.
+
+O estado é por processo. Com vários workers, cada um vê os pings que
+recebeu; para somar os processos seria preciso um armazenamento
+compartilhado (ex.: Redis).
+"""
+import threading
+import time
+from collections import OrderedDict, deque
+
+JANELA_SEGUNDOS = 120  # sem ping por mais que isso = offline
+INTERVALO_PING = 45  # usado pelo front-end (home.html)
+MAX_EVENTOS = 1000  # histórico de deltas; clientes mais atrasados recebem a lista completa
+
+
+class Presenca:
+
+    def __init__(self, janela=JANELA_SEGUNDOS, max_eventos=MAX_EVENTOS):
+        self.janela = janela
+        self._online = OrderedDict()  # user_id -> dados do aluno + último ping
+        self._eventos = deque(maxlen=max_eventos)  # (seq, tipo, dados)
+        self._seq = 0
+        self._trava = threading.Lock()
+
+    def _registrar_evento(self, tipo, dados):
+        self._seq += 1
+        self._eventos.append((self._seq, tipo, dados))
+
+    def _expirar(self, agora):
+        limite = agora - self.janela
+        while self._online:
+            user_id, dados = next(iter(self._online.items()))
+            if dados['ultimo_ping'] >= limite:
+                break
+            self._online.popitem(last=False)
+            self._registrar_evento('saiu', {'id': user_id})
+
+    def ping(self, usuario, agora=None):
+        """Marca o aluno como online; devolve True se ele acabou de entrar"""
+        agora = agora or time.time()
+        with self._trava:
+            self._expirar(agora)
+            dados = self._online.pop(usuario.pk, None)
+            entrou = dados is None
+            if entrou:
+                dados = {
+                    'id': usuario.pk,
+                    'username': usuario.username,
+                    'online_desde': agora,
+                }
+            dados['ultimo_ping'] = agora
+            self._online[usuario.pk] = dados
+            if entrou:
+                self._registrar_evento('entrou', self._publico(dados))
+            return entrou
+
+    def sair(self, usuario):
+        with self._trava:
+            if self._online.pop(usuario.pk, None) is not None:
+                self._registrar_evento('saiu', {'id': usuario.pk})
+
+    def total(self, agora=None):
+        with self._trava:
+            self._expirar(agora or time.time())
+            return len(self._online)
+
+    def versao(self, agora=None):
+        """Número do último evento; muda sempre que alguém entra ou sai"""
+        with self._trava:
+            self._expirar(agora or time.time())
+            return self._seq
+
+    def lista(self, agora=None):
+        """Alunos online, do ping mais recente para o mais antigo"""
+        with self._trava:
+            self._expirar(agora or time.time())
+            return [self._publico(dados) for dados in reversed(self._online.values())]
+
+    def deltas(self, desde, agora=None):
+        """
+        Eventos posteriores a `desde`. Se o cliente está atrasado demais
+        (eventos já descartados) ou é a primeira consulta, devolve a lista completa.
+        """
+        with self._trava:
+            self._expirar(agora or time.time())
+            return self._deltas(desde)
+
+    def _deltas(self, desde):
+        primeiro = self._eventos[0][0] if self._eventos else self._seq + 1
+        if desde <= 0 or desde > self._seq or desde < primeiro - 1:
+            return {
+                'seq': self._seq,
+                'completo': True,
+                'alunos': [self._publico(dados) for dados in reversed(self._online.values())],
+                'total': len(self._online),
+            }
+        entraram, sairam = [], []
+        for seq, tipo, dados in self._eventos:
+            if seq <= desde:
+                continue
+            if tipo == 'entrou':
+                entraram.append(dados)
+            else:
+                sairam.append(dados['id'])
+        return {
+            'seq': self._seq,
+            'completo': False,
+            'entraram': entraram,
+            'sairam': sairam,
+            'total': len(self._online),
+        }
+
+    @staticmethod
+    def _publico(dados):
+        return {
+            'id': dados['id'],
+            'username': dados['username'],
+            'online_desde': dados['online_desde'],
+            'ultimo_ping': dados['ultimo_ping'],
+        }
+
+
+presenca = Presenca()
@@ -0,0 +1,29 @@
+from django.contrib.auth.signals import user_logged_out
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from materias.models import Subject
+from notes.models import Note
+from .estatisticas import ajustar_contador
+from .presenca import presenca
+
+
+@receiver(post_save, sender=Subject)
+@receiver(post_save, sender=Note)
+def contar_criacao(sender, instance, created, **kwargs):
+    """Novas matérias/notes entram no contador da home sem novo COUNT"""
+    if created:
+        ajustar_contador('materias' if sender is Subject else 'notes', 1)
+
+
+@receiver(post_delete, sender=Subject)
+@receiver(post_delete, sender=Note)
+def contar_exclusao(sender, instance, **kwargs):
+    ajustar_contador('materias' if sender is Subject else 'notes', -1)
+
+
+@receiver(user_logged_out)
+def sair_da_presenca(sender, request, user, **kwargs):
+    """Logout tira o aluno da lista na hora, sem esperar a janela expirar"""
+    if user is not None:
+        presenca.sair(user)
@@ -1,3 +1,208 @@
+import asyncio
+import threading
+from unittest import mock
+
+from django.core.cache import cache
 from django.test import TestCase
+from django.urls import reverse
+
+from accounts.models import User
+from materias.models import Subject
+from .estatisticas import CHAVE_CONTADOR, CHAVE_RECONTAGEM, _liberar, contagem
+from .presenca import Presenca, presenca
+from .transmissao import Produtor
+
+
+class StatsApiTests(TestCase):
+    """Snapshot das estatísticas: cache, contadores por sinal e 304 por ETag"""
+
+    def setUp(self):
+        cache.clear()
+        self.url = reverse('study:stats_api')
+        Subject.objects.create(name='Química', slug='quimica')
+        self.aluno = User.objects.create_user('aluno', 'aluno@etec.sp.gov.br', 'x', user_type='aluno')
+        presenca.ping(self.aluno)
+
+    def tearDown(self):
+        presenca.sair(self.aluno)
+
+    def test_snapshot_e_revalidacao(self):
+        resposta = self.client.get(self.url)
+        dados = resposta.json()
+        self.assertEqual((dados['materias_count'], dados['alunos_online_count']), (1, 1))
+
+        with self.assertNumQueries(0):
+            revalidacao = self.client.get(self.url, HTTP_IF_NONE_MATCH=resposta['ETag'])
+        self.assertEqual(revalidacao.status_code, 304)
+
+    def test_contador_atualizado_pelos_sinais(self):
+        resposta = self.client.get(self.url)
+        Subject.objects.create(name='Física', slug='fisica')
+
+        with self.assertNumQueries(0):
+            nova = self.client.get(self.url, HTTP_IF_NONE_MATCH=resposta['ETag'])
+        self.assertEqual(nova.status_code, 200)
+        self.assertEqual(nova.json()['materias_count'], 2)
+
+        Subject.objects.get(slug='fisica').delete()
+        self.assertEqual(self.client.get(self.url).json()['materias_count'], 1)
+
+    def test_recontagem_single_flight(self):
+        self.assertEqual(contagem('materias'), 1)
+        cache.delete(CHAVE_CONTADOR.format('materias'))
+
+        # Outra requisição está recontando: usa o último valor, sem COUNT
+        cache.set(CHAVE_RECONTAGEM.format('materias'), 'outro-processo', 30)
+        with self.assertNumQueries(0):
+            self.assertEqual(contagem('materias'), 1)
+
+        # Quem não pegou a trava não a remove
+        _liberar(CHAVE_RECONTAGEM.format('materias'), 'meu-token')
+        self.assertEqual(cache.get(CHAVE_RECONTAGEM.format('materias')), 'outro-processo')
+
+        cache.delete(CHAVE_RECONTAGEM.format('materias'))
+        Subject.objects.create(name='Física', slug='fisica')
+        cache.delete(CHAVE_CONTADOR.format('materias'))
+        with self.assertNumQueries(1):
+            self.assertEqual(contagem('materias'), 2)
+        self.assertIsNone(cache.get(CHAVE_RECONTAGEM.format('materias')))
+
+
+class PresencaTests(TestCase):
+    """Heartbeat em memória, janela deslizante e entradas/saídas por número de evento"""
+
+    def setUp(self):
+        self.aluno = User.objects.create_user('ana', 'ana@etec.sp.gov.br', 'x', user_type='aluno')
+        self.outro = User.objects.create_user('bia', 'bia@etec.sp.gov.br', 'x', user_type='aluno')
+        self.professor = User.objects.create_user('prof', 'prof@etec.sp.gov.br', 'x', user_type='professor')
+
+    def tearDown(self):
+        for usuario in (self.aluno, self.outro):
+            presenca.sair(usuario)
+
+    def test_janela_deslizante_e_deltas(self):
+        registro = Presenca(janela=60)
+        registro.ping(self.aluno, agora=1000)
+        seq = registro.versao(agora=1000)
+        registro.ping(self.outro, agora=1030)
+        registro.ping(self.aluno, agora=1050)  # renova, não gera evento
+
+        self.assertEqual(registro.total(agora=1070), 2)
+        deltas = registro.deltas(seq, agora=1070)
+        self.assertEqual([aluno['username'] for aluno in deltas['entraram']], ['bia'])
+        self.assertEqual(deltas['sairam'], [])
+
+        # bia não renovou: sai da janela; ana continua
+        seq = deltas['seq']
+        self.assertEqual(registro.total(agora=1100), 1)
+        self.assertEqual(registro.deltas(seq, agora=1100)['sairam'], [self.outro.pk])
+
+        completo = registro.deltas(0, agora=1100)
+        self.assertTrue(completo['completo'])
+        self.assertEqual([aluno['id'] for aluno in completo['alunos']], [self.aluno.pk])
+
+    def test_ping_sem_banco_e_logout(self):
+        self.client.force_login(self.aluno)
+        self.client.get(reverse('study:home'))  # registro de acesso do dia (perfil)
+        with self.assertNumQueries(2):  # sessão e usuário; nada é gravado
+            resposta = self.client.post(reverse('study:ping'))
+        self.assertTrue(resposta.json()['online'])
+
+        estatisticas = self.client.get(reverse('study:stats_api')).json()
+        self.assertEqual(estatisticas['alunos_online_count'], 1)
+        alunos = self.client.get(reverse('study:online_students')).json()['students']
+        self.assertEqual([aluno['username'] for aluno in alunos], ['ana'])
+        self.assertNotIn('email', alunos[0])
+
+        seq = self.client.get(reverse('study:presenca')).json()['seq']
+        self.client.logout()
+        for url in ('study:presenca', 'study:online_students'):
+            self.assertEqual(self.client.get(reverse(url)).status_code, 302)
+
+        self.client.force_login(self.professor)
+        deltas = self.client.get(reverse('study:presenca'), {'desde': seq}).json()
+        self.assertEqual(deltas['sairam'], [self.aluno.pk])
+        self.assertEqual(deltas['total'], 0)
+
+    def test_professor_e_anonimo_nao_contam(self):
+        self.assertEqual(self.client.post(reverse('study:ping')).status_code, 401)
+        self.client.force_login(self.professor)
+        self.assertFalse(self.client.post(reverse('study:ping')).json()['online'])
+        self.assertEqual(presenca.total(), 0)
+
+    def test_home_anonima_nao_busca_presenca(self):
+        # A API de presença exige login; a home pública só mostra a contagem
+        self.assertNotContains(self.client.get(reverse('study:home')), 'fetchPresenca();')
+        self.client.force_login(self.aluno)
+        self.assertContains(self.client.get(reverse('study:home')), 'fetchPresenca();')
+
+
+class TransmissaoTests(TestCase):
+    """Um produtor por processo: SSE e long-polling só respondem quando algo muda"""
+
+    def setUp(self):
+        cache.clear()
+        self.aluno = User.objects.create_user('caio', 'caio@etec.sp.gov.br', 'x', user_type='aluno')
+        self.produtor = Produtor(intervalo=0.05)
+        patcher = mock.patch('study.views.produtor', self.produtor)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        presenca.sair(self.aluno)
+
+    def test_produtor_compartilhado(self):
+        chamadas = []
+        estado = {'etag': 'v1'}
+
+        def calcular():
+            chamadas.append(threading.current_thread().name)
+            return {'etag': estado['etag']}, estado['etag']
+
+        produtor = Produtor(calcular=calcular, intervalo=0.05)
+        produtor.atual()
+
+        async def esperar_muitos():
+            esperas = [produtor.aguardar_mudanca('v1', 5) for _ in range(50)]
+            await asyncio.sleep(0.2)
+            estado['etag'] = 'v2'
+            return await asyncio.gather(*esperas)
+
+        resultados = asyncio.run(esperar_muitos())
+        self.assertEqual({etag for _, etag in resultados}, {'v2'})
+        # 50 conexões esperando, mas o recálculo é só do produtor, a cada intervalo
+        self.assertLess(len(chamadas), 15)
+
+    async def test_long_polling(self):
+        url = reverse('study:stats_aguardar')
+        primeira = await self.async_client.get(url)
+        self.assertEqual(primeira.status_code, 200)
+        etag = primeira['ETag']
+
+        with mock.patch('study.views.TIMEOUT_LONG_POLL', 0.2):
+            sem_mudanca = await self.async_client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(sem_mudanca.status_code, 304)
+
+        async def entrar_depois():
+            await asyncio.sleep(0.1)
+            presenca.ping(self.aluno)
+
+        espera = asyncio.ensure_future(self.async_client.get(url, headers={'If-None-Match': etag}))
+        await entrar_depois()
+        resposta = await espera
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.json()['alunos_online_count'], 1)
+        self.assertNotEqual(resposta['ETag'], etag)
+
+    async def test_stream_sse(self):
+        resposta = await self.async_client.get(reverse('study:stats_stream'))
+        self.assertEqual(resposta['Content-Type'], 'text/event-stream')
+        eventos = resposta.streaming_content
+        self.assertTrue((await anext(eventos)).startswith(b'retry:'))
+        primeiro = await anext(eventos)
+        self.assertIn(b'event: stats', primeiro)
 
-# Create your tests here.
+        presenca.ping(self.aluno)
+        mudanca = await asyncio.wait_for(anext(eventos), 5)
+        self.assertIn(b'"alunos_online_count": 1', mudanca)
+        await eventos.aclose()
@@ -0,0 +1,120 @@
+"""
+Envio das estatísticas da home por push (SSE) e long-polling.
+
+Um único produtor por processo recalcula as estatísticas a cada
+INTERVALO_PRODUTOR segundos, e só enquanto alguém está esperando.
+Quando o ETag muda, acorda de uma vez todas as conexões abertas. Cada
+aba parada é só uma conexão esperando; não roda nenhum laço de consulta
+por cliente, então a carga não cresce com o número de abas.
+
+O produtor é uma thread e acorda as esperas pelo loop de cada uma
+(call_soon_threadsafe). Assim funciona no ASGI (um loop só) e também
+no runserver/WSGI, onde cada requisição assíncrona tem o próprio loop.
+Para as conexões SSE não prenderem workers, sirva com um servidor ASGI
+(studymate/asgi.py).
+"""
+import asyncio
+import logging
+import threading
+import time
+
+from django.db import close_old_connections
+
+from .estatisticas import estatisticas
+
+logger = logging.getLogger(__name__)
+
+INTERVALO_PRODUTOR = 2  # segundos entre verificações enquanto há conexões esperando
+TIMEOUT_LONG_POLL = 25  # abaixo do timeout comum de proxies (30s)
+KEEPALIVE_SSE = 15  # comentário periódico para proxies não fecharem a conexão
+
+
+def _entregar(futuro, valor):
+    if not futuro.done():
+        futuro.set_result(valor)
+
+
+class Produtor:
+
+    def __init__(self, calcular=estatisticas, intervalo=INTERVALO_PRODUTOR):
+        self.calcular = calcular
+        self.intervalo = intervalo
+        self._estado = None  # (dados, etag, momento)
+        self._assinantes = set()  # (loop, futuro, etag conhecido) de quem espera uma mudança
+        self._trava = threading.Lock()
+        self._ha_assinantes = threading.Event()
+        self._thread = None
+
+    def atual(self):
+        """(dados, etag) recentes; recalcula se o produtor estava parado"""
+        with self._trava:
+            estado = self._estado
+        if estado is None or time.monotonic() - estado[2] > self.intervalo:
+            estado = self._atualizar()[0]
+        return estado[0], estado[1]
+
+    async def aguardar_mudanca(self, etag, timeout):
+        """
+        (dados, etag) assim que o ETag for diferente de `etag`,
+        ou None se nada mudar dentro do timeout.
+        """
+        loop = asyncio.get_running_loop()
+        futuro = loop.create_future()
+        assinatura = (loop, futuro, etag)
+        with self._trava:
+            if self._estado is not None and self._estado[1] != etag:
+                return self._estado[0], self._estado[1]
+            self._assinantes.add(assinatura)
+            self._ha_assinantes.set()
+            self._iniciar()
+        try:
+            return await asyncio.wait_for(futuro, timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            with self._trava:
+                self._assinantes.discard(assinatura)
+                if not self._assinantes:
+                    self._ha_assinantes.clear()
+
+    def _iniciar(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._executar, name='study-estatisticas', daemon=True)
+            self._thread.start()
+
+    def _atualizar(self):
+        """Recalcula; devolve o estado novo e se o ETag mudou"""
+        dados, etag = self.calcular()
+        with self._trava:
+            mudou = self._estado is None or self._estado[1] != etag
+            self._estado = (dados, etag, time.monotonic())
+            return self._estado, mudou
+
+    def _executar(self):
+        while True:
+            # Sem ninguém esperando, a thread fica parada
+            self._ha_assinantes.wait()
+            time.sleep(self.intervalo)
+            try:
+                estado, mudou = self._atualizar()
+            except Exception:
+                logger.exception('Erro ao recalcular as estatísticas da home')
+                continue
+            finally:
+                # A thread não passa pelo ciclo de requisição que fecharia a conexão
+                close_old_connections()
+            if not mudou:
+                continue
+
+            with self._trava:
+                assinantes = list(self._assinantes)
+            for loop, futuro, etag in assinantes:
+                if etag == estado[1]:
+                    continue
+                try:
+                    loop.call_soon_threadsafe(_entregar, futuro, (estado[0], estado[1]))
+                except RuntimeError:
+                    pass  # loop já encerrado (cliente desconectou)
+
+
+produtor = Produtor()
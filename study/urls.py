@@ -8,7 +8,11 @@ urlpatterns = [
     
     # API endpoints para atualização em tempo real
     path('api/stats/', views.stats_api, name='stats_api'),
+    path('api/stats/stream/', views.stats_stream, name='stats_stream'),
+    path('api/stats/aguardar/', views.stats_aguardar, name='stats_aguardar'),
     path('api/materias_count/', views.materias_count_api, name='materias_count'),
     path('api/notes_count/', views.notes_count_api, name='notes_count'),
     path('api/online_students/', views.online_students_api, name='online_students'),
+    path('api/ping/', views.ping_api, name='ping'),
+    path('api/presenca/', views.presenca_api, name='presenca'),
 ]
\ No newline at end of file
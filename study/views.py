@@ -1,12 +1,14 @@
 from django.shortcuts import render
-from django.http import JsonResponse
+from django.http import HttpResponseNotModified, JsonResponse, StreamingHttpResponse
 from django.contrib.auth.decorators import login_required
-from django.views.decorators.http import require_http_methods
-from django.utils import timezone
-from datetime import timedelta
-from materias.models import Subject
-from notes.models import Note
-from accounts.models import User
+from django.views.decorators.http import condition, require_http_methods
+from django.utils.http import parse_etags, quote_etag
+from asgiref.sync import sync_to_async
+import json
+import time
+from .estatisticas import contagem, estatisticas
+from .presenca import presenca
+from .transmissao import KEEPALIVE_SSE, TIMEOUT_LONG_POLL, produtor
 
 
 def home(request):
@@ -19,45 +21,24 @@ def home(request):
 # ========================================
 # API PRINCIPAL - TODAS AS ESTATÍSTICAS
 # ========================================
+def _etag_stats(request):
+    return estatisticas()[1]
+
+
 @require_http_methods(["GET"])
+@condition(etag_func=_etag_stats)
 def stats_api(request):
     """
     Retorna TODAS as estatísticas de uma vez
     Endpoint: /study/api/stats/
+    Servida do snapshot em cache (ver study/estatisticas.py); consultas
+    sem mudança recebem 304.
     """
     try:
-        # Matérias cadastradas
-        materias_count = Subject.objects.count()
-        
-        # Notes compartilhados
-        notes_count = Note.objects.count()
-        
-        # Alunos online (últimos 5 minutos)
-        tempo_limite = timezone.now() - timedelta(minutes=5)
-        
-        alunos_online = User.objects.filter(
-            user_type='aluno',
-            last_login__gte=tempo_limite
-        ).values('id', 'username', 'last_login').order_by('-last_login')
-        
-        alunos_online_count = alunos_online.count()
-        
-        # Converter para lista
-        alunos_online_list = []
-        for aluno in alunos_online:
-            alunos_online_list.append({
-                'id': aluno['id'],
-                'username': aluno['username'],
-                'last_login': aluno['last_login'].isoformat() if aluno['last_login'] else None
-            })
-        
-        return JsonResponse({
-            'success': True,
-            'materias_count': materias_count,
-            'notes_count': notes_count,
-            'alunos_online_count': alunos_online_count,
-            'alunos_online': alunos_online_list
-        })
+        dados, _ = estatisticas()
+        response = JsonResponse(dados)
+        response['Cache-Control'] = 'private, no-cache'
+        return response
         
     except Exception as e:
         print(f"[ERRO] stats_api: {e}")
@@ -70,6 +51,63 @@ def stats_api(request):
         }, status=500)
 
 
+# ========================================
+# TEMPO REAL - SSE E LONG-POLLING
+# ========================================
+def _evento_sse(dados, etag):
+    return f'id: {etag}\nevent: stats\ndata: {json.dumps(dados)}\n\n'
+
+
+@require_http_methods(["GET"])
+async def stats_stream(request):
+    """
+    Envia as estatísticas só quando mudam (Server-Sent Events)
+    Endpoint: /study/api/stats/stream/
+    Todas as conexões do processo esperam o mesmo produtor (ver study/transmissao.py).
+    """
+    async def eventos():
+        dados, etag = await sync_to_async(produtor.atual)()
+        yield 'retry: 5000\n\n'
+        # Reconexão do EventSource: não reenvia o que o cliente já tem
+        if request.headers.get('Last-Event-ID') != etag:
+            yield _evento_sse(dados, etag)
+        while True:
+            novo = await produtor.aguardar_mudanca(etag, KEEPALIVE_SSE)
+            if novo is None:
+                yield ': keepalive\n\n'
+                continue
+            dados, etag = novo
+            yield _evento_sse(dados, etag)
+
+    response = StreamingHttpResponse(eventos(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # nginx: não acumular os eventos
+    return response
+
+
+@require_http_methods(["GET"])
+async def stats_aguardar(request):
+    """
+    Long-polling das estatísticas (alternativa ao SSE)
+    Endpoint: /study/api/stats/aguardar/
+    Com If-None-Match igual ao ETag atual, a resposta espera até algo
+    mudar (200) ou até o timeout (304); o cliente então repete a chamada.
+    """
+    dados, etag = await sync_to_async(produtor.atual)()
+    if quote_etag(etag) in parse_etags(request.headers.get('If-None-Match', '')):
+        novo = await produtor.aguardar_mudanca(etag, TIMEOUT_LONG_POLL)
+        if novo is None:
+            response = HttpResponseNotModified()
+            response['ETag'] = quote_etag(etag)
+            return response
+        dados, etag = novo
+
+    response = JsonResponse(dados)
+    response['ETag'] = quote_etag(etag)
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
 # ========================================
 # API INDIVIDUAL - MATÉRIAS
 # ========================================
@@ -80,7 +118,7 @@ def materias_count_api(request):
     Endpoint: /study/api/materias_count/
     """
     try:
-        count = Subject.objects.count()
+        count = contagem('materias')
         
         return JsonResponse({
             'success': True,
@@ -105,7 +143,7 @@ def notes_count_api(request):
     Endpoint: /study/api/notes_count/
     """
     try:
-        count = Note.objects.count()
+        count = contagem('notes')
         
         return JsonResponse({
             'success': True,
@@ -123,45 +161,32 @@ def notes_count_api(request):
 # ========================================
 # API INDIVIDUAL - ALUNOS ONLINE
 # ========================================
+@login_required
 @require_http_methods(["GET"])
 def online_students_api(request):
     """
     Retorna lista completa de alunos online
     Endpoint: /study/api/online_students/
+    Para acompanhar em tempo real, prefira /study/api/presenca/ (só as mudanças).
     """
     try:
-        # Considerar online se fez login nos últimos 5 minutos
-        tempo_limite = timezone.now() - timedelta(minutes=5)
-        
-        alunos_online = User.objects.filter(
-            user_type='aluno',
-            last_login__gte=tempo_limite
-        ).values('id', 'username', 'email', 'last_login').order_by('-last_login')
-        
-        # Converter para lista com dados formatados
+        # Online = heartbeat dentro da janela do registro de presença
+        agora = time.time()
         alunos_list = []
-        for aluno in alunos_online:
-            last_login = aluno['last_login']
-            agora = timezone.now()
+        for aluno in presenca.lista(agora):
+            minutos = int((agora - aluno['ultimo_ping']) // 60)
             
-            if last_login:
-                diff = (agora - last_login).total_seconds()
-                minutos = int(diff // 60)
-                
-                if minutos == 0:
-                    tempo_texto = 'Agora'
-                elif minutos == 1:
-                    tempo_texto = '1 minuto atrás'
-                else:
-                    tempo_texto = f'{minutos} minutos atrás'
+            if minutos == 0:
+                tempo_texto = 'Agora'
+            elif minutos == 1:
+                tempo_texto = '1 minuto atrás'
             else:
-                tempo_texto = 'Desconhecido'
+                tempo_texto = f'{minutos} minutos atrás'
             
             alunos_list.append({
                 'id': aluno['id'],
                 'username': aluno['username'],
-                'email': aluno['email'],
-                'last_login': last_login.isoformat() if last_login else None,
+                'ultimo_ping': aluno['ultimo_ping'],
                 'tempo_texto': tempo_texto
             })
         
@@ -180,4 +205,48 @@ def online_students_api(request):
         return JsonResponse({
             'success': False,
             'error': str(e)
-        }, status=500)
\ No newline at end of file
+        }, status=500)
+
+
+# ========================================
+# PRESENÇA - HEARTBEAT E MUDANÇAS
+# ========================================
+@require_http_methods(["POST"])
+def ping_api(request):
+    """
+    Heartbeat da home: mantém o aluno na lista de online
+    Endpoint: /study/api/ping/
+    Não escreve no banco (ver study/presenca.py).
+    """
+    if not request.user.is_authenticated:
+        return JsonResponse({
+            'success': False,
+            'error': 'Autenticação necessária'
+        }, status=401)
+
+    # Só alunos contam como "estudantes online"
+    if request.user.user_type != 'aluno':
+        return JsonResponse({'success': True, 'online': False})
+
+    presenca.ping(request.user)
+    return JsonResponse({'success': True, 'online': True})
+
+
+@login_required
+@require_http_methods(["GET"])
+def presenca_api(request):
+    """
+    Entradas e saídas de alunos desde o evento `desde`
+    Endpoint: /study/api/presenca/?desde=<seq>
+    Sem `desde` (ou se o cliente ficou para trás) vem a lista completa.
+    """
+    try:
+        desde = int(request.GET.get('desde', 0))
+    except ValueError:
+        desde = 0
+
+    dados = presenca.deltas(desde)
+    dados['success'] = True
+    response = JsonResponse(dados)
+    response['Cache-Control'] = 'private, no-cache'
+    return response
@@ -2,6 +2,7 @@
 Django settings for studymate project.
 """
 
+import tempfile
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -35,6 +36,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'perfil.middleware.RegistroAcessoMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -109,4 +111,28 @@ ALLOWED_FILE_TYPES = ['.pdf', '.doc', '.docx', '.ppt', '.pptx']
 # ========================================
 # CONFIGURAÇÕES DE E-MAIL
 # ========================================
-EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
\ No newline at end of file
+EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+
+# ========================================
+# CONFIGURAÇÕES DO CHAT
+# ========================================
+# Mensagens mais antigas que isso vão para o arquivo (comando arquivar_mensagens)
+CHAT_ARQUIVAR_APOS_DIAS = 180
+# Quantidade de mensagens carregadas por vez na conversa
+CHAT_JANELA_MENSAGENS = 50
+
+# ========================================
+# CONFIGURAÇÕES DAS ATIVIDADES
+# ========================================
+# Tipos cujas visualizações são acumuladas em memória e gravadas em lote
+ATIVIDADES_VISUALIZACAO_EM_LOTE = ['AVISO_PROVA']
+# O lote é gravado ao atingir este tamanho ou após este intervalo (segundos)
+ATIVIDADES_LOTE_VISUALIZACOES = 200
+ATIVIDADES_LOTE_INTERVALO = 5
+# Antecedência (horas) em que a atividade passa a "encerrando" e os lembretes são enviados
+ATIVIDADES_PRAZO_ENCERRANDO_HORAS = 24
+# Envio em blocos: tamanho de cada bloco e pasta temporária onde ficam até a finalização
+ATIVIDADES_UPLOAD_BLOCO = 1024 * 1024  # 1MB
+ATIVIDADES_UPLOAD_PARCIAL_DIR = Path(tempfile.gettempdir()) / 'studymate_uploads_parciais'
+# Envios em blocos em andamento por aluno (o mais antigo da mesma atividade é descartado)
+ATIVIDADES_UPLOAD_PARCIAIS_POR_ALUNO = 5